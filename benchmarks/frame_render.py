@@ -0,0 +1,62 @@
+"""Benchmark frame rendering: full screen rebuild against cached sections with line diffs
+
+Run from the repository root with: python -m benchmarks.frame_render"""
+from io import StringIO
+from timeit import repeat
+
+from src.game.blackjack import Blackjack, FaceUp21, Spanish21
+from src.game.rendering import TerminalRenderer
+
+
+def deal_hand(game: Blackjack) -> None:
+    """Deal an opening hand without prompting for a bet"""
+    game.reset()
+    game.player.hand.bet = 10
+    for _ in range(0, 2):
+        game.player.hand.add(game.shoe.deal())
+        game.dealer.hand.add(game.shoe.deal())
+
+
+def best_time(statement, number: int = 2000) -> float:
+    """Best time per call in microseconds"""
+    return min(repeat(statement, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    print('{:<10} {:>12} {:>12} {:>12} {:>12}'.format('game', 'full (us)', 'diff (us)', 'full bytes',
+                                                     'diff bytes'))
+
+    for game_type in (Blackjack, FaceUp21, Spanish21):
+        game = game_type(6)
+        game.shoe.reset()
+        deal_hand(game)
+        # Wide enough for the rules lines, which would otherwise wrap and redraw every frame
+        renderer = TerminalRenderer(StringIO(), size=(160, 50))
+
+        def keystroke():
+            # A keystroke changes the player's hand and the remaining card count
+            game.shoe.add(game.player.hand.deal())
+            game.player.hand.add(game.shoe.deal())
+
+        def full_frame():
+            keystroke()
+            renderer.stream.write(str(game))
+            renderer.stream.flush()
+
+        def diff_frame():
+            keystroke()
+            renderer.draw(game.frame())
+
+        renderer.draw(game.frame())
+        full = best_time(full_frame)
+        diff = best_time(diff_frame)
+        full_bytes = len(str(game).encode())
+        game.player.hand.add(game.shoe.deal())
+        diff_bytes = len(renderer.diff(game.frame()).encode())
+
+        print('{:<10} {:>12.1f} {:>12.1f} {:>12} {:>12}'.format(game_type.__name__, full, diff, full_bytes,
+                                                               diff_bytes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Guard the startup cost of importing the games, measured with python -X importtime
+
+Run from the repository root with: python -m benchmarks.import_time
+Exits with status 1 if the import takes longer than the budget, or if it loads a module
+that should only be loaded when it is used"""
+import argparse
+import os
+import subprocess
+import sys
+
+MODULE = 'src.game.blackjack'
+# Best of the runs, in milliseconds
+BUDGET_MS = 75
+# Loaded lazily by the console display, the vectorized simulation and basic strategy
+DEFERRED_MODULES = ('colorama', 'numpy', 'EventNotifier', 'concurrent.futures', 'importlib.resources',
+                    'src.analysis.basic_strategy')
+
+
+def import_times(module: str) -> dict:
+    """Cumulative import time in microseconds of each module loaded by a fresh interpreter"""
+    # Bytecode is written by the first run, so later runs do not time compiling
+    env = {name: value for name, value in os.environ.items() if name != 'PYTHONDONTWRITEBYTECODE'}
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            env=env, capture_output=True, text=True, check=True)
+    times = {}
+
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and not line.endswith('imported package'):
+            _, cumulative, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(cumulative)
+
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import time of ' + MODULE)
+    parser.add_argument('-r', '--runs', type=int, default=5, help='number of timed imports')
+    parser.add_argument('-b', '--budget', type=float, default=BUDGET_MS, help='budget in milliseconds')
+    args = parser.parse_args()
+
+    import_times(MODULE)
+    runs = [import_times(MODULE) for _ in range(0, args.runs)]
+    best = min(runs, key=lambda times: times[MODULE])
+
+    print('{:>10}  {}'.format('ms', 'module'))
+    for name, microseconds in sorted(best.items(), key=lambda item: -item[1])[:15]:
+        print('{:>10.1f}  {}'.format(microseconds / 1000, name))
+
+    total = best[MODULE] / 1000
+    loaded = [name for name in DEFERRED_MODULES if name in best]
+    print('\n{}: {:.1f} ms, budget {:.1f} ms'.format(MODULE, total, args.budget))
+
+    if loaded:
+        print('loaded at import: ' + ', '.join(loaded))
+    if loaded or total > args.budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
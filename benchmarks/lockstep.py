@@ -0,0 +1,44 @@
+"""Benchmark lockstep simulation against the per round engine loop
+
+Run from the repository root with: python -m benchmarks.lockstep"""
+from time import perf_counter
+
+from src.game.blackjack import Blackjack, FaceUp21, Spanish21
+from src.game.simulation import SimulationStats
+from src.game.strategy import DealerMimicStrategy
+from src.game.vectorized import simulate_shoes
+
+ENGINE_ROUNDS = 20000
+LOCKSTEP_ROUNDS = 1000000
+
+
+def engine_rounds(game_type) -> tuple:
+    """Rounds per second and stats of the engine loop"""
+    stats = SimulationStats()
+    start = perf_counter()
+    for result in game_type(6, float('inf'), False, 1).simulate(DealerMimicStrategy(), ENGINE_ROUNDS):
+        stats.add(result)
+    return stats.rounds / (perf_counter() - start), stats
+
+
+def lockstep_rounds(game_type) -> tuple:
+    """Rounds per second and stats of lockstep simulation"""
+    start = perf_counter()
+    stats = simulate_shoes(game_type, DealerMimicStrategy(), LOCKSTEP_ROUNDS, 6, rng=1)
+    return stats.rounds / (perf_counter() - start), stats
+
+
+def main():
+    print('{:<10} {:>14} {:>14} {:>8} {:>12} {:>12}'.format('game', 'engine (r/s)', 'lockstep (r/s)', 'speedup',
+                                                           'engine edge', 'lockstep edge'))
+
+    for game_type in (Blackjack, FaceUp21, Spanish21):
+        engine, engine_stats = engine_rounds(game_type)
+        lockstep, lockstep_stats = lockstep_rounds(game_type)
+        print('{:<10} {:>14.0f} {:>14.0f} {:>7.1f}x {:>12.4%} {:>12.4%}'.format(
+            game_type.__name__, engine, lockstep, lockstep / engine, engine_stats.house_edge(),
+            lockstep_stats.house_edge()))
+
+
+if __name__ == '__main__':
+    main()
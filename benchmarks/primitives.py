@@ -0,0 +1,194 @@
+"""Microbenchmarks of the card and hand primitives, with saved baselines to compare against
+
+Run from the repository root with: python -m benchmarks.primitives
+Each benchmark is calibrated to take about --target seconds per repeat and timed over
+--repeats repeats, interleaved with the other benchmarks, with garbage collection off.
+The median time per call is compared, with the interquartile range as its noise. With
+--save the results become the baselines in benchmarks/baselines/primitives.json, and with
+--compare a benchmark slower than its baseline by more than the threshold, by more than
+its noise and in its best time too, is flagged as a regression and the run exits with
+status 1. Baselines are only comparable on the machine they were saved on, so save them
+again before comparing on another"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+from timeit import Timer
+
+from src.card.entities import CardCollection, Deck, Diamonds, Hearts, Shoe, Spades
+from src.card.enums import CardSuit, CardValue
+from src.game.blackjack import Blackjack, Spanish21
+from src.game.entities import Hand
+from src.game.enums import GameWinner
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines', 'primitives.json')
+SHOE_SIZE = 6
+# Fraction a median may grow over its baseline before it is a regression
+THRESHOLD = 0.2
+
+
+def hand_of(*cards) -> Hand:
+    hand = Hand()
+    for card in cards:
+        hand.add(card)
+    return hand
+
+
+def dealt_game(game_type) -> Blackjack:
+    """Game with an opening hand dealt, without prompting for a bet"""
+    game = game_type(SHOE_SIZE, 100, False, 1)
+    game.player.hand.bet = 10
+    for _ in range(0, 2):
+        game.player.hand.add(game.shoe.deal())
+        game.dealer.hand.add(game.shoe.deal())
+    return game
+
+
+def odds_hand() -> tuple:
+    """Spanish 21 game and a winning suited 7-7-7 against a dealer 7, the richest bonus to pay"""
+    game = dealt_game(Spanish21)
+    game.dealer.hand.reset()
+    game.dealer.hand.add(Hearts(CardValue.SEVEN))
+    game.dealer.hand.add(Diamonds(CardValue.TEN))
+    hand = hand_of(*(Spades(CardValue.SEVEN) for _ in range(0, 3)))
+    hand.bet = 10
+    hand.outcome = GameWinner.PLAYER
+    return game, hand
+
+
+def cycle_card(collection: CardCollection):
+    """Remove a card and put it back, remove rebuilds the codes without it"""
+    card = Spades(CardValue.QUEEN)
+
+    def remove():
+        collection.remove(card)
+        collection.add(card)
+    return remove
+
+
+def deal_card(shoe: Shoe):
+    """Deal a card and put it back, so the shoe never runs out"""
+    def deal():
+        shoe.add(shoe.deal())
+    return deal
+
+
+def benchmarks() -> dict:
+    """Callable timed by each benchmark, built once so setup is not timed"""
+    shoe = Shoe(SHOE_SIZE, 1)
+    deck = Deck(False, True, 1)
+    hand = hand_of(Spades(CardValue.ACE), Spades(CardValue.SIX), Spades(CardValue.KING))
+    blackjack = hand_of(Hearts(CardValue.ACE), Hearts(CardValue.QUEEN))
+    game, odds = odds_hand()
+    table = dealt_game(Blackjack)
+
+    return {
+        'Deck.generate_deck': lambda: Deck.generate_deck(False),
+        'Shoe.generate_shoe': shoe.generate_shoe,
+        'Shoe.reset': shoe.reset,
+        'shuffle_cards': shoe.shuffle_cards,
+        'deal': deal_card(shoe),
+        'CardCollection.remove': cycle_card(deck),
+        'CardCollection.has_card': lambda: deck.has_card(CardSuit.SPADES, CardValue.QUEEN),
+        'CardCollection.all_same_suit': hand.all_same_suit,
+        'Hand.total': hand.total,
+        'Hand.blackjack': blackjack.blackjack,
+        'Spanish21.apply_odds': lambda: game.apply_odds(odds),
+        'Blackjack.__str__': table.__str__,
+    }
+
+
+def calibrate(timer: Timer, target: float) -> int:
+    """Calls per repeat to take about the target time"""
+    number, _ = timer.autorange()
+    # autorange stops past 0.2 seconds
+    return max(1, int(number * target / 0.2))
+
+
+def measure(functions: dict, repeats: int, target: float) -> dict:
+    """Median, best and interquartile range of the time per call in nanoseconds of each function.
+       The repeats of every function are interleaved, so a machine slowing down during the run
+       slows them all alike rather than the benchmarks that happen to run then"""
+    timers = {name: Timer(function) for name, function in functions.items()}
+    numbers = {name: calibrate(timer, target) for name, timer in timers.items()}
+    times = {name: [] for name in timers}
+    for _ in range(0, repeats):
+        for name, timer in timers.items():
+            times[name].append(timer.timeit(numbers[name]) / numbers[name] * 1e9)
+
+    results = {}
+    for name, samples in times.items():
+        samples.sort()
+        quartiles = statistics.quantiles(samples, n=4)
+        results[name] = {'median': statistics.median(samples), 'best': samples[0],
+                         'iqr': quartiles[2] - quartiles[0], 'number': numbers[name]}
+    return results
+
+
+def load_baselines(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)['benchmarks']
+
+
+def save_baselines(path: str, results: dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                   'benchmarks': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def regression(result: dict, baseline: dict, threshold: float) -> bool:
+    """Return True if the median grew by more than the threshold and by more than the noise of
+       either run, and the best time grew by more than the threshold too"""
+    growth = result['median'] - baseline['median']
+    return growth > baseline['median'] * threshold and growth > max(result['iqr'], baseline['iqr']) and \
+        result['best'] > baseline['best'] * (1 + threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks of the card and hand primitives')
+    parser.add_argument('-r', '--repeats', type=int, default=15, help='timed repeats of each benchmark')
+    parser.add_argument('-t', '--target', type=float, default=0.05, help='seconds per repeat')
+    parser.add_argument('-k', '--select', default='', help='only run benchmarks with this in their name')
+    parser.add_argument('--baselines', default=BASELINES, help='baseline file')
+    parser.add_argument('--save', action='store_true', help='save the results as the baselines')
+    parser.add_argument('--compare', action='store_true', help='flag regressions against the baselines')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='fraction the median may grow over its baseline, default %(default)s')
+    args = parser.parse_args()
+
+    baselines = load_baselines(args.baselines)
+    results = measure({name: function for name, function in benchmarks().items() if args.select in name},
+                      args.repeats, args.target)
+    regressions = []
+
+    print('{:<30} {:>12} {:>12} {:>10} {:>12} {:>9}'.format('benchmark', 'median (ns)', 'best (ns)', 'iqr (ns)',
+                                                            'baseline', 'change'))
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        flag = ''
+        if args.compare and baseline and regression(result, baseline, args.threshold):
+            regressions.append(name)
+            flag = '  REGRESSION'
+
+        print('{:<30} {:>12.1f} {:>12.1f} {:>10.1f} {:>12} {:>9}{}'.format(
+            name, result['median'], result['best'], result['iqr'],
+            '{:.1f}'.format(baseline['median']) if baseline else '-',
+            '{:+.1%}'.format(result['median'] / baseline['median'] - 1) if baseline else '-', flag))
+
+    if args.save:
+        save_baselines(args.baselines, dict(baselines, **results))
+        print('\nsaved baselines to {}'.format(args.baselines))
+    if regressions:
+        print('\n{} regressed by more than {:.0%}: {}'.format(len(regressions), args.threshold,
+                                                            ', '.join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
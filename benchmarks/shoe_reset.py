@@ -0,0 +1,53 @@
+"""Benchmark shoe reset cost against building the shoe from new card objects
+
+Run from the repository root with: python -m benchmarks.shoe_reset"""
+from random import shuffle
+from timeit import repeat
+
+from src.card.entities import Shoe, Diamonds, Clubs, Hearts, Spades
+from src.card.enums import CardValue, DeckComposition
+
+SHOE_SIZES = (1, 2, 6, 8)
+
+
+def rebuild_shoe(size: int) -> list:
+    """Build and shuffle a shoe from new card objects, one deck at a time"""
+    shoe = []
+
+    for _ in range(0, size):
+        deck = []
+        for value in filter(lambda card_value: card_value is not CardValue.JOKER, CardValue):
+            deck.append(Diamonds(value))
+            deck.append(Clubs(value))
+            deck.append(Hearts(value))
+            deck.append(Spades(value))
+        shoe += deck
+
+    shuffle(shoe)
+    return shoe
+
+
+def best_time(statement, number: int) -> float:
+    """Best time per call in microseconds"""
+    return min(repeat(statement, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    print('{:>5} {:>14} {:>14} {:>9} {:>18}'.format('decks', 'rebuild (us)', 'reset (us)', 'speedup',
+                                                    'spanish reset (us)'))
+
+    for size in SHOE_SIZES:
+        shoe = Shoe(size)
+        spanish_shoe = Shoe(size, composition=DeckComposition.SPANISH)
+        number = max(1, 400 // size)
+
+        rebuild = best_time(lambda: rebuild_shoe(size), number)
+        reset = best_time(shoe.reset, number)
+        spanish_reset = best_time(spanish_shoe.reset, number)
+
+        print('{:>5} {:>14.1f} {:>14.1f} {:>8.1f}x {:>18.1f}'.format(size, rebuild, reset, rebuild / reset,
+                                                                   spanish_reset))
+
+
+if __name__ == '__main__':
+    main()
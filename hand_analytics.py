@@ -0,0 +1,32 @@
+"""Group hands recorded by simulate.py --columns and report their results per group"""
+import argparse
+from time import perf_counter
+
+from src.game.analytics import COLUMN_LABELS, HandStore
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('directory')
+    parser.add_argument('-b', '--by', nargs='*', default=[], metavar='COLUMN',
+                        help='columns to group by, e.g. variant upcard start_total soft first_action outcome')
+    parser.add_argument('-w', '--where', nargs='*', default=[], metavar='COLUMN=VALUE',
+                        help='only count hands with the value, or one of comma separated values')
+    args = parser.parse_args()
+
+    where = {}
+    for condition in args.where:
+        name, _, value = condition.partition('=')
+        values = [int(item) if item.isdigit() else item for item in value.split(',')]
+        where[name] = values if len(values) > 1 else values[0]
+
+    start = perf_counter()
+    store = HandStore(args.directory)
+    table = store.group_by(args.by, where)
+    elapsed = perf_counter() - start
+
+    print('\t'.join(args.by + ['hands', 'net', 'mean', 'std']))
+    for row in table:
+        keys = [COLUMN_LABELS[name][row[name]] if name in COLUMN_LABELS else str(row[name]) for name in args.by]
+        print('\t'.join(keys + ['{}'.format(row['hands']), '{:.2f}'.format(row['net']),
+                                '{:.4f}'.format(row['mean']), '{:.4f}'.format(row['std'])]))
+    print('{} hands in {} blocks, {:.2f}s'.format(table['hands'].sum(), len(store.blocks), elapsed))
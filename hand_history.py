@@ -0,0 +1,34 @@
+"""Summarize hand history files written by simulate.py --history, reading them as a stream"""
+import argparse
+from time import perf_counter
+
+from src.game.history import HistoryReader
+from src.game.simulation import SimulationStats
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('-p', '--print', type=int, default=0, metavar='ROUNDS',
+                        help='print the first rounds of each file')
+    args = parser.parse_args()
+
+    start = perf_counter()
+    stats = SimulationStats()
+    cards = 0
+
+    for path in args.files:
+        reader = HistoryReader(path)
+        print('{}: {}, {} decks, seed {} {}'.format(path, reader.header.game, reader.header.shoe_size,
+                                                     reader.header.seed, reader.header.spawn_key))
+        for record in reader:
+            stats.add(record.result)
+            cards += len(record.cards)
+            if record.round < args.print:
+                print('round {}{}: cards {}, actions {}, net {}'.format(
+                    record.round, ' (shuffled)' if record.reshuffled else '', list(record.cards),
+                    ' '.join(action.value for action in record.actions), record.result.net))
+
+    elapsed = perf_counter() - start
+    print(stats.report())
+    print('cards dealt:\t{}'.format(cards))
+    print('elapsed:\t{:.1f}s ({:.0f} rounds/s)'.format(elapsed, stats.rounds / elapsed if elapsed else 0))
@@ -0,0 +1,30 @@
+"""Exact expected return of a strategy, by recursion over shoe compositions"""
+import argparse
+import os
+from time import perf_counter
+
+from src.analysis.exact import expected_return
+from src.game.blackjack import BlackjackGameCollection
+from src.game.strategy import STRATEGIES, StateStrategy
+
+if __name__ == '__main__':
+    games = {game.__name__.lower(): game for game in BlackjackGameCollection().games}
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('game', choices=games.keys())
+    parser.add_argument('-d', '--decks', type=int, default=6)
+    # Counting strategies depend on the cards dealt before the round, so only state strategies have an exact value
+    strategies = [name for name, strategy in STRATEGIES.items() if issubclass(strategy, StateStrategy)]
+    parser.add_argument('-s', '--strategy', choices=strategies, default='mimic')
+    parser.add_argument('-b', '--bet', type=float, default=1)
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--oracle', default=None, help='file to keep dealer distributions in between runs')
+    args = parser.parse_args()
+
+    start = perf_counter()
+    value = expected_return(games[args.game], STRATEGIES[args.strategy](), args.decks, args.bet, args.workers,
+                            args.oracle)
+
+    print('expected return:\t{:.4%} of the initial bet'.format(value))
+    print('house edge:\t\t{:.4%}'.format(-value))
+    print('elapsed:\t\t{:.1f}s'.format(perf_counter() - start))
@@ -0,0 +1,21 @@
+"""Host blackjack tables for clients connecting over TCP, see src.game.server for the protocol"""
+import argparse
+import asyncio
+
+from src.game.server import GameServer
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=7021)
+    parser.add_argument('--idle', type=float, default=300, help='seconds before an idle table is evicted')
+    parser.add_argument('--max-sessions', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = GameServer(args.host, args.port, args.idle, args.max_sessions, args.seed)
+    print('serving tables on {}:{}'.format(args.host, args.port))
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
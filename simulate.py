@@ -0,0 +1,50 @@
+"""Estimate house edge and variance of a game by Monte Carlo simulation"""
+import argparse
+import os
+from time import perf_counter
+
+from src.game.blackjack import BlackjackGameCollection
+from src.game.simulation import simulate
+from src.game.strategy import STRATEGIES
+
+if __name__ == '__main__':
+    games = {game.__name__.lower(): game for game in BlackjackGameCollection().games}
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('game', choices=games.keys())
+    parser.add_argument('-n', '--rounds', type=int, default=1000000)
+    parser.add_argument('-d', '--decks', type=int, default=6)
+    parser.add_argument('-s', '--strategy', choices=STRATEGIES.keys(), default='mimic')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--penetration', type=float, default=0.75)
+    parser.add_argument('--seats', type=int, default=1, help='players at the table sharing the shoe')
+    parser.add_argument('--history', help='write a hand history per chunk to HISTORY.<chunk>')
+    parser.add_argument('--columns', help='add every hand to column blocks in the COLUMNS directory')
+    parser.add_argument('--phases', metavar='PATH',
+                        help='time the phases of each round in one process, saving the counts to PATH as JSON')
+    parser.add_argument('--vectorized', action='store_true', help='play shoes in lockstep with NumPy arrays')
+    args = parser.parse_args()
+
+    instrumentation = None
+    if args.phases:
+        # Imported here so uninstrumented runs leave the game classes untouched
+        from src.game.instrumentation import Instrumentation
+        instrumentation = Instrumentation()
+        instrumentation.enable()
+        # Worker processes would play with the original methods
+        args.workers = 1
+
+    start = perf_counter()
+    stats = simulate(games[args.game], args.rounds, args.decks, args.strategy, args.seed,
+                     args.workers, args.chunk_size, args.penetration, args.vectorized, args.seats,
+                     args.history, args.columns)
+    elapsed = perf_counter() - start
+
+    print(stats.report())
+    if instrumentation:
+        instrumentation.disable()
+        instrumentation.write(args.phases)
+        print(instrumentation.report())
+    print('elapsed:\t{:.1f}s ({:.0f} rounds/s)'.format(elapsed, stats.rounds / elapsed))
@@ -0,0 +1 @@
+"""Exact analysis of the blackjack games by recursion over shoe compositions"""
@@ -0,0 +1,150 @@
+"""Basic strategy tables: the best action for every hand state against every dealer key
+
+A table is generated by playing every hand optimally with OptimalEvaluator, knowing its
+cards, then picking for each hand state the action with the highest expected value over
+all hands in that state, weighted by how likely they are. Tables are flat byte strings
+indexed by state_index, saved to a file with a fingerprint of the game rules and shoe, and
+regenerated only when the fingerprint changes."""
+import inspect
+import os
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import blake2b
+from math import comb
+
+from src.analysis.dealer import DealerOracle
+from src.analysis.exact import OptimalEvaluator, dealer_starts, remove
+from src.analysis.rules import GameRules
+from src.game.enums import PlayerAction
+from src.game.states import HAND_STATE_COUNT, UPCARD_COUNT, DEALER_STATE_COUNT, hand_state_key
+
+TABLE_DIRECTORY = os.path.join(os.path.dirname(__file__), 'tables')
+TABLE_MAGIC = b'BJST'
+TABLE_VERSION = 2
+
+# Table entries are indexes into ACTIONS plus one, 0 for states no hand reaches. Ties go to
+# the first action, so an action the rules do not allow, which is played as a hit, loses to HIT
+ACTIONS = (PlayerAction.STAND, PlayerAction.HIT, PlayerAction.DOUBLE, PlayerAction.SPLIT)
+
+# Game methods whose code decides payouts, doubling and dealer play
+RULE_METHODS = ('winner_outcome', 'hand_winnings', 'odds_winnings', 'double_down', 'can_split',
+                'dealer_should_hit', 'dealer_key')
+
+
+def dealer_key_count(game_type) -> int:
+    """Number of dealer keys a table holds for each hand state"""
+    return DEALER_STATE_COUNT if game_type.dealer_cards_visible else UPCARD_COUNT
+
+
+def rules_fingerprint(game_type, shoe_size: int) -> bytes:
+    """Digest of everything a table depends on: the shoe, the dealer rules and the code of
+       the game methods that settle hands"""
+    rules = GameRules(game_type, shoe_size)
+    sources = [inspect.getsource(getattr(game_type, name)) for name in RULE_METHODS if hasattr(game_type, name)]
+    fields = (TABLE_VERSION, game_type.__name__, rules.counts, rules.hits_soft_17, rules.dealer_cards_visible,
+              rules.ten_pair_same_rank, sources)
+    return blake2b(repr(fields).encode(), digest_size=16).digest()
+
+
+def table_path(game_type, shoe_size: int, directory: str = None) -> str:
+    return os.path.join(directory or TABLE_DIRECTORY, '{}_{}.strategy'.format(game_type.__name__.lower(), shoe_size))
+
+
+def hand_probability(values: tuple, counts) -> float:
+    """Chance that cards drawn from counts have the given values, in any order"""
+    probability = 1.0
+    for value in set(values):
+        probability *= comb(counts[value - 1], values.count(value))
+    return probability / comb(sum(counts), len(values))
+
+
+def start_action_values(game_type, shoe_size: int, dealer_values: tuple, oracle: DealerOracle = None) -> dict:
+    """Expected values of each action by hand state for one dealer start, as sums weighted by
+       the chance of each hand, keyed by (hand state key, dealer key)"""
+    rules = GameRules(game_type, shoe_size)
+    evaluator = OptimalEvaluator(rules, dealer_values, oracle)
+    evaluator.expected_value()
+
+    totals = {}
+    for (values, split, same_rank), (state, action_values) in evaluator.action_values.items():
+        if split and state.pair:
+            # Split hands cannot split again, leave pair decisions to the opening hands
+            continue
+        if split:
+            # The pair dealt, then the cards drawn to the split hand
+            rest = list(values)
+            rest.remove(split)
+            weight = hand_probability((split, split), evaluator.counts) * \
+                hand_probability(tuple(rest), remove(evaluator.counts, (split, split)))
+        else:
+            weight = hand_probability(values, evaluator.counts)
+        if same_rank is not None:
+            weight *= rules.ten_pair_same_rank if same_rank else 1 - rules.ten_pair_same_rank
+
+        key = (hand_state_key(*state), evaluator.dealer_key)
+        sums = totals.setdefault(key, [0.0] * len(ACTIONS))
+        for index, action in enumerate(ACTIONS):
+            sums[index] += weight * action_values[action]
+    return totals
+
+
+def generate_table(game_type, shoe_size: int = 6, workers: int = None) -> bytes:
+    """Best action for every hand state and dealer key, as a flat table indexed by state_index"""
+    starts = dealer_starts(GameRules(game_type, shoe_size))
+    totals = {}
+
+    def add(probability: float, start_totals: dict) -> None:
+        for key, sums in start_totals.items():
+            combined = totals.setdefault(key, [0.0] * len(ACTIONS))
+            for index, value in enumerate(sums):
+                combined[index] += probability * value
+
+    if workers == 1:
+        oracle = DealerOracle()
+        for values, probability in starts:
+            add(probability, start_action_values(game_type, shoe_size, values, oracle))
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            futures = [(probability, executor.submit(start_action_values, game_type, shoe_size, values))
+                       for values, probability in starts]
+            for probability, future in futures:
+                add(probability, future.result())
+
+    count = dealer_key_count(game_type)
+    table = bytearray(HAND_STATE_COUNT * count)
+    for (state_key, dealer_key), sums in totals.items():
+        table[state_key * count + dealer_key] = sums.index(max(sums)) + 1
+    return bytes(table)
+
+
+def save_table(path: str, fingerprint: bytes, table: bytes) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(TABLE_MAGIC + fingerprint + table)
+    os.replace(path + '.tmp', path)
+
+
+def read_table(path: str, fingerprint: bytes):
+    """Table saved at path, or None if there is none for this fingerprint"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except IOError:
+        return None
+
+    header = TABLE_MAGIC + fingerprint
+    if not data.startswith(header):
+        return None
+    return data[len(header):]
+
+
+def load_table(game_type, shoe_size: int = 6, directory: str = None, workers: int = None) -> bytes:
+    """Basic strategy table for a game and shoe size, generated and saved first if the saved
+       table is missing or was made for other rules"""
+    fingerprint = rules_fingerprint(game_type, shoe_size)
+    path = table_path(game_type, shoe_size, directory)
+
+    table = read_table(path, fingerprint)
+    if table is None or len(table) != HAND_STATE_COUNT * dealer_key_count(game_type):
+        table = generate_table(game_type, shoe_size, workers)
+        save_table(path, fingerprint, table)
+    return table
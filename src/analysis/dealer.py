@@ -0,0 +1,195 @@
+"""Distribution of the dealer's final hand for a shoe composition
+
+Compositions are tuples of card counts by value, index 0 for aces up to index 9 for
+ten valued cards. A distribution is a tuple of probabilities indexed like DEALER_OUTCOMES.
+DealerOracle memoizes distributions in a bounded LRU that can be kept in a local file."""
+import os
+import struct
+from collections import OrderedDict
+
+BUST_TOTAL = 22
+
+# (final total, blackjack, holding a seven) for each index of a dealer distribution
+DEALER_OUTCOMES = tuple((total, False, has_seven) for total in range(17, BUST_TOTAL + 1)
+                        for has_seven in (False, True)) + ((21, True, False),)
+BLACKJACK_OUTCOME = len(DEALER_OUTCOMES) - 1
+
+
+def outcome_index(total: int, blackjack: bool, has_seven: bool) -> int:
+    """Index of a final dealer hand in a distribution"""
+    if blackjack:
+        return BLACKJACK_OUTCOME
+    return (min(total, BUST_TOTAL) - 17) * 2 + has_seven
+
+
+def _certain(index: int) -> tuple:
+    return tuple(1.0 if outcome == index else 0.0 for outcome in range(len(DEALER_OUTCOMES)))
+
+
+FINAL_HANDS = tuple(_certain(index) for index in range(len(DEALER_OUTCOMES)))
+FINAL_TOTALS = tuple(range(17, BUST_TOTAL + 1))
+
+# Bumped when the file layout or the meaning of a distribution changes
+ORACLE_FILE_VERSION = 3
+ORACLE_MAGIC = b'BJDO'
+# Magic, version and entry count, then the entries
+ORACLE_HEADER = struct.Struct('<4sBI')
+# Each entry is the dealer start length and values, then the count of each card value, the
+# soft 17 rule and the distribution
+ORACLE_ENTRY = struct.Struct('<10H?{}d'.format(len(DEALER_OUTCOMES)))
+
+
+def final_totals(distribution: tuple) -> tuple:
+    """Chance of each dealer final total in FINAL_TOTALS, 17 to 21 and bust"""
+    totals = [0.0] * len(FINAL_TOTALS)
+    for (total, _, _), probability in zip(DEALER_OUTCOMES, distribution):
+        totals[total - 17] += probability
+    return tuple(totals)
+
+
+def dealer_distribution(start: tuple, counts: tuple, hits_soft_17: bool = False) -> tuple:
+    """Distribution of the dealer's final hand starting from the dealer cards in start, values
+       1 to 10, and drawing from counts. The dealer stands on 17, and hits soft 17 if hits_soft_17"""
+    counts = list(counts)
+    memo = {}
+    outcome_count = len(DEALER_OUTCOMES)
+
+    def final(hard: int, has_ace: bool, cards: int, has_seven: bool):
+        """Outcome index if the dealer stands or is bust, otherwise None"""
+        total = hard + 10 if has_ace and hard <= 11 else hard
+        if total > 21:
+            return (BUST_TOTAL - 17) * 2 + has_seven
+        if total >= 17 and not (hits_soft_17 and total == 17 and has_ace and hard == 7):
+            return BLACKJACK_OUTCOME if cards == 2 and total == 21 else (total - 17) * 2 + has_seven
+        return None
+
+    def play(hard: int, has_ace: bool, cards: int, has_seven: bool) -> tuple:
+        # The counts left identify the cards the dealer has drawn
+        key = tuple(counts)
+        distribution = memo.get(key)
+        if distribution is not None:
+            return distribution
+
+        remaining = sum(counts)
+        distribution = [0.0] * outcome_count
+        for index in range(0, 10):
+            count = counts[index]
+            if count:
+                probability = count / remaining
+                drawn_ace = has_ace or index == 0
+                drawn_seven = has_seven or index == 6
+                outcome = final(hard + index + 1, drawn_ace, cards + 1, drawn_seven)
+                if outcome is not None:
+                    distribution[outcome] += probability
+                    continue
+                counts[index] -= 1
+                drawn = play(hard + index + 1, drawn_ace, cards + 1, drawn_seven)
+                counts[index] += 1
+                distribution = [total + probability * chance for total, chance in zip(distribution, drawn)]
+
+        distribution = tuple(distribution)
+        memo[key] = distribution
+        return distribution
+
+    outcome = final(sum(start), 1 in start, len(start), 7 in start)
+    return FINAL_HANDS[outcome] if outcome is not None else play(sum(start), 1 in start, len(start), 7 in start)
+
+
+class DealerOracle:
+    """Dealer distributions memoized by starting cards, composition and soft 17 rule. At most
+       maxsize distributions are held, least recently used first out, and pending only keeps
+       those still held. With a path, the distributions are loaded from and saved to a local
+       file of plain numbers"""
+
+    def __init__(self, maxsize: int = 200000, path: str = None):
+        self.maxsize = maxsize
+        self.path = path
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.cache)
+
+    def distribution(self, start: tuple, counts: tuple, hits_soft_17: bool = False) -> tuple:
+        """Distribution of the dealer's final hand, see dealer_distribution"""
+        key = (tuple(start), tuple(counts), hits_soft_17)
+        distribution = self.cache.get(key)
+        if distribution is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return distribution
+
+        self.misses += 1
+        distribution = dealer_distribution(*key)
+        self.store(key, distribution)
+        self.pending[key] = distribution
+        return distribution
+
+    def final_totals(self, start: tuple, counts: tuple, hits_soft_17: bool = False) -> tuple:
+        """Chance of each dealer final total in FINAL_TOTALS"""
+        return final_totals(self.distribution(start, counts, hits_soft_17))
+
+    def store(self, key: tuple, distribution: tuple) -> None:
+        self.cache[key] = distribution
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.maxsize:
+            evicted, _ = self.cache.popitem(last=False)
+            self.pending.pop(evicted, None)
+
+    def update(self, distributions: dict) -> None:
+        """Add distributions computed elsewhere, e.g. by another process"""
+        for key, distribution in distributions.items():
+            self.store(key, distribution)
+            self.pending[key] = distribution
+
+    def take_pending(self) -> dict:
+        """Distributions computed or added since the last call, or since loading"""
+        pending, self.pending = self.pending, {}
+        return pending
+
+    def load(self, path: str = None) -> None:
+        """Add the distributions saved in a file. Files of another version, or damaged ones,
+           are ignored"""
+        with open(path or self.path, 'rb') as f:
+            data = f.read()
+
+        if len(data) < ORACLE_HEADER.size:
+            return
+        magic, version, count = ORACLE_HEADER.unpack_from(data)
+        if magic != ORACLE_MAGIC or version != ORACLE_FILE_VERSION:
+            return
+
+        entries = []
+        position = ORACLE_HEADER.size
+        try:
+            for _ in range(0, count):
+                length = data[position]
+                start = tuple(data[position + 1:position + 1 + length])
+                position += 1 + length
+                entry = ORACLE_ENTRY.unpack_from(data, position)
+                position += ORACLE_ENTRY.size
+                entries.append(((start, entry[:10], entry[10]), entry[11:]))
+        except (IndexError, struct.error):
+            return
+        if position != len(data):
+            return
+
+        for key, distribution in entries:
+            self.store(key, distribution)
+
+    def save(self, path: str = None) -> None:
+        """Write the distributions held to a file, replacing it in one step"""
+        path = path or self.path
+        parts = [ORACLE_HEADER.pack(ORACLE_MAGIC, ORACLE_FILE_VERSION, len(self.cache))]
+        for (start, counts, hits_soft_17), distribution in self.cache.items():
+            parts.append(bytes((len(start),) + start))
+            parts.append(ORACLE_ENTRY.pack(*counts, hits_soft_17, *distribution))
+        with open(path + '.tmp', 'wb') as f:
+            f.write(b''.join(parts))
+        os.replace(path + '.tmp', path)
+        self.pending = {}
@@ -0,0 +1,208 @@
+"""Exact expected return of a strategy, by recursion over shoe compositions
+
+Rounds are partitioned by the dealer's starting cards: the upcard, or both cards when
+they are dealt face up. Each partition is evaluated independently, across a process
+pool, and weighted by its probability. Within a partition every starting hand is played
+out by recursion over the cards left in the shoe, with the expected value of each hand
+memoized by its cards, and for split hands the pair split. Dealer distributions are shared
+through a DealerOracle, which can be kept in a file so later runs skip them.
+
+Two approximations keep the recursion small. A split is valued as two independent one
+card hands drawing from the same cards, and the chance of suited bonus hands is taken
+from a full shoe."""
+from concurrent.futures import ProcessPoolExecutor
+
+from src.analysis.dealer import DealerOracle
+from src.analysis.rules import GameRules
+from src.game.enums import PlayerAction
+from src.game.states import HandState
+
+
+def draws(counts) -> []:
+    """(value, probability) for each card value that can be drawn from counts"""
+    remaining = sum(counts)
+    return [(index + 1, count / remaining) for index, count in enumerate(counts) if count]
+
+
+def starting_pairs(counts) -> []:
+    """(values, probability) for each unordered pair of card values dealt from counts"""
+    remaining = sum(counts)
+    pairs = []
+    for first in range(0, 10):
+        for second in range(first, 10):
+            ways = counts[first] * (counts[second] - (first == second))
+            if ways:
+                pairs.append(((first + 1, second + 1),
+                              ways * (1 if first == second else 2) / (remaining * (remaining - 1))))
+    return pairs
+
+
+def dealer_starts(rules: GameRules) -> []:
+    """(dealer values, probability) for each partition of the rounds"""
+    if rules.dealer_cards_visible:
+        return starting_pairs(rules.counts)
+    return [((value,), probability) for value, probability in draws(rules.counts)]
+
+
+def remove(counts, values) -> list:
+    counts = list(counts)
+    for value in values:
+        counts[value - 1] -= 1
+    return counts
+
+
+class HandEvaluator:
+    """Expected net result of the player hands played with a strategy against one dealer start"""
+
+    def __init__(self, rules: GameRules, strategy, dealer_values: tuple, oracle: DealerOracle = None):
+        self.rules = rules
+        self.oracle = oracle if oracle is not None else DealerOracle()
+        self.strategy = strategy
+        if strategy is not None:
+            strategy.setup(rules.game_type, rules.shoe_size)
+        self.dealer_values = dealer_values
+        self.dealer_key = rules.dealer_key(dealer_values)
+        self.counts = remove(rules.counts, dealer_values)
+        self.memo = {}
+
+    def expected_value(self) -> float:
+        """Expected net result of a round, per initial bet"""
+        total = 0.0
+        for values, probability in starting_pairs(self.counts):
+            counts = remove(self.counts, values)
+            total += probability * self.hand_value(values, counts, 0)
+        return total / self.rules.bet
+
+    def stand_value(self, values: tuple, counts, doubled: bool) -> float:
+        """Expected net result of standing on a hand"""
+        rules = self.rules
+        bet = rules.bet * 2 if doubled else rules.bet
+        distribution = self.oracle.distribution(self.dealer_values, tuple(counts), rules.hits_soft_17)
+        suited = rules.suited_probability(values) if rules.has_suited_payout(values) else 0.0
+
+        payouts = rules.payouts(values, doubled)
+        if suited:
+            payouts = [payout + suited * (suited_payout - payout)
+                       for payout, suited_payout in zip(payouts, rules.payouts(values, doubled, True))]
+        return sum(probability * payout for probability, payout in zip(distribution, payouts)) - bet
+
+    def hand_value(self, values: tuple, counts, split: int, same_rank: bool = None) -> float:
+        """Expected net result of a hand played by the strategy, drawing from counts. split is
+           the value of the pair split into this hand, 0 if it was not split. Hands are memoized
+           by their values, which with the pair split determine the counts"""
+        if len(values) == 2 and values[0] == values[1] == 10 and same_rank is None:
+            # Two ten valued cards are a pair only if they are of the same rank
+            same = self.rules.ten_pair_same_rank
+            return same * self.hand_value(values, counts, split, True) + \
+                (1 - same) * self.hand_value(values, counts, split, False)
+
+        key = (values, split, same_rank)
+        value = self.memo.get(key)
+        if value is not None:
+            return value
+
+        hard = sum(values)
+        soft = 1 in values and hard <= 11
+        pair = values[0] if len(values) == 2 and values[0] == values[1] and same_rank is not False else 0
+        state = HandState(hard + 10 if soft else hard, soft, pair, len(values), len(values) == 2)
+
+        value = self.decide(key, state, values, counts, split)
+        self.memo[key] = value
+        return value
+
+    def decide(self, key: tuple, state: HandState, values: tuple, counts, split: int) -> float:
+        """Expected net result of the action the strategy takes on a hand"""
+        return self.action_value(self.strategy.decide_state(state, self.dealer_key), state, values, counts, split)
+
+    def action_value(self, action: PlayerAction, state: HandState, values: tuple, counts, split: int) -> float:
+        """Expected net result of an action on a hand. As in the engine, a double down or split
+           the hand does not allow is played as a hit"""
+        rules = self.rules
+        hard = sum(values)
+
+        if action is PlayerAction.STAND:
+            return self.stand_value(values, counts, False)
+        elif action is PlayerAction.SPLIT and state.pair and not split:
+            return 2 * self.hand_value((values[0],), counts, values[0])
+        elif action is PlayerAction.DOUBLE and len(values) == 2 and rules.can_double(values):
+            value = 0.0
+            for card, probability in draws(counts):
+                doubled = tuple(sorted(values + (card,)))
+                counts[card - 1] -= 1
+                value += probability * (-2 * rules.bet if hard + card > 21 else
+                                        self.stand_value(doubled, counts, True))
+                counts[card - 1] += 1
+            return value
+
+        value = 0.0
+        for card, probability in draws(counts):
+            drawn = tuple(sorted(values + (card,)))
+            counts[card - 1] -= 1
+            value += probability * (-rules.bet if hard + card > 21 else
+                                    self.hand_value(drawn, counts, split))
+            counts[card - 1] += 1
+        return value
+
+
+class OptimalEvaluator(HandEvaluator):
+    """Hand evaluator that takes the action with the highest expected value on every hand,
+       knowing the cards in it. The values of all actions are kept by hand in action_values"""
+
+    def __init__(self, rules: GameRules, dealer_values: tuple, oracle: DealerOracle = None):
+        super().__init__(rules, None, dealer_values, oracle)
+        self.action_values = {}
+
+    def decide(self, key: tuple, state: HandState, values: tuple, counts, split: int) -> float:
+        hit = self.action_value(PlayerAction.HIT, state, values, counts, split)
+        action_values = {action: hit if action is PlayerAction.HIT else
+                         self.action_value(action, state, values, counts, split) for action in PlayerAction}
+        self.action_values[key] = (state, action_values)
+        return max(action_values.values())
+
+
+def dealer_start_value(game_type, shoe_size: int, strategy, dealer_values: tuple, bet: float = 1,
+                       oracle: DealerOracle = None) -> float:
+    """Expected net result per initial bet of the rounds with the given dealer starting cards"""
+    return HandEvaluator(GameRules(game_type, shoe_size, bet), strategy, dealer_values, oracle).expected_value()
+
+
+# Oracle of a pool worker process, loaded once per process by init_worker
+_worker_oracle = None
+
+
+def init_worker(oracle_path: str = None) -> None:
+    global _worker_oracle
+    _worker_oracle = DealerOracle(path=oracle_path)
+
+
+def dealer_start_task(game_type, shoe_size: int, strategy, dealer_values: tuple, bet: float = 1) -> tuple:
+    """dealer_start_value in a pool worker, also returning the dealer distributions it computed"""
+    value = dealer_start_value(game_type, shoe_size, strategy, dealer_values, bet, _worker_oracle)
+    return value, _worker_oracle.take_pending()
+
+
+def expected_return(game_type, strategy, shoe_size: int = 6, bet: float = 1, workers: int = None,
+                    oracle_path: str = None) -> float:
+    """Exact expected net result per initial bet of a StateStrategy from a freshly shuffled shoe,
+       a negative return is the house edge. Dealer starts are evaluated across a process pool.
+       With oracle_path, dealer distributions are loaded from and saved to that file"""
+    starts = dealer_starts(GameRules(game_type, shoe_size, bet))
+    oracle = DealerOracle(path=oracle_path)
+    strategy.setup(game_type, shoe_size)
+
+    if workers == 1:
+        value = sum(probability * dealer_start_value(game_type, shoe_size, strategy, values, bet, oracle)
+                    for values, probability in starts)
+    else:
+        with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(oracle_path,)) as executor:
+            futures = [(probability, executor.submit(dealer_start_task, game_type, shoe_size, strategy, values, bet))
+                       for values, probability in starts]
+            value = 0.0
+            for probability, future in futures:
+                start_value, distributions = future.result()
+                oracle.update(distributions)
+                value += probability * start_value
+
+    if oracle_path and oracle.pending:
+        oracle.save()
+    return value
@@ -0,0 +1,131 @@
+"""Payout, doubling and shoe rules of a game variant, taken from the game classes
+
+The exact analysis works with card values rather than cards. GameRules builds small
+synthetic hands from those values and settles them with the game's own winner_outcome,
+hand_winnings and double_down, so the analysis always pays what the engine pays."""
+from src.card.codes import COMPOSITION_CODES, CODE_VALUES, PLAYING_SUITS, RANKS, encode, rank_of
+from src.card.entities import CARDS
+from src.card.enums import CardSuit, CardValue
+from src.game.entities import Hand
+from src.game.enums import GameWinner, PlayerHandStatus
+from src.game.states import dealer_state_key
+from src.analysis.dealer import DEALER_OUTCOMES
+
+# Card values 1 to 10 by index, ten valued cards are played as kings
+VALUE_CARDS = (CardValue.ACE, CardValue.TWO, CardValue.THREE, CardValue.FOUR, CardValue.FIVE,
+               CardValue.SIX, CardValue.SEVEN, CardValue.EIGHT, CardValue.NINE, CardValue.KING)
+
+# A dealer hand for each outcome in DEALER_OUTCOMES, by card value
+DEALER_HANDS = {
+    (21, True, False): (1, 10),
+    (17, False, True): (7, 10),
+    (22, False, True): (7, 10, 5),
+    (17, False, False): (10, 4, 3),
+    (21, False, False): (10, 5, 6),
+    (22, False, False): (10, 10, 2),
+}
+DEALER_HANDS.update({(total, False, True): (7, 10, total - 17) for total in range(18, 22)})
+DEALER_HANDS.update({(total, False, False): (10, total - 10) for total in range(18, 21)})
+
+
+def shoe_counts(composition, size: int) -> tuple:
+    """Card counts by value of a shoe, index 0 for aces up to 9 for ten valued cards"""
+    counts = [0] * 10
+    for code in COMPOSITION_CODES[composition]:
+        if CODE_VALUES[code]:
+            counts[CODE_VALUES[code] - 1] += size
+    return tuple(counts)
+
+
+def falling_factorial(count: int, length: int) -> int:
+    result = 1
+    for index in range(0, length):
+        result *= count - index
+    return result
+
+
+class GameRules:
+    """Rules of a game variant for the exact analysis"""
+
+    def __init__(self, game_type, shoe_size: int = 6, bet: float = 1):
+        self.game_type = game_type
+        self.shoe_size = shoe_size
+        self.bet = bet
+        self.hits_soft_17 = game_type.dealer_hits_soft_17
+        self.dealer_cards_visible = game_type.dealer_cards_visible
+        self.counts = shoe_counts(game_type.shoe_composition, shoe_size)
+
+        # Rank counts of a full shoe, for the chance of suited hands and same rank pairs
+        self.rank_counts = [0] * len(RANKS)
+        for code in COMPOSITION_CODES[game_type.shoe_composition]:
+            self.rank_counts[rank_of(code)] += shoe_size
+        tens = [count for rank, count in enumerate(self.rank_counts) if CODE_VALUES[rank] == 10]
+        self.ten_pair_same_rank = sum(count * (count - 1) for count in tens) / \
+            (sum(tens) * (sum(tens) - 1)) if sum(tens) > 1 else 1.0
+
+        self.game = game_type(1, float('inf'), False)
+        self.game.headless = True
+        self.dealer_hands = [self.fill_hand(Hand(), DEALER_HANDS[outcome]) for outcome in DEALER_OUTCOMES]
+        self.payout_cache = {}
+        self.double_cache = {}
+
+    def fill_hand(self, hand, values: tuple, suited: bool = False):
+        """Fill a game hand with cards of the given values, all hearts if suited"""
+        suits = (CardSuit.HEARTS,) if suited else (CardSuit.HEARTS, CardSuit.CLUBS)
+        hand.reset()
+        hand.cards = [CARDS[encode(VALUE_CARDS[value - 1], suits[index % len(suits)])]
+                      for index, value in enumerate(values)]
+        return hand
+
+    def payouts(self, values: tuple, doubled: bool = False, suited: bool = False) -> tuple:
+        """Amount returned for a player hand that stood, for each final dealer hand in DEALER_OUTCOMES"""
+        key = (values, doubled, suited)
+        payouts = self.payout_cache.get(key)
+        if payouts is None:
+            game = self.game
+            hand = self.fill_hand(game.player.hand, values, suited)
+            hand.double_down = doubled
+            total = hand.total()
+            payouts = []
+            for dealer in self.dealer_hands:
+                hand.bet = self.bet * 2 if doubled else self.bet
+                hand.outcome = game.winner_outcome(total, dealer.total())
+                game.dealer.hand = dealer
+                payouts.append(game.hand_winnings(hand) if hand.outcome in (GameWinner.PLAYER, GameWinner.DRAW)
+                               else 0)
+            payouts = self.payout_cache[key] = tuple(payouts)
+        return payouts
+
+    def has_suited_payout(self, values: tuple) -> bool:
+        """Return True if any payout of the hand depends on the cards being of one suit"""
+        return len(values) == 3 and self.payouts(values) != self.payouts(values, suited=True)
+
+    def suited_probability(self, values: tuple) -> float:
+        """Chance that cards of the given values are all of one suit, from a full shoe"""
+        probability = float(len(PLAYING_SUITS))
+        for value in set(values):
+            rank = RANKS.index(VALUE_CARDS[value - 1])
+            count = self.rank_counts[rank]
+            drawn = values.count(value)
+            probability *= falling_factorial(count // len(PLAYING_SUITS), drawn) / falling_factorial(count, drawn)
+        return probability
+
+    def can_double(self, values: tuple) -> bool:
+        """Return True if the game lets a two card hand of these values double down"""
+        allowed = self.double_cache.get(values)
+        if allowed is None:
+            player = self.game.player
+            self.fill_hand(player.hand, values)
+            player.hand.bet = self.bet
+            player.status = PlayerHandStatus.IN_PLAY
+            self.game.double_down()
+            allowed = self.double_cache[values] = player.hand.double_down
+        return allowed
+
+    def dealer_key(self, dealer_values: tuple) -> int:
+        """Dealer key a strategy sees for the dealer's starting cards, see Blackjack.dealer_key"""
+        if not self.dealer_cards_visible:
+            return dealer_values[0]
+        hard = sum(dealer_values)
+        soft = 1 in dealer_values and hard <= 11
+        return dealer_state_key(hard + 10 if soft else hard, soft)
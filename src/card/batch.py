@@ -0,0 +1,47 @@
+"""Batches of shuffled shoes as NumPy arrays for simulation workloads"""
+import numpy as np
+
+from src.card.codes import CODE_VALUES, COMPOSITION_CODES, RANK_MASK, SUIT_SHIFT
+from src.card.enums import DeckComposition
+from src.card.seeding import SeedStream
+
+CODE_VALUE_TABLE = np.array(CODE_VALUES, dtype=np.int8)
+
+
+def make_generator(rng=None) -> np.random.Generator:
+    """NumPy generator from a generator, a SeedStream, a seed or None for fresh entropy"""
+    if isinstance(rng, np.random.Generator):
+        return rng
+    elif isinstance(rng, SeedStream):
+        return np.random.default_rng(rng.entropy())
+    return np.random.default_rng(rng)
+
+
+def shoe_template(size: int = 1, composition: DeckComposition = DeckComposition.STANDARD) -> np.ndarray:
+    """Unshuffled card codes of a shoe with the specified number of decks"""
+    return np.frombuffer(COMPOSITION_CODES[composition] * size, dtype=np.uint8)
+
+
+def shuffled_shoes(n_shoes: int, size: int = 1, composition: DeckComposition = DeckComposition.STANDARD,
+                   rng=None) -> np.ndarray:
+    """Array of shape (n_shoes, cards_per_shoe) holding independently shuffled card codes.
+       Each row is dealt from index 0"""
+    template = shoe_template(size, composition)
+    shoes = np.broadcast_to(template, (n_shoes, len(template)))
+
+    return make_generator(rng).permuted(shoes, axis=1)
+
+
+def card_values(codes: np.ndarray) -> np.ndarray:
+    """Numerical card values for an array of card codes, aces count 1"""
+    return CODE_VALUE_TABLE[codes]
+
+
+def card_ranks(codes: np.ndarray) -> np.ndarray:
+    """Rank indexes for an array of card codes"""
+    return codes & RANK_MASK
+
+
+def card_suits(codes: np.ndarray) -> np.ndarray:
+    """Suit indexes for an array of card codes"""
+    return codes >> SUIT_SHIFT
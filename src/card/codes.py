@@ -0,0 +1,61 @@
+"""Compact integer card codes
+
+A card code packs the suit index into the high nibble and the rank index into the
+low nibble, so every card fits in a single byte and collections of cards can be
+held in a bytearray."""
+from src.card.enums import CardSuit, CardValue, DeckComposition
+
+SUITS = tuple(CardSuit)
+RANKS = tuple(CardValue)
+
+SUIT_INDEX = {suit: index for index, suit in enumerate(SUITS)}
+RANK_INDEX = {value: index for index, value in enumerate(RANKS)}
+
+SUIT_SHIFT = 4
+RANK_MASK = (1 << SUIT_SHIFT) - 1
+CODE_COUNT = len(SUITS) << SUIT_SHIFT
+
+JOKER_SUIT = SUIT_INDEX[CardSuit.JOKER]
+JOKER_RANK = RANK_INDEX[CardValue.JOKER]
+ACE_RANK = RANK_INDEX[CardValue.ACE]
+TEN_RANK = RANK_INDEX[CardValue.TEN]
+PLAYING_SUITS = tuple(SUIT_INDEX[suit] for suit in SUITS if suit is not CardSuit.JOKER)
+
+# Numerical value by rank index: joker 0, ace 1, two to ten face value, court cards 10
+RANK_VALUES = tuple(0 if value is CardValue.JOKER else
+                    1 if value is CardValue.ACE else
+                    10 if value in (CardValue.JACK, CardValue.QUEEN, CardValue.KING) else
+                    int(value.value) for value in RANKS)
+
+
+def encode(value: CardValue, suit: CardSuit) -> int:
+    """Code for a card value and suit"""
+    return SUIT_INDEX[suit] << SUIT_SHIFT | RANK_INDEX[value]
+
+
+def suit_of(code: int) -> int:
+    """Suit index of a card code"""
+    return code >> SUIT_SHIFT
+
+
+def rank_of(code: int) -> int:
+    """Rank index of a card code"""
+    return code & RANK_MASK
+
+
+# Numerical value by card code
+CODE_VALUES = tuple(RANK_VALUES[rank_of(code)] if rank_of(code) < len(RANKS) else 0
+                    for code in range(CODE_COUNT))
+
+# Codes for one 52 card deck, ordered by value then diamonds, clubs, hearts, spades
+DECK_CODES = bytes(encode(value, suit)
+                   for value in RANKS if value is not CardValue.JOKER
+                   for suit in (CardSuit.DIAMONDS, CardSuit.CLUBS, CardSuit.HEARTS, CardSuit.SPADES))
+JOKER_CODE = encode(CardValue.JOKER, CardSuit.JOKER)
+
+# Codes for one deck of each composition, a Spanish deck has no tens
+COMPOSITION_CODES = {
+    DeckComposition.STANDARD: DECK_CODES,
+    DeckComposition.JOKER: DECK_CODES + bytes((JOKER_CODE,)),
+    DeckComposition.SPANISH: bytes(code for code in DECK_CODES if rank_of(code) != TEN_RANK),
+}
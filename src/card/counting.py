@@ -0,0 +1,95 @@
+"""Card counting systems and a running count kept as cards are dealt from a shoe"""
+from bisect import bisect_right
+
+from src.card.codes import CODE_COUNT, CODE_VALUES, COMPOSITION_CODES
+
+
+class CountingSystem:
+    """Tags of a counting system by card value, 1 for aces to 10. Balanced systems bet on the
+       true count, unbalanced ones on the running count. Every count starts at pivot, 0 for
+       balanced systems, less the tags of the whole shoe, so it reaches pivot once the shoe is
+       dealt out. A system balanced for a standard deck is not for a Spanish shoe, which has
+       no tens, and starts below zero there"""
+
+    def __init__(self, name: str, tags: dict, balanced: bool = True, pivot: int = 0):
+        self.name = name
+        self.tags = tags
+        self.balanced = balanced
+        self.pivot = pivot
+        # Tag by card code, so a dealt card is counted with a single lookup
+        self.code_tags = tuple(tags.get(CODE_VALUES[code], 0) for code in range(CODE_COUNT))
+
+    def initial_count(self, codes) -> int:
+        """Running count of a full shoe holding codes"""
+        return self.pivot - sum(self.code_tags[code] for code in codes)
+
+
+COUNTING_SYSTEMS = {
+    'hi-lo': CountingSystem('Hi-Lo', {2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 10: -1, 1: -1}),
+    'ko': CountingSystem('KO', {2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 1, 10: -1, 1: -1}, balanced=False, pivot=4),
+    'omega-ii': CountingSystem('Omega II', {2: 1, 3: 1, 4: 2, 5: 2, 6: 2, 7: 1, 9: -1, 10: -2}),
+}
+
+
+class CountTracker:
+    """Running count, decks remaining and true count of a shoe, updated in O(1) per card
+       dealt and restarted when the shoe is reset"""
+
+    def __init__(self, system: CountingSystem, shoe=None):
+        self.system = system
+        self.shoe = None
+        self.running_count = 0
+        self.cards_remaining = 0
+        self.deck_size = 52
+        if shoe is not None:
+            self.attach(shoe)
+
+    def attach(self, shoe) -> None:
+        """Count the cards dealt from a shoe, starting from its current cards"""
+        self.shoe = shoe
+        shoe.watchers.append(self.card_dealt)
+        shoe.notifier.subscribe("reset", self.reset)
+        self.deck_size = len(COMPOSITION_CODES[shoe.composition])
+
+        tags = self.system.code_tags
+        self.reset()
+        # Count the cards already dealt, the full shoe less the cards left in it
+        self.running_count += sum(tags[code] for code in shoe.template(shoe.size, shoe.composition).codes) - \
+            sum(tags[code] for code in shoe.codes)
+        self.cards_remaining = shoe.remaining()
+
+    def reset(self) -> None:
+        """Restart the count for a full shoe"""
+        template = self.shoe.template(self.shoe.size, self.shoe.composition)
+        self.running_count = self.system.initial_count(template.codes)
+        self.cards_remaining = len(template)
+
+    def card_dealt(self, code: int) -> None:
+        self.running_count += self.system.code_tags[code]
+        self.cards_remaining -= 1
+
+    def decks_remaining(self) -> float:
+        return self.cards_remaining / self.deck_size
+
+    def true_count(self) -> float:
+        """Running count per deck remaining"""
+        return self.running_count / max(self.decks_remaining(), 0.5)
+
+    def count(self) -> float:
+        """Count the system bets on, the true count if balanced and the running count if not"""
+        return self.true_count() if self.system.balanced else self.running_count
+
+
+class BetRamp:
+    """Bet for a count, in units. Steps are (count, units) pairs in increasing count order,
+       the bet is the units of the last step the count reaches, or minimum below the first"""
+
+    def __init__(self, steps=((1, 2), (2, 4), (3, 6), (4, 8)), unit: float = 1, minimum: float = 1):
+        self.counts = [count for count, _ in steps]
+        self.units = [units for _, units in steps]
+        self.unit = unit
+        self.minimum = minimum
+
+    def bet(self, count: float) -> float:
+        step = bisect_right(self.counts, count)
+        return self.unit * (self.units[step - 1] if step else self.minimum)
@@ -1,109 +1,271 @@
 """Playing deck and blackjack entities"""
-from random import shuffle
-from colorama import Fore, Style
-from EventNotifier import Notifier
+from collections.abc import Sequence
+from functools import lru_cache
+from random import Random, shuffle
 
-from src.card.enums import CardSuit, CardValue
+from src.card.codes import SUITS, RANKS, SUIT_INDEX, RANK_INDEX, SUIT_SHIFT, RANK_MASK, CODE_COUNT, CODE_VALUES, \
+    COMPOSITION_CODES, JOKER_SUIT, encode, suit_of, rank_of
+from src.card.enums import CardSuit, CardValue, DeckComposition
+from src.card.seeding import SeedStream, make_random, make_stream
+from src.lazy import lazy_import
+
+# Only needed to display cards and to notify of shoe resets
+colorama = lazy_import('colorama')
+EventNotifier = lazy_import('EventNotifier')
 
 
 class Card:
     """Generic card"""
+    __slots__ = ('value', 'suit', 'code')
 
     def __init__(self, value, suit):
         self.suit = suit
         self.value = value
+        self.code = encode(value, suit)
+
+    def __eq__(self, other):
+        if isinstance(other, Card):
+            return self.code == other.code
+        return NotImplemented
+
+    def __hash__(self):
+        return self.code
+
+    def __str__(self):
+        return card_glyphs()[self.code]
+
+    def glyph(self) -> str:
+        """Coloured display string for the card"""
+        return self.value.value
 
     def numerical_value(self) -> int:
         """Numerical value of card"""
-        if self.value is CardValue.JOKER:
-            card_num_value = 0
-        elif self.value is CardValue.ACE:
-            card_num_value = 1
-        elif self.value in (CardValue.JACK, CardValue.QUEEN, CardValue.KING):
-            card_num_value = 10
-        else:
-            card_num_value = int(self.value.value)
-        return card_num_value
+        return CODE_VALUES[self.code]
 
 
 class Joker(Card):
     """Joker card"""
+    __slots__ = ()
 
     def __init__(self):
         super().__init__(CardValue.JOKER, CardSuit.JOKER)
 
-    def __str__(self):
-        return f"{Fore.GREEN + Style.BRIGHT}🃏{self.value.value}" + Style.RESET_ALL
+    def glyph(self) -> str:
+        """Coloured display string for the card"""
+        return f"{colorama.Fore.GREEN + colorama.Style.BRIGHT}🃏{self.value.value}" + colorama.Style.RESET_ALL
 
 
 class Diamonds(Card):
     """Diamonds suit card"""
+    __slots__ = ()
 
     def __init__(self, value):
         super().__init__(value, CardSuit.DIAMONDS)
 
-    def __str__(self):
-        return f"{Fore.RED + Style.BRIGHT}♦{self.value.value}" + Style.RESET_ALL
+    def glyph(self) -> str:
+        """Coloured display string for the card"""
+        return f"{colorama.Fore.RED + colorama.Style.BRIGHT}♦{self.value.value}" + colorama.Style.RESET_ALL
 
 
 class Hearts(Card):
     """Hearts suit card"""
+    __slots__ = ()
 
     def __init__(self, value):
         super().__init__(value, CardSuit.HEARTS)
 
-    def __str__(self):
-        return f"{Fore.RED + Style.BRIGHT}♥{self.value.value}" + Style.RESET_ALL
+    def glyph(self) -> str:
+        """Coloured display string for the card"""
+        return f"{colorama.Fore.RED + colorama.Style.BRIGHT}♥{self.value.value}" + colorama.Style.RESET_ALL
 
 
 class Clubs(Card):
     """Clubs suit card"""
+    __slots__ = ()
 
     def __init__(self, value):
         super().__init__(value, CardSuit.CLUBS)
 
-    def __str__(self):
-        return f"{Fore.BLACK + Style.BRIGHT}♣︎{self.value.value}" + Style.RESET_ALL
+    def glyph(self) -> str:
+        """Coloured display string for the card"""
+        return f"{colorama.Fore.BLACK + colorama.Style.BRIGHT}♣︎{self.value.value}" + colorama.Style.RESET_ALL
 
 
 class Spades(Card):
     """Spades suit card"""
+    __slots__ = ()
 
     def __init__(self, value):
         super().__init__(value, CardSuit.SPADES)
 
-    def __str__(self):
-        return f"{Fore.BLACK + Style.BRIGHT}♠{self.value.value}" + Style.RESET_ALL
+    def glyph(self) -> str:
+        """Coloured display string for the card"""
+        return f"{colorama.Fore.BLACK + colorama.Style.BRIGHT}♠{self.value.value}" + colorama.Style.RESET_ALL
+
+
+# Interned card instances indexed by card code
+SUIT_CARD_TYPES = {CardSuit.DIAMONDS: Diamonds, CardSuit.HEARTS: Hearts,
+                   CardSuit.CLUBS: Clubs, CardSuit.SPADES: Spades}
+
+
+def _interned_card(code: int):
+    """Build the shared card instance for a card code"""
+    if rank_of(code) >= len(RANKS):
+        return None
+
+    suit = SUITS[suit_of(code)]
+    value = RANKS[rank_of(code)]
+
+    if suit in SUIT_CARD_TYPES:
+        return SUIT_CARD_TYPES[suit](value)
+    elif value is CardValue.JOKER:
+        return Joker()
+
+    return Card(value, suit)
+
+
+CARDS = tuple(_interned_card(code) for code in range(CODE_COUNT))
+SUIT_CODES = tuple(bytes(code for code in range(CODE_COUNT) if CARDS[code] is not None and suit_of(code) == suit)
+                   for suit in range(len(SUITS)))
+RANK_CODES = tuple(bytes(code for code in range(CODE_COUNT) if CARDS[code] is not None and rank_of(code) == rank)
+                   for rank in range(RANK_MASK + 1))
+
+
+@lru_cache(maxsize=None)
+def card_glyphs() -> tuple:
+    """Display strings indexed by card code, rendered once per process when first shown"""
+    return tuple('' if card is None else card.glyph() for card in CARDS)
+
+
+class CardView(Sequence):
+    """Read only view of the cards held as codes in a collection"""
+    __slots__ = ('codes',)
+
+    def __init__(self, codes: bytearray):
+        self.codes = codes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [CARDS[code] for code in self.codes[index]]
+        return CARDS[self.codes[index]]
+
+    def __iter__(self):
+        return map(CARDS.__getitem__, self.codes)
+
+
+def count_codes(codes) -> tuple:
+    """Per code, per suit and per rank counts for a sequence of card codes"""
+    code_counts = [0] * CODE_COUNT
+    suit_counts = [0] * len(SUITS)
+    rank_counts = [0] * (RANK_MASK + 1)
+
+    for code in codes:
+        code_counts[code] += 1
+        suit_counts[code >> SUIT_SHIFT] += 1
+        rank_counts[code & RANK_MASK] += 1
+
+    return code_counts, suit_counts, rank_counts
+
+
+class CardTemplate:
+    """Immutable composition of cards with precomputed counts, used to refill a collection"""
+    __slots__ = ('codes', 'code_counts', 'suit_counts', 'rank_counts')
+
+    def __init__(self, codes: bytes):
+        self.codes = bytes(codes)
+        self.code_counts, self.suit_counts, self.rank_counts = \
+            (tuple(counts) for counts in count_codes(self.codes))
+
+    def __len__(self):
+        return len(self.codes)
+
+
+EMPTY_TEMPLATE = CardTemplate(b'')
 
 
 class CardCollection:
-    """Collection of blackjack and associated logic"""
+    """Collection of blackjack and associated logic. Cards are held as a bytearray of card codes
+       alongside per code, per suit and per rank counts kept up to date on every change"""
+    rng: Random = None
 
     def __init__(self, cards: []):
-        self.cards = cards
+        self.codes = bytearray(card.code for card in cards)
+
+    @property
+    def codes(self) -> bytearray:
+        """Card codes in the collection, last code is the top card"""
+        return self._codes
+
+    @codes.setter
+    def codes(self, codes: bytearray) -> None:
+        self._codes = codes
+        self.code_counts, self.suit_counts, self.rank_counts = count_codes(codes)
+        self.counts_changed()
+
+    @property
+    def cards(self) -> CardView:
+        """Cards in the collection"""
+        return CardView(self._codes)
+
+    @cards.setter
+    def cards(self, cards: []) -> None:
+        self.codes = bytearray(card.code for card in cards)
+
+    def fill(self, template: CardTemplate) -> None:
+        """Replace the cards in place with the cards of a template, in template order"""
+        self._codes[:] = template.codes
+        self.code_counts[:] = template.code_counts
+        self.suit_counts[:] = template.suit_counts
+        self.rank_counts[:] = template.rank_counts
+        self.counts_changed()
+
+    def load(self, codes: bytes, code_counts, suit_counts, rank_counts) -> None:
+        """Replace the cards in place with codes, in order, given their per code, per suit and
+           per rank counts, e.g. from a snapshot, so the codes are not counted again"""
+        self._codes[:] = codes
+        self.code_counts[:] = code_counts
+        self.suit_counts[:] = suit_counts
+        self.rank_counts[:] = rank_counts
+        self.counts_changed()
+
+    def counts_changed(self) -> None:
+        """Called after the counts are rebuilt rather than updated card by card"""
 
     def shuffle_cards(self) -> None:
-        """Shuffle the deck"""
-        shuffle(self.cards)
+        """Shuffle the deck with the collection generator, or the global one if not set"""
+        if self.rng is None:
+            shuffle(self._codes)
+        else:
+            self.rng.shuffle(self._codes)
 
     def deal(self) -> Card:
         """Deal one card from deck"""
-        return self.cards.pop()
+        code = self._codes.pop()
+        self.code_counts[code] -= 1
+        self.suit_counts[code >> SUIT_SHIFT] -= 1
+        self.rank_counts[code & RANK_MASK] -= 1
+        return CARDS[code]
 
     def add(self, card: Card) -> None:
         """Add a card to the deck"""
-        self.cards.append(card)
+        code = card.code
+        self._codes.append(code)
+        self.code_counts[code] += 1
+        self.suit_counts[code >> SUIT_SHIFT] += 1
+        self.rank_counts[code & RANK_MASK] += 1
 
-    def remove(self, *args):
-        """Remove a card from the deck"""
+    @staticmethod
+    def _card_args(args) -> tuple:
+        """Split arguments into a card, a card suit and a card value"""
         card = None
         card_suit = None
         card_value = None
 
-        cards_to_remove = []
-
         for arg in args:
-            if type(arg) == Card or issubclass(type(arg), Card):
+            if isinstance(arg, Card):
                 card = arg
                 break
             elif type(arg) == CardSuit:
@@ -111,95 +273,88 @@ class CardCollection:
             elif type(arg) == CardValue:
                 card_value = arg
 
+        return card, card_suit, card_value
+
+    def _matching_codes(self, *args) -> bytes:
+        """Card codes matching a card, a suit and/or a value"""
+        card, card_suit, card_value = self._card_args(args)
+
         if card is not None:
-            cards_to_remove = list(filter(lambda target: target.value == card.value \
-                                    and target.suit == card.suit, self.cards))
+            return bytes((card.code,))
         elif card_suit is not None and card_value is not None:
-            cards_to_remove = list(filter(lambda target: target.value == card_value \
-                                     and target.suit == card_suit, self.cards))
+            return bytes((encode(card_value, card_suit),))
         elif card_suit is not None:
-            cards_to_remove = list(filter(lambda target: target.suit == card_suit, self.cards))
+            return SUIT_CODES[SUIT_INDEX[card_suit]]
         elif card_value is not None:
-            cards_to_remove = list(filter(lambda target: target.value == card_value, self.cards))
+            return RANK_CODES[RANK_INDEX[card_value]]
 
-        if len(cards_to_remove) > 0:
-            for card in cards_to_remove:
-                self.cards.remove(card)
+        return b''
+
+    def remove(self, *args):
+        """Remove a card from the deck"""
+        if self.count(*args) > 0:
+            matching_codes = self._matching_codes(*args)
+            self._codes = self._codes.translate(None, matching_codes)
+
+            for code in matching_codes:
+                self.suit_counts[code >> SUIT_SHIFT] -= self.code_counts[code]
+                self.rank_counts[code & RANK_MASK] -= self.code_counts[code]
+                self.code_counts[code] = 0
+
+            self.counts_changed()
+
+    def count(self, *args) -> int:
+        """Number of cards in the collection matching a card, a suit and/or a value"""
+        card, card_suit, card_value = self._card_args(args)
+
+        if card is not None:
+            return self.code_counts[card.code]
+        elif card_suit is not None and card_value is not None:
+            return self.code_counts[encode(card_value, card_suit)]
+        elif card_suit is not None:
+            return self.suit_counts[SUIT_INDEX[card_suit]]
+        elif card_value is not None:
+            return self.rank_counts[RANK_INDEX[card_value]]
+
+        return 0
 
     def total(self) -> int:
         """Total up card value in collection"""
-        total = 0
-        for card in self.cards:
-            total += card.numerical_value()
-        return total
+        return sum(CODE_VALUES[code] for code in self._codes)
 
     def remaining(self) -> int:
         """Return remaining blackjack in deck"""
-        return len(self.cards)
+        return len(self._codes)
 
     def reset(self) -> None:
         """Regenerate the deck of blackjack"""
-        self.cards = []
+        self.fill(EMPTY_TEMPLATE)
 
     def has_card(self, *args) -> bool:
-        """Remove a card from the deck"""
-        card = None
-        card_suit = None
-        card_value = None
-
-        exists = False
-
-        for arg in args:
-            if type(arg) == Card or issubclass(type(arg), Card):
-                card = arg
-                break
-            elif type(arg) == CardSuit:
-                card_suit = arg
-            elif type(arg) == CardValue:
-                card_value = arg
-
-        if card is not None:
-            exists = len(list(filter(lambda target: target.value == card.value \
-                                    and target.suit == card.suit, self.cards))) > 0
-        elif card_suit is not None and card_value is not None:
-            exists = len(list(filter(lambda target: target.value == card_value \
-                                     and target.suit == card_suit, self.cards))) > 0
-        elif card_suit is not None:
-            exists = len(list(filter(lambda target: target.suit == card_suit, self.cards))) > 0
-        elif card_value is not None:
-            exists = len(list(filter(lambda target: target.value == card_value, self.cards))) > 0
-
-        return exists
+        """Return True if a matching card is in the collection"""
+        return self.count(*args) > 0
 
     def all_same_suit(self) -> bool:
         """Returns True if all cards in collection are the same suit"""
-        card_in_collection = len(self.cards)
-
-        diamonds_count = len(list(filter(lambda target: target.suit == CardSuit.DIAMONDS, self.cards)))
-        clubs_count = len(list(filter(lambda target: target.suit == CardSuit.CLUBS, self.cards)))
-        spades_count = len(list(filter(lambda target: target.suit == CardSuit.SPADES, self.cards)))
-        hearts_count = len(list(filter(lambda target: target.suit == CardSuit.HEARTS, self.cards)))
-
-        if diamonds_count == card_in_collection or clubs_count == card_in_collection or \
-                spades_count == card_in_collection or hearts_count == card_in_collection:
+        if len(self._codes) == 0:
             return True
 
-        return False
+        suit = self._codes[0] >> SUIT_SHIFT
+
+        return suit != JOKER_SUIT and self.suit_counts[suit] == len(self._codes)
 
     def values(self) -> []:
         """Return a list of all card values"""
-        values = []
-        for card in self.cards:
-            values.append(card.numerical_value())
-
-        return values
+        return [CODE_VALUES[code] for code in self._codes]
 
 
 class Deck(CardCollection):
     """Playing deck of blackjack"""
 
-    def __init__(self, with_joker: bool = False, shuffle_cards: bool = False):
-        super().__init__(self.generate_deck(with_joker))
+    def __init__(self, with_joker: bool = False, shuffle_cards: bool = False, rng=None):
+        super().__init__([])
+        self.fill(self.template(with_joker))
+        self.rng = make_random(rng)
 
         self.has_joker = with_joker
         if shuffle_cards:
@@ -207,46 +362,80 @@ class Deck(CardCollection):
 
     def reset(self) -> None:
         """Regenerate the deck of blackjack"""
-        self.cards = self.generate_deck(self.has_joker)
+        self.fill(self.template(self.has_joker))
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def template(with_joker: bool) -> CardTemplate:
+        """Composition of a pack of 52 cards and optional joker"""
+        return CardTemplate(COMPOSITION_CODES[DeckComposition.JOKER if with_joker else DeckComposition.STANDARD])
 
     @staticmethod
     def generate_deck(with_joker: bool) -> []:
         """Generate new pack of 52 blackjack"""
-        deck = []
-
-        for value in filter(lambda card_value: card_value is not CardValue.JOKER, CardValue):
-            deck.append(Diamonds(value))
-            deck.append(Clubs(value))
-            deck.append(Hearts(value))
-            deck.append(Spades(value))
-
-        if with_joker:
-            deck.append(Joker())
-
-        return deck
+        return [CARDS[code] for code in Deck.template(with_joker).codes]
 
 
 class Shoe(CardCollection):
-    """A shoe containing multiple decks"""
-
-    def __init__(self, size: int = 1):
+    """A shoe containing multiple decks of the declared composition. The shoe composition is
+       built once per size and composition and reused, so a reset refills and shuffles the
+       existing collection in place. rng is a seed, a SeedStream or a Random instance and
+       defaults to fresh entropy. Watchers are called with the code of every card dealt, and
+       notifier raises "reset" whenever the shoe is refilled. The notifier is created the
+       first time it is used"""
+
+    def __init__(self, size: int = 1, rng=None, composition: DeckComposition = DeckComposition.STANDARD):
         self.size = size
-        super().__init__(self.generate_shoe())
+        self.composition = composition
+        self.stream = make_stream(rng)
+        super().__init__([])
+        self.fill(self.template(size, composition))
+        self.rng = make_random(self.stream)
         self.shuffle_cards()
 
-        self.notifier = Notifier(["reset"])
+        self._notifier = None
+        self.watchers = []
+
+    @property
+    def notifier(self):
+        """Event notifier raising "reset" when the shoe is refilled"""
+        if self._notifier is None:
+            self._notifier = EventNotifier.Notifier(["reset"])
+        return self._notifier
+
+    def notify_reset(self) -> None:
+        """Raise "reset" if anything has subscribed to the notifier"""
+        if self._notifier is not None:
+            self._notifier.raise_event("reset")
+
+    def deal(self) -> Card:
+        card = super().deal()
+        for watcher in self.watchers:
+            watcher(card.code)
+        return card
 
     def reset(self) -> None:
         """Regenerate the deck of blackjack"""
-        self.cards = self.generate_shoe()
+        self.fill(self.template(self.size, self.composition))
         self.shuffle_cards()
-        self.notifier.raise_event("reset")
+        self.notify_reset()
 
-    def generate_shoe(self) -> []:
-        """Generate new shoe with specified number of decks"""
-        shoe = []
+    def replay(self, *key: int) -> None:
+        """Refill the shoe and shuffle it with the child stream for key, e.g. a hand index.
+           The cards dealt afterwards are reproducible from the shoe seed and the key alone"""
+        if not isinstance(self.stream, SeedStream):
+            raise ValueError('Replay needs a shoe seeded with a seed or SeedStream')
+
+        self.fill(self.template(self.size, self.composition))
+        self.stream.child(*key).random().shuffle(self._codes)
+        self.notify_reset()
 
-        for deck in [Deck() for _ in range(0, self.size)]:
-            shoe += deck.cards
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def template(size: int, composition: DeckComposition = DeckComposition.STANDARD) -> CardTemplate:
+        """Composition of a shoe with the specified number of decks"""
+        return CardTemplate(COMPOSITION_CODES[composition] * size)
 
-        return shoe
+    def generate_shoe(self) -> []:
+        """Generate new shoe with specified number of decks"""
+        return [CARDS[code] for code in self.template(self.size, self.composition).codes]
@@ -27,3 +27,10 @@ class CardValue(Enum):
     JACK: str = 'J'
     QUEEN: str = 'Q'
     KING: str = 'K'
+
+
+class DeckComposition(Enum):
+    """Cards making up each deck of a shoe"""
+    STANDARD: str = "Standard"
+    JOKER: str = "Joker"
+    SPANISH: str = "Spanish"
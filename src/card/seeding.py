@@ -0,0 +1,53 @@
+"""Reproducible and splittable random streams for shuffling"""
+from hashlib import blake2b
+from random import Random
+from secrets import randbits
+
+
+class SeedStream:
+    """Random stream derived from a root seed and a spawn key. Child streams are
+       statistically independent of each other and of their parent, and are fully
+       determined by the root seed and their key, so any of them can be rebuilt later"""
+
+    def __init__(self, seed: int = None, spawn_key: tuple = ()):
+        self.seed = randbits(128) if seed is None else seed
+        self.spawn_key = tuple(spawn_key)
+        self.spawned = 0
+
+    def __repr__(self):
+        return f"SeedStream(seed={self.seed}, spawn_key={self.spawn_key})"
+
+    def entropy(self) -> int:
+        """128 bit integer identifying this stream"""
+        digest = blake2b(repr((self.seed, self.spawn_key)).encode(), digest_size=16).digest()
+        return int.from_bytes(digest, 'little')
+
+    def child(self, *key: int) -> 'SeedStream':
+        """Stream for an explicit key, e.g. a worker or hand index"""
+        return SeedStream(self.seed, self.spawn_key + key)
+
+    def spawn(self, count: int) -> []:
+        """Spawn the next count child streams, e.g. one per worker"""
+        children = [self.child(index) for index in range(self.spawned, self.spawned + count)]
+        self.spawned += count
+        return children
+
+    def random(self) -> Random:
+        """Python random generator seeded from this stream"""
+        return Random(self.entropy())
+
+
+def make_stream(rng=None):
+    """Seed stream from a stream, a seed or None for fresh entropy. A Random instance
+       is returned unchanged"""
+    if isinstance(rng, (SeedStream, Random)):
+        return rng
+    return SeedStream(rng)
+
+
+def make_random(rng=None) -> Random:
+    """Python random generator from a stream, a seed, a generator or None for fresh entropy"""
+    stream = make_stream(rng)
+    if isinstance(stream, Random):
+        return stream
+    return stream.random()
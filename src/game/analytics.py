@@ -0,0 +1,267 @@
+"""Columnar store of played hands and group-by queries over it
+
+Each hand played headless becomes one row: the game variant, the dealer upcard, the
+player's starting total and soft flag, the hand's slot and the number of hands in the
+round, its decisions, outcome, bet and payout. Rows are buffered in typed arrays and
+written in blocks, one directory of .npy column files per block. Queries memory map the
+columns and aggregate them a block at a time with NumPy, grouping rows by a single
+integer key combined from the key columns, so there is no Python loop per row."""
+import os
+from array import array
+from glob import glob
+
+import numpy as np
+
+from src.card.codes import CODE_VALUES
+from src.game.blackjack import Blackjack, FaceUp21, Spanish21
+from src.game.enums import GameWinner, PlayerAction
+from src.game.strategy import RoundResult, Strategy
+
+VARIANTS = tuple(game.__name__ for game in (Blackjack, FaceUp21, Spanish21))
+VARIANT_CODES = {name: code for code, name in enumerate(VARIANTS)}
+OUTCOMES = tuple(GameWinner)
+OUTCOME_CODES = {outcome: code for code, outcome in enumerate(OUTCOMES)}
+ACTIONS = tuple(PlayerAction)
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+# Column name and dtype, in row order. Decisions are packed two bits each, first in the low bits
+COLUMNS = (('variant', 'B'), ('upcard', 'B'), ('start_total', 'B'), ('soft', '?'), ('hand', 'B'),
+           ('hand_count', 'B'), ('first_action', 'B'), ('actions', 'I'), ('action_count', 'B'),
+           ('outcome', 'B'), ('bet', 'd'), ('payout', 'd'))
+COLUMN_TYPES = dict(COLUMNS)
+MAX_PACKED_ACTIONS = 16
+
+# Codes of the columns holding enum values, so queries can name the values
+COLUMN_CODES = {'variant': VARIANT_CODES, 'outcome': OUTCOME_CODES, 'first_action': ACTION_CODES}
+COLUMN_LABELS = {'variant': VARIANTS, 'outcome': tuple(outcome.value for outcome in OUTCOMES),
+                 'first_action': tuple(action.value for action in ACTIONS)}
+
+# Largest number of groups counted into dense arrays, beyond it groups are found by sorting
+DENSE_GROUPS = 1 << 20
+AGGREGATES = (('hands', 'i8'), ('bet', 'f8'), ('net', 'f8'), ('mean', 'f8'), ('std', 'f8'))
+
+
+def starting_hand(first: int, second: int) -> tuple:
+    """Total and soft flag of the two card codes first dealt to the player"""
+    hard_total = CODE_VALUES[first] + CODE_VALUES[second]
+    soft = (CODE_VALUES[first] == 1 or CODE_VALUES[second] == 1) and hard_total <= 11
+    return hard_total + 10 if soft else hard_total, soft
+
+
+class ColumnWriter:
+    """Buffers hand rows of one game variant and writes every block_size rows as a block
+       directory named prefix.<block>. Blocks are written under a hidden name and renamed
+       when complete, so readers never see part of one"""
+
+    def __init__(self, prefix: str, game_type, block_size: int = 1 << 20):
+        self.prefix = prefix
+        self.variant = VARIANT_CODES[game_type.__name__]
+        self.block_size = block_size
+        self.block = 0
+        self.columns = tuple(array('B' if dtype == '?' else dtype) for _, dtype in COLUMNS)
+        self.appends = tuple(column.append for column in self.columns)
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, row: tuple) -> None:
+        """Add a row, with a value for each of COLUMNS"""
+        for append, value in zip(self.appends, row):
+            append(value)
+        self.rows += 1
+        if self.rows >= self.block_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered rows as a block"""
+        if not self.rows:
+            return
+
+        directory, name = os.path.split(self.prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Blocks already in the store are kept, e.g. from an earlier run with the same prefix
+        while os.path.exists('{}.{:04d}'.format(self.prefix, self.block)):
+            self.block += 1
+
+        path = '{}.{:04d}'.format(self.prefix, self.block)
+        partial = os.path.join(directory, '.{}.{:04d}'.format(name, self.block))
+        os.makedirs(partial, exist_ok=True)
+        for (column_name, dtype), column in zip(COLUMNS, self.columns):
+            np.save(os.path.join(partial, column_name + '.npy'), np.frombuffer(column, dtype=dtype))
+            del column[:]
+        os.replace(partial, path)
+
+        self.block += 1
+        self.rows = 0
+
+    def close(self) -> None:
+        self.flush()
+
+
+class ColumnRecorder(Strategy):
+    """Plays another strategy and adds a row to a ColumnWriter for every hand of each round.
+       Decisions are followed by the slot of the hand in play"""
+
+    def __init__(self, strategy: Strategy, writer: ColumnWriter):
+        self.strategy = strategy
+        self.writer = writer
+        self.game = None
+        self.actions = []
+        self.counts = []
+
+    def bet(self, game) -> float:
+        self.game = game
+        self.actions = [0] * len(game.player.hands)
+        self.counts = [0] * len(game.player.hands)
+        return self.strategy.bet(game)
+
+    def decide(self, game, hand) -> PlayerAction:
+        action = self.strategy.decide(game, hand)
+        slot = game.player.current
+        count = self.counts[slot]
+        if count < MAX_PACKED_ACTIONS:
+            self.actions[slot] |= ACTION_CODES[action] << count * 2
+        self.counts[slot] = count + 1
+        return action
+
+    def setup(self, game_type, shoe_size: int) -> None:
+        self.strategy.setup(game_type, shoe_size)
+
+    def record(self, result: RoundResult) -> None:
+        """Add the hands of the round just played"""
+        player = self.game.player
+        hands = player.hands
+        # A split moves the second card dealt to the next slot
+        second = hands[1].codes[0] if player.hand_count > 1 else hands[0].codes[1]
+        start_total, soft = starting_hand(hands[0].codes[0], second)
+        upcard = self.game.dealer.upcard()
+
+        for slot, hand in enumerate(result.hands):
+            self.writer.add((self.writer.variant, upcard, start_total, soft, slot, player.hand_count,
+                             self.actions[slot] & 3, self.actions[slot], min(self.counts[slot], 0xFF),
+                             OUTCOME_CODES[hand.outcome], hand.bet, hand.payout))
+
+
+def collect_rounds(game, strategy: Strategy, rounds: int, writer: ColumnWriter, penetration: float = 0.75,
+                   replayable: bool = False):
+    """Play rounds like Blackjack.simulate, adding the hands of each one to the writer before yielding it"""
+    recorder = ColumnRecorder(strategy, writer)
+    for result in game.simulate(recorder, rounds, penetration, replayable):
+        recorder.record(result)
+        yield result
+
+
+class HandStore:
+    """Hand rows of every block under a directory, read as memory mapped columns"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.blocks = sorted(os.path.dirname(path) for path in
+                             glob(os.path.join(directory, '**', 'bet.npy'), recursive=True))
+        self.domains = {}
+
+    def __len__(self):
+        return sum(len(self.column(block, 'bet')) for block in self.blocks)
+
+    @staticmethod
+    def column(block: str, name: str) -> np.ndarray:
+        """Column of a block, net being the payout less the bet"""
+        if name == 'net':
+            return HandStore.column(block, 'payout') - HandStore.column(block, 'bet')
+        if name not in COLUMN_TYPES:
+            raise ValueError('Unknown hand column {}'.format(name))
+        return np.load(os.path.join(block, name + '.npy'), mmap_mode='r')
+
+    def domain(self, name: str) -> int:
+        """Number of values of an integer column, one more than its largest value"""
+        if name not in self.domains:
+            if COLUMN_TYPES.get(name) not in ('B', '?', 'I'):
+                raise ValueError('Cannot group hands by {}'.format(name))
+            self.domains[name] = max((int(self.column(block, name).max()) + 1 for block in self.blocks
+                                      if len(self.column(block, name))), default=1)
+        return self.domains[name]
+
+    @staticmethod
+    def code(name: str, value) -> int:
+        """Stored value of a column value, which may be named, e.g. a variant or an outcome"""
+        if isinstance(value, type) and value.__name__ in VARIANT_CODES:
+            value = value.__name__
+        if name in COLUMN_CODES and (isinstance(value, str) or value in COLUMN_CODES[name]):
+            return COLUMN_CODES[name][value]
+        return value
+
+    def mask(self, block: str, where: dict):
+        """Rows of a block matching every column value in where, a list matching any of its values"""
+        mask = None
+        for name, value in where.items():
+            column = self.column(block, name)
+            if isinstance(value, (list, tuple, set)):
+                matches = np.isin(column, [self.code(name, item) for item in value])
+            else:
+                matches = column == self.code(name, value)
+            mask = matches if mask is None else mask & matches
+        return mask
+
+    def group_by(self, by=(), where: dict = None) -> np.ndarray:
+        """Hands, total bet and net result, and the mean and standard deviation of the net result
+           per hand, for each group of rows with the same values of the by columns. Returns a
+           structured array with a field per by column and per aggregate, sorted by the by columns"""
+        by = tuple(by)
+        radixes = [self.domain(name) for name in by]
+        group_count = 1
+        for radix in radixes:
+            group_count *= radix
+        if group_count > 1 << 62:
+            raise ValueError('Too many groups for {}'.format(', '.join(by)))
+
+        parts = []
+        dense = None
+        if group_count <= DENSE_GROUPS:
+            dense = [np.zeros(group_count, dtype=np.int64)] + [np.zeros(group_count) for _ in range(0, 3)]
+
+        for block in self.blocks:
+            mask = self.mask(block, where) if where else None
+            keys = np.zeros(len(self.column(block, 'bet')), dtype=np.int64)
+            for name, radix in zip(by, radixes):
+                keys = keys * radix + self.column(block, name)
+            bet = np.asarray(self.column(block, 'bet'))
+            net = self.column(block, 'net')
+            if mask is not None:
+                keys, bet, net = keys[mask], bet[mask], net[mask]
+
+            if dense is not None:
+                dense[0] += np.bincount(keys, minlength=group_count)
+                for total, weights in zip(dense[1:], (bet, net, net * net)):
+                    total += np.bincount(keys, weights, group_count)
+            else:
+                parts.append(self.reduce(keys, np.ones(len(keys)), bet, net, net * net))
+
+        if dense is not None:
+            groups = np.flatnonzero(dense[0])
+            groups, hands, bet, net, squares = [groups] + [total[groups] for total in dense]
+        elif parts:
+            groups, hands, bet, net, squares = self.reduce(*(np.concatenate(values) for values in zip(*parts)))
+        else:
+            groups, hands, bet, net, squares = (np.zeros(0, dtype=np.int64),) * 2 + (np.zeros(0),) * 3
+
+        table = np.zeros(len(groups), dtype=[(name, COLUMN_TYPES[name]) for name in by] + list(AGGREGATES))
+        for name, radix in reversed(tuple(zip(by, radixes))):
+            groups, table[name] = np.divmod(groups, radix)
+        table['hands'] = hands
+        table['bet'] = bet
+        table['net'] = net
+        table['mean'] = net / hands
+        table['std'] = np.sqrt(np.maximum(squares / hands - table['mean'] ** 2, 0) * hands /
+                               np.maximum(hands - 1, 1))
+        return table
+
+    @staticmethod
+    def reduce(keys: np.ndarray, *weights) -> tuple:
+        """Distinct keys, and the sum of each of weights per key"""
+        groups, inverse = np.unique(keys, return_inverse=True)
+        return (groups,) + tuple(np.bincount(inverse, weight, len(groups)) for weight in weights)
@@ -1,90 +1,176 @@
 """Blackjack card game
    https://www.bestuscasinos.org/blog/understanding-5-different-forms-of-blackjack/"""
-from colorama import Fore, Style
+from functools import cached_property, lru_cache
 
 from src.card.entities import Shoe, Diamonds, Clubs, Spades, Hearts, CardValue
-from src.game.entities import BlackJackPlayer, BlackJackDealer
-from src.game.enums import GameWinner, PlayerHandStatus
+from src.card.enums import DeckComposition
+from src.game.entities import BlackJackPlayer, BlackJackDealer, Hand
+from src.game.enums import GameWinner, PlayerHandStatus, PlayerAction
+from src.game.rendering import TerminalRenderer
+from src.game.states import dealer_state_key
+from src.game.strategy import Strategy, HandResult, RoundResult, TableResult
 from src.exceptions.game import OutOfFundsException
+from src.lazy import lazy_import
+
+# Loaded when a game is first displayed or simulated in lockstep, so headless imports stay fast
+colorama = lazy_import('colorama')
+np = lazy_import('numpy')
+
+# Cards always left in the shoe before a round, enough for any one round
+MIN_ROUND_CARDS = 20
+# Player seats at one table, first base to third base
+MAX_SEATS = 7
+
+
+@lru_cache(maxsize=None)
+def read_rules(filename: str) -> str:
+    """Rules text shipped in the src.game.rules package, read once per process"""
+    # importlib.resources brings in pathlib, zipfile and tempfile, so it is imported when needed
+    from importlib import resources
+    try:
+        if hasattr(resources, 'files'):
+            return resources.files('src.game.rules').joinpath(filename).read_text(encoding='utf-8')
+        # Python 3.8
+        return resources.read_text('src.game.rules', filename, encoding='utf-8')
+    except OSError:
+        return ''
 
 
 class Blackjack:
     """Blackjack game class"""
-    def __init__(self, shoe_size: int = 1, wallet_amount:float = 100, display_rules:bool = True):
-        self.game_color = Fore.GREEN + Style.BRIGHT
-        self.game_name = self.game_color + '-'*16 + 'Blackjack' + '-'*16 + '\n' \
-                  + Style.RESET_ALL
-        self.shoe = Shoe(shoe_size)
-        self.player = BlackJackPlayer(wallet_amount=wallet_amount)
+    shoe_composition = DeckComposition.STANDARD
+    dealer_hits_soft_17 = False
+    dealer_cards_visible = False
+    # Hand totals that may double down, None for any two cards
+    double_totals = None
+    # Hands a player may split into, counting the first, and whether split aces split again
+    max_split_hands = 4
+    resplit_aces = False
+    title = 'Blackjack'
+    title_color = 'GREEN'
+    rules_file = 'blackjack.txt'
+
+    def __init__(self, shoe_size: int = 1, wallet_amount:float = 100, display_rules:bool = True, rng=None,
+                 seats: int = 1):
+        if not 1 <= seats <= MAX_SEATS:
+            raise ValueError('A table seats 1 to {} players'.format(MAX_SEATS))
+
+        self.shoe = Shoe(shoe_size, rng, self.shoe_composition)
+        # Each seat has its own wallet and hands, player is the seat in play
+        self.seats = tuple(BlackJackPlayer(wallet_amount, self.max_split_hands) for _ in range(0, seats))
+        self.player = self.seats[0]
         self.dealer = BlackJackDealer()
         self.in_game_message = ''
         self.game_blackjack_odds_message = 'blackjack pays (3/2)'
+        self.renderer = TerminalRenderer()
+        self.headless = False
 
         if display_rules:
             self.game_rules = self.get_rules()
         else:
             self.game_rules = ''
 
-    @staticmethod
-    def get_rules() -> str:
+    @classmethod
+    def get_rules(cls) -> str:
         """Get the rules text for the game"""
-        rules = ''
-        try:
-            with open('./src/game/rules/blackjack.txt', 'r') as f:
-                rules = f.read()
-        except IOError:
-            pass
-
-        return rules
+        return read_rules(cls.rules_file)
 
     def __str__(self):
-        output = '\n' * 50
-        output += Fore.LIGHTBLACK_EX + self.game_rules + Style.RESET_ALL + '\n\n'
-        output += Fore.BLACK + Style.RESET_ALL + "wallet:\t$" + \
+        return '\n' * 50 + self.frame()
+
+    @cached_property
+    def game_color(self) -> str:
+        """Colour of the game title and table border"""
+        return getattr(colorama.Fore, self.title_color) + colorama.Style.BRIGHT
+
+    @cached_property
+    def game_name(self) -> str:
+        """Game title banner"""
+        return self.game_color + '-'*16 + self.title + '-'*(25 - len(self.title)) + '\n' + colorama.Style.RESET_ALL
+
+    @cached_property
+    def status_marker(self) -> str:
+        """Marker for the side whose turn it is"""
+        return colorama.Fore.BLACK + colorama.Style.BRIGHT + '* '
+
+    @cached_property
+    def hand_marker(self) -> str:
+        """Marker for the split hand in play"""
+        return colorama.Fore.BLACK + colorama.Style.BRIGHT + "." + colorama.Style.RESET_ALL
+
+    @cached_property
+    def dealer_label(self) -> str:
+        """Label in front of the dealer hand"""
+        return colorama.Fore.LIGHTBLACK_EX + 'Dealer ' + colorama.Style.RESET_ALL
+
+    @cached_property
+    def player_label(self) -> str:
+        """Label in front of the player hands"""
+        return colorama.Fore.LIGHTBLACK_EX + 'Player ' + colorama.Style.RESET_ALL
+
+    @cached_property
+    def rules_section(self) -> str:
+        """Rules text shown at the top of the screen"""
+        return colorama.Fore.LIGHTBLACK_EX + self.game_rules + colorama.Style.RESET_ALL + '\n\n'
+
+    @cached_property
+    def footer_section(self) -> str:
+        """Table border and blackjack odds banner"""
+        return self.game_color + '\n' + '-'*41 + '\n' + colorama.Style.RESET_ALL + \
+            colorama.Fore.LIGHTBLUE_EX + colorama.Style.NORMAL + self.game_blackjack_odds_message + '\n' + \
+            colorama.Style.RESET_ALL
+
+    def frame(self) -> str:
+        """Screen contents for the current state of the game"""
+        output = self.rules_section
+        output += colorama.Fore.BLACK + colorama.Style.RESET_ALL + "wallet:\t$" + \
                   str(round(self.player.wallet, 2)) + "\n"
-        output += Fore.LIGHTRED_EX + Style.NORMAL + "bet:\t$" + str(round(self.player.hand.bet, 2)) + "\n"
-        if self.player.split_hand.bet > 0:
-            output += Fore.LIGHTRED_EX + Style.NORMAL + "split bet: $" + \
-                      str(round(self.player.split_hand.bet, 2)) + "\n"
+        output += colorama.Fore.LIGHTRED_EX + colorama.Style.NORMAL + "bet:\t$" + \
+                  str(round(self.player.hand.bet, 2)) + "\n"
+        if self.player.is_split():
+            output += colorama.Fore.LIGHTRED_EX + colorama.Style.NORMAL + "split bet: $" + \
+                      ' $'.join(str(round(hand.bet, 2)) for hand in self.player.active_hands()[1:]) + "\n"
         output += self.game_name
-        if self.player.status in(PlayerHandStatus.ENDED, PlayerHandStatus.SPLIT_ENDED):
-            output += Fore.BLACK + Style.BRIGHT + '* '
+        if self.player.status == PlayerHandStatus.ENDED:
+            output += self.status_marker
         else:
             output += '  '
-        output += Fore.LIGHTBLACK_EX + 'Dealer ' + Style.RESET_ALL
+        output += self.dealer_label
         output += str(self.dealer)
         output += "\n"
-        if not self.player.status in(PlayerHandStatus.ENDED, PlayerHandStatus.SPLIT_ENDED):
-            output += Fore.BLACK + Style.BRIGHT + '* '
+        if self.player.status != PlayerHandStatus.ENDED:
+            output += self.status_marker
         else:
             output += '  '
-        output += Fore.LIGHTBLACK_EX + 'Player ' + Style.RESET_ALL
-
-        if self.player.status in (PlayerHandStatus.SPLIT_IN_PLAY_HAND_ONE,
-                                  PlayerHandStatus.SPLIT_IN_PLAY_HAND_TWO,
-                                  PlayerHandStatus.SPLIT_ENDED):
-            if self.player.status == PlayerHandStatus.SPLIT_IN_PLAY_HAND_ONE:
-                output += Fore.BLACK + Style.BRIGHT + "." + Style.RESET_ALL
-            output += str(self.player.hand)
-            output += '|'
-            if self.player.status == PlayerHandStatus.SPLIT_IN_PLAY_HAND_TWO:
-                output += Fore.BLACK + Style.BRIGHT + "." + Style.RESET_ALL
-            output += str(self.player.split_hand)
+        output += self.player_label
+
+        if self.player.is_split():
+            for index, hand in enumerate(self.player.active_hands()):
+                if index:
+                    output += '|'
+                if index == self.player.current:
+                    output += self.hand_marker
+                output += str(hand)
         else:
             output += str(self.player.hand)
 
-        output += self.game_color + '\n' + '-'*41 + '\n' + Style.RESET_ALL
-        output += Fore.LIGHTBLUE_EX + Style.NORMAL + self.game_blackjack_odds_message + '\n' + Style.RESET_ALL
+        output += self.footer_section
         output += 'remaining cards: {}'.format(self.shoe.remaining())
         output += '\n'
         output += self.in_game_message
 
         return output
 
+    def render(self) -> None:
+        """Draw the game to the terminal, sending only the lines that changed"""
+        self.renderer.draw(self.frame())
+
     def reset(self) -> None:
         """Reset game and hands"""
         self.dealer.reset()
-        self.player.reset()
+        for seat in self.seats:
+            seat.reset()
+        self.player = self.seats[0]
 
     def play(self) -> None:
         """Game logic to run the game"""
@@ -93,22 +179,22 @@ class Blackjack:
         try:
             while keep_playing != 'Q':
                 keep_playing = self.process_input()
-                print(self)
+                self.render()
                 if keep_playing != 'Q':
                     input('Press any key to continue')
 
                 self.reset()
         except IndexError:
-            print(Fore.RED + Style.BRIGHT + 'Out of cards' + Style.RESET_ALL)
+            print(colorama.Fore.RED + colorama.Style.BRIGHT + 'Out of cards' + colorama.Style.RESET_ALL)
         except OutOfFundsException:
-            print(Fore.RED + Style.BRIGHT + 'Out of funds' + Style.RESET_ALL)
+            print(colorama.Fore.RED + colorama.Style.BRIGHT + 'Out of funds' + colorama.Style.RESET_ALL)
 
     def place_your_bets(self):
         """Get bet input from user"""
         valid_entry = False
         valid_bet = 0
 
-        print(self)
+        self.render()
 
         while not valid_entry:
             if self.player.wallet <= 0:
@@ -129,45 +215,62 @@ class Blackjack:
         if self.player.wallet - valid_bet < 0 or valid_bet < 0:
             self.place_your_bets()
         else:
-            self.player.hand.add(self.shoe.deal())
-            self.player.hand.add(self.shoe.deal())
-            self.player.wallet -= valid_bet
-            self.player.hand.bet = valid_bet
-
-            self.dealer.hand.add(self.shoe.deal())
+            self.deal_hand(valid_bet)
+
+    def deal_hand(self, bet: float) -> None:
+        """Take the bet from the wallet and deal the opening cards"""
+        self.player.hand.add(self.shoe.deal())
+        self.player.hand.add(self.shoe.deal())
+        self.player.wallet -= bet
+        self.player.hand.bet = bet
+
+        self.dealer.hand.add(self.shoe.deal())
+        self.dealer.hand.add(self.shoe.deal())
+
+    def deal_seats(self, bets: list) -> None:
+        """Take the bet of each seat from its wallet and deal the opening cards in casino order,
+           one card to each seat from first base and one to the dealer, twice"""
+        for seat, bet in zip(self.seats, bets):
+            seat.wallet -= bet
+            seat.hand.bet = bet
+
+        for _ in range(0, 2):
+            for seat in self.seats:
+                seat.hand.add(self.shoe.deal())
             self.dealer.hand.add(self.shoe.deal())
 
+    def can_double(self) -> bool:
+        """Return True if the hand in play has two cards, a total the game doubles on, has not
+           doubled already and the wallet covers its bet again"""
+        hand = self.player.current_hand()
+        return len(hand.cards) == 2 and self.player.status == PlayerHandStatus.IN_PLAY and \
+            (self.double_totals is None or hand.total() in self.double_totals) and \
+            self.player.wallet - hand.bet >= 0 and not hand.double_down
+
     def double_down(self):
         """Double down initial bet"""
-        if len(self.player.hand.cards) == 2:
-            if self.player.status == PlayerHandStatus.IN_PLAY or \
-               self.player.status == PlayerHandStatus.SPLIT_IN_PLAY_HAND_ONE:
-                if self.player.wallet - self.player.hand.bet >= 0 and self.player.hand.double_down == False:
-                    self.player.wallet -= self.player.hand.bet
-                    self.player.hand.bet *= 2
-                    self.player.hand.double_down = True
-            elif self.player.status == PlayerHandStatus.SPLIT_IN_PLAY_HAND_TWO:
-                if self.player.wallet - self.player.split_hand.bet >= 0 and self.player.split_hand.double_down == False:
-                    self.player.wallet -= self.player.split_hand.bet
-                    self.player.split_hand.bet *= 2
-                    self.player.split_hand.double_down = True
+        if self.can_double():
+            hand = self.player.current_hand()
+            self.player.wallet -= hand.bet
+            hand.bet *= 2
+            hand.double_down = True
 
     @staticmethod
     def get_user_selection() -> str:
         return input('{}H {}to hit {}S {}to stand {}R {}to reset deck\n'
                       '{}X {}to split {}D {}to double down\n{}Q {}to end '
-                      .format(Fore.LIGHTBLUE_EX,
-                              Fore.LIGHTBLACK_EX,
-                              Fore.LIGHTBLUE_EX,
-                              Fore.LIGHTBLACK_EX,
-                              Fore.LIGHTBLUE_EX,
-                              Fore.LIGHTBLACK_EX,
-                              Fore.LIGHTBLUE_EX,
-                              Fore.LIGHTBLACK_EX,
-                              Fore.LIGHTBLUE_EX,
-                              Fore.LIGHTBLACK_EX,
-                              Fore.LIGHTBLUE_EX,
-                              Fore.LIGHTBLACK_EX
+                      .format(colorama.Fore.LIGHTBLUE_EX,
+                              colorama.Fore.LIGHTBLACK_EX,
+                              colorama.Fore.LIGHTBLUE_EX,
+                              colorama.Fore.LIGHTBLACK_EX,
+                              colorama.Fore.LIGHTBLUE_EX,
+                              colorama.Fore.LIGHTBLACK_EX,
+                              colorama.Fore.LIGHTBLUE_EX,
+                              colorama.Fore.LIGHTBLACK_EX,
+                              colorama.Fore.LIGHTBLUE_EX,
+                              colorama.Fore.LIGHTBLACK_EX,
+                              colorama.Fore.LIGHTBLUE_EX,
+                              colorama.Fore.LIGHTBLACK_EX
                               ))
 
     def process_input(self) -> str:
@@ -177,67 +280,69 @@ class Blackjack:
         self.in_game_message = ''
 
         while entry.upper() != 'Q':
-            print(self)
+            self.render()
 
             entry = self.get_user_selection()
 
             self.in_game_message = ''
 
             if entry.upper() == 'H':  # Hit
-                if not self.hit() and self.player.status is not \
-                        PlayerHandStatus.SPLIT_IN_PLAY_HAND_TWO:
+                if not self.hit():
                     self.check_winner()
                     break
             elif entry.upper() == 'D': # Double down
                 self.double_down()
                 continue
             elif entry.upper() == 'S':  # Stand
-                if self.player.status in(PlayerHandStatus.ENDED, PlayerHandStatus.SPLIT_ENDED):
+                if self.player.status == PlayerHandStatus.ENDED:
                     self.check_winner()
                     break
-                elif self.player.status == PlayerHandStatus.IN_PLAY:
-                    self.player.status = PlayerHandStatus.ENDED
-                    self.dealer.hand_visible = True
-                elif self.player.status == PlayerHandStatus.SPLIT_IN_PLAY_HAND_ONE:
-                    self.player.status = PlayerHandStatus.SPLIT_IN_PLAY_HAND_TWO
-                elif self.player.status == PlayerHandStatus.SPLIT_IN_PLAY_HAND_TWO:
-                    self.player.status = PlayerHandStatus.SPLIT_ENDED
-                    self.dealer.hand_visible = True
+                self.stand()
             elif entry.upper() == 'R':  # Reset deck
                 self.shoe.reset()
             elif entry.upper() == 'X':  # Split
-                if len(self.player.hand.cards) == 2:
-                    if self.player.hand.cards[0].value == self.player.hand.cards[1].value:
-                        # Split bet if funds allow
-                        if self.player.wallet - self.player.hand.bet >= 0:
-                            self.player.status = PlayerHandStatus.SPLIT_IN_PLAY_HAND_ONE
-                            self.player.split_hand.add(self.player.hand.cards[1])
-                            self.player.hand.remove(self.player.hand.cards[1])
-
-                            self.player.split_hand.bet = self.player.hand.bet
-                            self.player.wallet -= self.player.hand.bet
-                        else:
-                            # Not enough funds to split hand
-                            pass
+                self.split()
 
         return entry.upper()
 
+    def stand(self) -> None:
+        """Stand on the hand in play"""
+        if self.player.status == PlayerHandStatus.IN_PLAY and not self.player.next_hand():
+            self.dealer.hand_visible = True
+
+    def can_split(self) -> bool:
+        """Return True if the hand in play is a pair, another hand is allowed and the wallet
+           covers its bet. Split aces are only split again if the game allows it"""
+        hand = self.player.current_hand()
+        return self.player.status == PlayerHandStatus.IN_PLAY and len(hand.cards) == 2 and \
+            hand.cards[0].value == hand.cards[1].value and \
+            self.player.hand_count < min(self.max_split_hands, len(self.player.hands)) and \
+            (self.resplit_aces or not self.player.is_split() or hand.cards[0].value != CardValue.ACE) and \
+            self.player.wallet - hand.bet >= 0
+
+    def split(self) -> bool:
+        """Split a pair into two hands, returns False if the hand cannot be split"""
+        if not self.can_split():
+            return False
+
+        bet = self.player.current_hand().bet
+        self.player.split().bet = bet
+        self.player.wallet -= bet
+        return True
+
     def hit(self) -> bool:
-        """Draw card and assign to hand"""
+        """Draw card and assign to hand. Returns False if an unsplit hand or the dealer busts,
+           a bust split hand ends and play moves to the next hand"""
         success = True
 
         if self.player.status == PlayerHandStatus.IN_PLAY:
-            self.player.hand.add(self.shoe.deal())
-            if self.player.hand.bust():
-                success = False
-        elif self.player.status == PlayerHandStatus.SPLIT_IN_PLAY_HAND_ONE:
-            self.player.hand.add(self.shoe.deal())
-            if self.player.hand.bust():
-                self.player.status = PlayerHandStatus.SPLIT_IN_PLAY_HAND_TWO
-        elif self.player.status == PlayerHandStatus.SPLIT_IN_PLAY_HAND_TWO:
-            self.player.split_hand.add(self.shoe.deal())
-            if self.player.split_hand.bust():
-                self.player.status = PlayerHandStatus.SPLIT_ENDED
+            hand = self.player.current_hand()
+            hand.add(self.shoe.deal())
+            if hand.bust():
+                if self.player.is_split():
+                    self.stand()
+                else:
+                    success = False
         else:
             if self.dealer.hand_visible:
                 self.dealer.hand.add(self.shoe.deal())
@@ -248,40 +353,42 @@ class Blackjack:
 
         return success
 
+    @staticmethod
+    def winner_outcome(player_total: int, dealer_total: int) -> GameWinner:
+        """Outcome of a hand against the dealer"""
+        if dealer_total < player_total <= 21:
+            return GameWinner.PLAYER
+        elif player_total < dealer_total <= 21:
+            return GameWinner.DEALER
+        elif player_total > 21:
+            return GameWinner.DEALER
+        elif dealer_total > 21:
+            return GameWinner.PLAYER
+
+        return GameWinner.DRAW
+
     def winner_outcome_and_messaging(self, player_total:
-                                     int, dealer_total, split_hand:bool = False) -> str:
+                                     int, dealer_total, hand_index: int = 0) -> GameWinner:
         """Apply messaging to game for game outcome"""
+        outcome = self.winner_outcome(player_total, dealer_total)
+
+        if self.headless:
+            return outcome
+
         split_hand_text = ''
-        outcome = GameWinner.NOTSET
 
-        if self.player.status in (PlayerHandStatus.SPLIT_IN_PLAY_HAND_ONE,
-                                  PlayerHandStatus.SPLIT_IN_PLAY_HAND_TWO,
-                                  PlayerHandStatus.SPLIT_ENDED):
-            if not split_hand:
-                split_hand_text = " Hand 1"
-            else:
-                split_hand_text = " Hand 2"
+        if self.player.is_split():
+            split_hand_text = " Hand {}".format(hand_index + 1)
 
-        if dealer_total < player_total <= 21:
-            self.in_game_message += Fore.GREEN + Style.BRIGHT + 'Player wins{}!\n'.format(
-                split_hand_text) + Style.RESET_ALL
-            outcome = GameWinner.PLAYER
-        elif player_total < dealer_total <= 21:
-            self.in_game_message += Fore.BLUE + Style.BRIGHT + \
-                                    'Dealer wins{}!\n'.format(split_hand_text) + Style.RESET_ALL
-            outcome = GameWinner.DEALER
-        elif player_total > 21:
-            self.in_game_message += Fore.BLUE + Style.BRIGHT + \
-                                    'Dealer wins{}!\n'.format(split_hand_text) + Style.RESET_ALL
-            outcome = GameWinner.DEALER
-        elif dealer_total > 21:
-            self.in_game_message += Fore.GREEN + Style.BRIGHT + 'Player wins{}!\n'.format(
-                split_hand_text) + Style.RESET_ALL
-            outcome = GameWinner.PLAYER
+        if outcome == GameWinner.PLAYER:
+            self.in_game_message += colorama.Fore.GREEN + colorama.Style.BRIGHT + 'Player wins{}!\n'.format(
+                split_hand_text) + colorama.Style.RESET_ALL
+        elif outcome == GameWinner.DEALER:
+            self.in_game_message += colorama.Fore.BLUE + colorama.Style.BRIGHT + \
+                                    'Dealer wins{}!\n'.format(split_hand_text) + colorama.Style.RESET_ALL
         else:
-            self.in_game_message += Fore.BLACK + Style.BRIGHT + \
-                                    'No winner{}\n'.format(split_hand_text) + Style.RESET_ALL
-            outcome = GameWinner.DRAW
+            self.in_game_message += colorama.Fore.BLACK + colorama.Style.BRIGHT + \
+                                    'No winner{}\n'.format(split_hand_text) + colorama.Style.RESET_ALL
 
         return outcome
 
@@ -289,102 +396,215 @@ class Blackjack:
         """Check if player or dealer is the winner"""
 
         dealer_total = self.dealer.hand.total()
-        player_total = self.player.hand.total()
 
         self.in_game_message = ''
-        self.player.hand.outcome = self.winner_outcome_and_messaging(player_total, dealer_total)
+        for index, hand in enumerate(self.player.active_hands()):
+            hand.outcome = self.winner_outcome_and_messaging(hand.total(), dealer_total, index)
 
-        if self.player.status in (PlayerHandStatus.SPLIT_IN_PLAY_HAND_ONE,
-                                  PlayerHandStatus.SPLIT_IN_PLAY_HAND_TWO,
-                                  PlayerHandStatus.SPLIT_ENDED):
-            self.player.split_hand.outcome = self.winner_outcome_and_messaging(
-                self.player.split_hand.total(),dealer_total, True)
-
-        if self.player.hand.outcome in(GameWinner.PLAYER, GameWinner.DRAW) or \
-           self.player.split_hand.outcome in(GameWinner.PLAYER, GameWinner.DRAW):
-            self.calculate_winnings()
+        self.calculate_winnings()
 
     def calculate_winnings(self):
-        """Calculate winnings for Player"""
-
-        if self.player.hand.outcome != GameWinner.DRAW:
+        """Pay each hand of the player that won or pushed by its own outcome, a losing hand is
+           not paid whatever the other split hands did"""
+        for hand in self.player.active_hands():
+            if hand.outcome in (GameWinner.PLAYER, GameWinner.DRAW):
+                self.player.wallet += self.hand_winnings(hand)
+
+    def hand_winnings(self, hand: Hand) -> float:
+        """Amount returned to the wallet for a settled hand"""
+        if hand.outcome != GameWinner.DRAW:
             # Blackjack pays 3 to 2
-            if self.player.hand.blackjack():
-                self.player.wallet += (self.player.hand.bet * (3 / 2))
-            else:
-                self.player.wallet += self.player.hand.bet * 2
-        else:
-            self.player.wallet += self.player.hand.bet
+            if hand.blackjack():
+                return hand.bet * (3 / 2)
+            return hand.bet * 2
 
-        if self.player.split_hand.outcome != GameWinner.NOTSET:
-            if self.player.split_hand.outcome != GameWinner.DRAW:
-                # Blackjack pays 3 to 2
-                if self.player.split_hand.blackjack():
-                    self.player.wallet += (self.player.split_hand.bet * (3 / 2))
-                else:
-                    self.player.wallet += self.player.split_hand.bet * 2
-            else:
-                self.player.wallet += self.player.split_hand.bet
+        return hand.bet
 
+    @staticmethod
+    def winnings_array(hands, dealer) -> 'np.ndarray':
+        """hand_winnings for arrays of settled hands, see src.game.vectorized"""
+        wins = np.where(hands.blackjack, hands.bet * (3 / 2), hands.bet * 2)
+        return np.where(hands.won, wins, np.where(hands.drawn, hands.bet, 0))
+
+    def current_hand(self) -> Hand:
+        """The player hand in play"""
+        return self.player.current_hand()
+
+    def dealer_key(self) -> int:
+        """What the player can see of the dealer hand, the upcard value"""
+        return self.dealer.upcard()
+
+    def dealer_should_hit(self) -> bool:
+        """Return True if the dealer draws another card"""
+        total = self.dealer.hand.total()
+        return total < 17 or (total == 17 and self.dealer_hits_soft_17 and self.dealer.hand.is_soft())
+
+    def play_round(self, strategy: Strategy) -> RoundResult:
+        """Play one round headless, with decisions made by the strategy. Uses the same hit,
+           stand, split, double down and settlement rules as the console game, but prints nothing"""
+        self.headless = True
+        self.reset()
+
+        bet = strategy.bet(self)
+        if self.player.wallet <= 0 or bet < 0 or self.player.wallet - bet < 0:
+            raise OutOfFundsException
+
+        self.deal_hand(bet)
+
+        if self.play_player_hands(strategy):
+            self.play_dealer_hand()
+
+        return self.settle()
+
+    def play_table(self, strategies) -> TableResult:
+        """Play one round headless at every seat, with decisions made by the strategy of each seat.
+           The seats are dealt in casino order, the dealer plays once for the table and every
+           seat is then settled against the dealer hand"""
+        self.headless = True
+        self.reset()
+
+        bets = []
+        for seat, strategy in zip(self.seats, strategies):
+            self.player = seat
+            bet = strategy.bet(self)
+            if seat.wallet <= 0 or bet < 0 or seat.wallet - bet < 0:
+                raise OutOfFundsException
+            bets.append(bet)
 
-class FaceUp21(Blackjack):
-    """Face Up 21, a variation of Blackjack. See readme for rules"""
-    def __init__(self, shoe_size: int = 1, wallet_amount: float = 100, display_rules:bool = True):
-        super().__init__(shoe_size, wallet_amount, display_rules)
-        self.game_color = Fore.BLUE + Style.BRIGHT
-        self.game_name = self.game_color + '-' * 16 + 'Face Up 21' + '-' * 15 + '\n' \
-                         + Style.RESET_ALL
-        self.game_blackjack_odds_message = 'blackjack pays even money'
+        self.deal_seats(bets)
+
+        live = False
+        for seat, strategy in zip(self.seats, strategies):
+            self.player = seat
+            live = self.play_player_hands(strategy) or live
+
+        if live:
+            self.play_dealer_hand()
+
+        results = []
+        for seat in self.seats:
+            self.player = seat
+            results.append(self.settle())
+
+        return TableResult(tuple(results), self.dealer.hand.total(), sum(result.net for result in results))
+
+    def play_dealer_hand(self) -> None:
+        """Turn the hole card and draw until the dealer stands"""
         self.dealer.hand_visible = True
+        while self.dealer_should_hit():
+            self.dealer.hand.add(self.shoe.deal())
 
-    @staticmethod
-    def get_rules() -> str:
-        """Get the rules text for the game"""
-        rules = ''
-        try:
-            with open('./src/game/rules/face_up_21.txt', 'r') as f:
-                rules = f.read()
-        except IOError:
-            pass
+    def settle(self) -> RoundResult:
+        """Settle the hands of the seat in play against the dealer and pay the seat wallet"""
+        self.check_winner()
+
+        hands = self.player.active_hands()
+
+        results = tuple(HandResult(hand.bet, hand.outcome,
+                                   self.hand_winnings(hand) if hand.outcome in
+                                   (GameWinner.PLAYER, GameWinner.DRAW) else 0,
+                                   hand.total(), len(hand.codes), hand.blackjack()) for hand in hands)
+
+        return RoundResult(results, self.dealer.hand.total(),
+                           sum(result.payout - result.bet for result in results))
+
+    def play_player_hands(self, strategy: Strategy) -> bool:
+        """Play the player hands, returns False if no hand is left for the dealer to beat"""
+        while self.player.status == PlayerHandStatus.IN_PLAY:
+            if not self.act(strategy.decide(self, self.current_hand())):
+                return False
+
+        return not all(hand.bust() for hand in self.player.active_hands())
+
+    def act(self, action: PlayerAction) -> bool:
+        """Play a decision on the hand in play. A double or split the game does not allow is
+           played as a hit. Returns False if an unsplit hand busts and the round is over"""
+        hand = self.current_hand()
+
+        if action is PlayerAction.STAND:
+            self.stand()
+            return True
+        elif action is PlayerAction.SPLIT and self.split():
+            return True
+        elif action is PlayerAction.DOUBLE:
+            doubled = hand.double_down
+            self.double_down()
+            if hand.double_down and not doubled:
+                # A doubled hand draws one card and stands
+                current = self.player.current
+                if not self.hit():
+                    return False
+                if self.player.current == current:
+                    self.stand()
+                return True
+
+        return self.hit()
+
+    def simulate(self, strategy: Strategy, rounds: int, penetration: float = 0.75,
+                 replayable: bool = False):
+        """Play rounds headless, yielding a RoundResult for each. The shoe is reshuffled once
+           the penetration fraction of it has been dealt. With replayable, the shoe is
+           reshuffled before every round from the shoe seed and the round index, so any
+           round can be replayed with Shoe.replay"""
+        for _ in self.shuffle_rounds(rounds, penetration, replayable):
+            yield self.play_round(strategy)
+
+    def simulate_table(self, strategies, rounds: int, penetration: float = 0.75, replayable: bool = False):
+        """Play rounds headless at every seat, yielding a TableResult for each, see simulate"""
+        for _ in self.shuffle_rounds(rounds, penetration, replayable):
+            yield self.play_table(strategies)
+
+    def cut_card(self, penetration: float) -> int:
+        """Cards left in the shoe when it is reshuffled, enough for a round at every seat"""
+        return max(MIN_ROUND_CARDS * len(self.seats),
+                   int(len(self.shoe.template(self.shoe.size, self.shoe.composition)) * (1 - penetration)))
+
+    def shuffle_rounds(self, rounds: int, penetration: float, replayable: bool):
+        """Yield the index of each round to play after reshuffling the shoe as simulate describes.
+           The cut card leaves enough cards for a round at every seat"""
+        cut_card = self.cut_card(penetration)
+
+        for index in range(0, rounds):
+            if replayable:
+                self.shoe.replay(index)
+            elif self.shoe.remaining() < cut_card:
+                self.shoe.reset()
 
-        return rules
+            yield index
 
-    def double_down(self):
-        """Double down initial bet"""
-        if len(self.player.hand.cards) == 2:
-            if self.player.status == PlayerHandStatus.IN_PLAY or \
-               self.player.status == PlayerHandStatus.SPLIT_IN_PLAY_HAND_ONE:
-               if self.player.hand.total() in (9, 10, 11):
-                    if self.player.wallet - self.player.hand.bet >= 0 and self.player.hand.double_down == False:
-                        self.player.wallet -= self.player.hand.bet
-                        self.player.hand.bet *= 2
-                        self.player.hand.double_down = True
-            elif self.player.status == PlayerHandStatus.SPLIT_IN_PLAY_HAND_TWO:
-                if self.player.split_hand.total() in (9, 10, 11):
-                    if self.player.wallet - self.player.split_hand.bet >= 0 and self.player.split_hand.double_down == False:
-                        self.player.wallet -= self.player.split_hand.bet
-                        self.player.split_hand.bet *= 2
-                        self.player.split_hand.double_down = True
 
-    def calculate_winnings(self):
-        """Calculate winnings for Player"""
+class FaceUp21(Blackjack):
+    """Face Up 21, a variation of Blackjack. See readme for rules"""
+    dealer_hits_soft_17 = True
+    dealer_cards_visible = True
+    double_totals = (9, 10, 11)
+    title = 'Face Up 21'
+    title_color = 'BLUE'
+    rules_file = 'face_up_21.txt'
+
+    def __init__(self, shoe_size: int = 1, wallet_amount: float = 100, display_rules:bool = True, rng=None,
+                 seats: int = 1):
+        super().__init__(shoe_size, wallet_amount, display_rules, rng, seats)
+        self.game_blackjack_odds_message = 'blackjack pays even money'
+        self.dealer.hand_visible = True
 
-        if self.player.hand.outcome != GameWinner.DRAW:
-            self.player.wallet += self.player.hand.bet * 2
+    def hand_winnings(self, hand: Hand) -> float:
+        """Amount returned to the wallet for a settled hand"""
+        if hand.outcome != GameWinner.DRAW:
+            return hand.bet * 2
         elif self.dealer.hand.blackjack():
             # dealer blackjack beats a player blackjack
-            pass
-        else:
-            self.player.wallet += self.player.hand.bet
-
-        if self.player.split_hand.outcome != GameWinner.NOTSET:
-            if self.player.split_hand.outcome != GameWinner.DRAW:
-                self.player.wallet += self.player.split_hand.bet * 2
-            elif self.dealer.hand.blackjack():
-                # dealer blackjack beats a player blackjack
-                pass
-            else:
-                self.player.wallet += self.player.split_hand.bet
+            return 0
+
+        return hand.bet
+
+    @staticmethod
+    def winnings_array(hands, dealer) -> 'np.ndarray':
+        return np.where(hands.won, hands.bet * 2, np.where(hands.drawn & ~dealer.blackjack, hands.bet, 0))
+
+    def dealer_key(self) -> int:
+        """What the player can see of the dealer hand, both cards are face up"""
+        return dealer_state_key(self.dealer.hand.total(), self.dealer.hand.is_soft())
 
     def reset(self) -> None:
         super().reset()
@@ -393,86 +613,92 @@ class FaceUp21(Blackjack):
 
 class Spanish21(Blackjack):
     """Spanish 21, a variation of Blackjack. See readme for rules"""
-    def __init__(self, shoe_size: int = 1, wallet_amount: float = 100, display_rules:bool = True):
-        super().__init__(shoe_size, wallet_amount, display_rules)
-        self.remove_tens()
-        self.shoe.notifier.subscribe("reset", self.remove_tens)
-
-        self.game_color = Fore.RED + Style.BRIGHT
-        self.game_name = self.game_color + '-' * 16 + 'Spanish 21' + '-' * 15 + '\n' \
-                         + Style.RESET_ALL
-        self.game_blackjack_odds_message = 'blackjack pays (3/2)'
+    # Spanish 21 does not have 10s
+    shoe_composition = DeckComposition.SPANISH
+    resplit_aces = True
+    title = 'Spanish 21'
+    title_color = 'RED'
+    rules_file = 'spanish_21.txt'
 
-    @staticmethod
-    def get_rules() -> str:
-        """Get the rules text for the game"""
-        rules = ''
-        try:
-            with open('./src/game/rules/spanish_21.txt', 'r') as f:
-                rules = f.read()
-        except IOError:
-            pass
+    def __init__(self, shoe_size: int = 1, wallet_amount: float = 100, display_rules:bool = True, rng=None,
+                 seats: int = 1):
+        super().__init__(shoe_size, wallet_amount, display_rules, rng, seats)
 
-        return rules
-
-    def remove_tens(self):
-        """Spanish 21 does not have 10s"""
-        self.shoe.remove(CardValue.TEN)
+        self.game_blackjack_odds_message = 'blackjack pays (3/2)'
 
     def apply_odds(self, hand):
         """Apply odds"""
+        self.player.wallet += self.odds_winnings(hand)
 
-        values = hand.values()
+    def odds_winnings(self, hand: Hand) -> float:
+        """Amount returned to the wallet for a winning hand, including bonus payouts"""
+        total = hand.total()
+        card_count = len(hand.codes)
+        sevens = hand.count(CardValue.SEVEN)
+        six_seven_eight = card_count == 3 and sevens == 1 and hand.count(CardValue.SIX) == 1 and \
+            hand.count(CardValue.EIGHT) == 1
 
         # Blackjack always wins, and is always paid 3:2 regardless of whether or not the dealer has a blackjack.
         if hand.blackjack():
-            self.player.wallet += (hand.bet * (3 / 2))
-        elif hand.total() == 21 and len(hand.cards) == 5:
+            return hand.bet * (3 / 2)
+        elif total == 21 and card_count == 5:
             # A five-card 21 pays out at 3:2
-            self.player.wallet += (hand.bet * (3 / 2))
-        elif hand.total() == 21 and len(hand.cards) == 6:
+            return hand.bet * (3 / 2)
+        elif total == 21 and card_count == 6:
             # A Six-card 21 pays 2:1
-            self.player.wallet += (hand.bet * (2 / 1))
-        elif hand.total() == 21 and len(hand.cards) == 7:
+            return hand.bet * (2 / 1)
+        elif total == 21 and card_count == 7:
             # A seven-card 21 pays out at 3:1.
-            self.player.wallet += (hand.bet * (3 / 1))
-        elif len(hand.cards) == 3 and hand.all_same_suit() and values.count(7) == 3:
+            return hand.bet * (3 / 1)
+        elif card_count == 3 and hand.all_same_suit() and sevens == 3:
             # 777 of same suit pays 2:1
-            self.player.wallet += (hand.bet * (2 / 1))
             # If a player has 777 of the same suit and the dealer is holding a 7 in any suit, there
             # is a $1,000 bonus paid to the player.
             # If the player has bet more than $25 at the start of the hand, this climbs all the way to $5,000.
             if self.dealer.hand.has_card(CardValue.SEVEN):
                 if hand.bet > 25:
-                    self.player.wallet += 5000
-                else:
-                    self.player.wallet += 1000
-        elif len(hand.cards) == 3 and values.count(7) == 3:
+                    return hand.bet * (2 / 1) + 5000
+                return hand.bet * (2 / 1) + 1000
+            return hand.bet * (2 / 1)
+        elif card_count == 3 and sevens == 3:
             # A 777 of mixed suit pays 3:2.
-            self.player.wallet += (hand.bet * (3 / 2))
-        elif len(hand.cards) == 3 and hand.all_same_suit() and values.count(6) == 1 and values.count(7) == 1 and values.count(8) == 1:
+            return hand.bet * (3 / 2)
+        elif six_seven_eight and hand.all_same_suit():
             # A 678 of same suit pays 2:1.
-            self.player.wallet += (hand.bet * (2 / 1))
-        elif len(hand.cards) == 3 and values.count(6) == 1 and values.count(7) == 1 and values.count(8) == 1:
+            return hand.bet * (2 / 1)
+        elif six_seven_eight:
             # A 678 of mixed suit pays 3:2.
-            self.player.wallet += (hand.bet * (3 / 2))
-        else:
-            self.player.wallet += hand.bet * 2
+            return hand.bet * (3 / 2)
 
-    def calculate_winnings(self):
-        """Calculate winnings for Player"""
+        return hand.bet * 2
 
-        if self.player.hand.outcome != GameWinner.DRAW or self.player.hand.blackjack():
-            self.apply_odds(self.player.hand)
-        else:
-            self.player.wallet += self.player.hand.bet
+    def hand_winnings(self, hand: Hand) -> float:
+        """Amount returned to the wallet for a settled hand"""
+        if hand.outcome != GameWinner.DRAW or hand.blackjack():
+            # Blackjack pays 3 to 2
+            return self.odds_winnings(hand)
 
-        if self.player.split_hand.outcome != GameWinner.NOTSET:
-            if self.player.split_hand.outcome != GameWinner.DRAW or self.player.split_hand.blackjack():
-                # Blackjack pays 3 to 2
-                self.apply_odds(self.player.split_hand)
-            else:
-                self.player.wallet += self.player.split_hand.bet
+        return hand.bet
+
+    @staticmethod
+    def odds_winnings_array(hands, dealer) -> 'np.ndarray':
+        """odds_winnings for arrays of settled hands"""
+        twenty_one = hands.total == 21
+        three_cards = hands.card_count == 3
+        sevens = three_cards & (hands.sevens == 3)
+        six_seven_eight = three_cards & (hands.sevens == 1) & (hands.sixes == 1) & (hands.eights == 1)
+
+        odds = np.select([hands.blackjack, twenty_one & (hands.card_count == 5), twenty_one & (hands.card_count == 6),
+                          twenty_one & (hands.card_count == 7), sevens & hands.suited, sevens,
+                          six_seven_eight & hands.suited, six_seven_eight],
+                         [3 / 2, 3 / 2, 2, 3, 2, 3 / 2, 2, 3 / 2], 2)
+        bonus = np.where(sevens & hands.suited & dealer.has_seven, np.where(hands.bet > 25, 5000, 1000), 0)
+        return hands.bet * odds + bonus
+
+    @staticmethod
+    def winnings_array(hands, dealer) -> 'np.ndarray':
+        wins = Spanish21.odds_winnings_array(hands, dealer)
+        return np.where(hands.won | (hands.drawn & hands.blackjack), wins, np.where(hands.drawn, hands.bet, 0))
 
 
 class BlackjackGameCollection:
@@ -1,66 +1,78 @@
 """Entities for the blackjack game"""
-from src.card.entities import CardCollection
-from src.card.enums import CardValue
+from src.card.codes import ACE_RANK, CODE_VALUES, RANK_MASK, RANK_VALUES
+from src.card.entities import Card, CardCollection, card_glyphs
 from src.game.enums import PlayerHandStatus, GameWinner
+from src.game.states import hand_state_key
 
 
 class Hand(CardCollection):
-    """Collection of blackjack for a hand in a card game"""
+    """Collection of blackjack for a hand in a card game. The hard total, with aces
+       counted as 1, is kept up to date as cards are added and removed"""
     def __init__(self):
+        self.hard_total: int = 0
         super().__init__([])
         self.bet:float = 0
         self.double_down:bool = False
         self.outcome = GameWinner.NOTSET
 
     def __str__(self):
-        return ' '.join(str(card) for card in self.cards)
+        glyphs = card_glyphs()
+        return ' '.join([glyphs[code] for code in self.codes])
+
+    def add(self, card: Card) -> None:
+        super().add(card)
+        self.hard_total += CODE_VALUES[card.code]
+
+    def deal(self) -> Card:
+        card = super().deal()
+        self.hard_total -= CODE_VALUES[card.code]
+        return card
+
+    def counts_changed(self) -> None:
+        self.hard_total = sum(count * value for count, value in zip(self.rank_counts, RANK_VALUES))
+
+    def ace_count(self) -> int:
+        """Number of aces in the hand"""
+        return self.rank_counts[ACE_RANK]
+
+    def is_soft(self) -> bool:
+        """Return True if an ace in the hand is counted as 11"""
+        return self.rank_counts[ACE_RANK] > 0 and self.hard_total <= 11
 
     def blackjack(self) -> bool:
         """Return True or False if the hand is blackjack"""
-        ace = False
-        ten = False
-        if len(self.cards) == 2:
-            for card in self.cards:
-                if card.value == CardValue.ACE:
-                    ace = True
-                elif card.numerical_value() == 10:
-                    ten = True
-
-        return ace and ten
+        return len(self.codes) == 2 and self.hard_total == 11 and self.rank_counts[ACE_RANK] == 1
 
     def bust(self) -> bool:
         """Return True or False if hand is bust"""
-        if self.total() > 21:
-            return True
-
-        return False
+        return self.hard_total > 21
 
     def total(self) -> int:
         """Return total of hand. Note. Aces are considered 11 unless total exceeds 21"""
-        total = 0
-        ace_count = 0
+        if self.rank_counts[ACE_RANK] > 0 and self.hard_total <= 11:
+            return self.hard_total + 10
 
-        for card in self.cards:
-            if card.value == CardValue.ACE:
-                ace_count += 1
-                total += 11
-            else:
-                total += card.numerical_value()
+        return self.hard_total
 
-        if total > 21 and ace_count > 0:
-            for _ in range(0, ace_count):
-                if total <= 21:
-                    break
+    def pair(self) -> int:
+        """Card value of a two card hand of the same rank, otherwise 0"""
+        codes = self.codes
+        if len(codes) == 2 and codes[0] & RANK_MASK == codes[1] & RANK_MASK:
+            return CODE_VALUES[codes[0]]
+        return 0
 
-                total -= 10
-
-        return total
+    def state(self) -> int:
+        """Hashable key for the hand state, see src.game.states"""
+        card_count = len(self.codes)
+        return hand_state_key(self.total(), self.is_soft(), self.pair(), card_count,
+                              card_count == 2 and not self.double_down)
 
     def reset(self) -> None:
         """Regenerate the deck of blackjack"""
         super().reset()
         self.bet = 0
         self.double_down = False
+        self.outcome = GameWinner.NOTSET
 
 
 class Player:
@@ -72,21 +84,54 @@ class Player:
         self.hand.reset()
 
     def __str__(self):
-        return ' '.join(str(card) for card in self.hand.cards)
+        return str(self.hand)
 
 
 class BlackJackPlayer(Player):
-    """Blackjack player"""
-    def __init__(self, wallet_amount:float = 0):
+    """Blackjack player. The hands are slots allocated once for up to max_hands hands, the
+       first hand_count of them in use this round. current is the slot of the hand in play,
+       split hands take the next free slot and are played after the hands before them"""
+    def __init__(self, wallet_amount:float = 0, max_hands: int = 4):
         super().__init__()
 
-        self.split_hand = Hand()
+        self.hands = [self.hand] + [Hand() for _ in range(1, max_hands)]
+        self.hand_count = 1
+        self.current = 0
         self.status = PlayerHandStatus.IN_PLAY
         self.wallet: float = wallet_amount
 
+    def current_hand(self) -> Hand:
+        """The hand in play, or the last hand once every hand has ended"""
+        return self.hands[min(self.current, self.hand_count - 1)]
+
+    def active_hands(self) -> list:
+        """Hands in use this round, in slot order"""
+        return self.hands[:self.hand_count]
+
+    def is_split(self) -> bool:
+        """Return True if the first hand has been split this round"""
+        return self.hand_count > 1
+
+    def split(self) -> Hand:
+        """Move the second card of the hand in play to the next free slot, returns the new hand"""
+        hand = self.hands[self.hand_count]
+        hand.add(self.hands[self.current].deal())
+        self.hand_count += 1
+        return hand
+
+    def next_hand(self) -> bool:
+        """End the hand in play, returns False once no hand is left to play"""
+        self.current += 1
+        if self.current < self.hand_count:
+            return True
+        self.status = PlayerHandStatus.ENDED
+        return False
+
     def reset(self) -> None:
-        super().reset()
-        self.split_hand.reset()
+        for hand in self.active_hands():
+            hand.reset()
+        self.hand_count = 1
+        self.current = 0
         self.status = PlayerHandStatus.IN_PLAY
 
 
@@ -105,6 +150,12 @@ class BlackJackDealer(Player):
         else:
             return ''
 
+    def upcard(self) -> int:
+        """Card value of the dealer's face up card, 0 if no cards are dealt"""
+        if len(self.hand.codes) == 0:
+            return 0
+        return CODE_VALUES[self.hand.codes[0]]
+
     def reset(self) -> None:
         super().reset()
         self.hand_visible = False
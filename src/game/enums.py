@@ -13,7 +13,12 @@ class GameWinner(Enum):
 class PlayerHandStatus(Enum):
     """Status of player hand in blackjack game"""
     IN_PLAY: str = "InPlay"
-    SPLIT_IN_PLAY_HAND_ONE: str = "SplitInPlayHandOne"
-    SPLIT_IN_PLAY_HAND_TWO: str = "SplitInPlayHandTwo"
-    SPLIT_ENDED: str = "SplitEnded"
     ENDED: str = "Ended"
+
+
+class PlayerAction(Enum):
+    """Decision made by a player on the hand in play"""
+    HIT: str = "Hit"
+    STAND: str = "Stand"
+    DOUBLE: str = "Double"
+    SPLIT: str = "Split"
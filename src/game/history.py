@@ -0,0 +1,321 @@
+"""Hand history: an append-only binary log of every round played headless
+
+A history file starts with a header naming the game, the shoe size and the seed of the
+shoe's stream, followed by length-prefixed records. Each writer session starts with a
+segment record, then one round record per round. Round numbers, bets and payouts are
+stored as varint deltas from the previous value in the segment, with amounts in cents,
+card codes as one byte each and decisions as two bits each. Compressed files are gzip
+streams, with one gzip member per session, and are read the same way."""
+import gzip
+import os
+from collections import namedtuple
+
+from src.card.seeding import SeedStream
+from src.game.enums import GameWinner, PlayerAction
+from src.game.strategy import HandResult, RoundResult, Strategy
+
+HISTORY_MAGIC = b'BJHH'
+HISTORY_VERSION = 1
+GZIP_MAGIC = b'\x1f\x8b'
+
+SEGMENT_RECORD = 0
+ROUND_RECORD = 1
+
+# Amounts are stored as whole cents
+MONEY_SCALE = 100
+OUTCOMES = tuple(GameWinner)
+OUTCOME_CODES = {outcome: code for code, outcome in enumerate(OUTCOMES)}
+ACTIONS = tuple(PlayerAction)
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+HistoryHeader = namedtuple('HistoryHeader', ('game', 'shoe_size', 'seed', 'spawn_key'))
+HistoryRecord = namedtuple('HistoryRecord', ('round', 'reshuffled', 'cards', 'actions', 'result'))
+
+
+def write_varint(buffer: bytearray, value: int) -> None:
+    """Append an unsigned integer, seven bits per byte"""
+    while value > 0x7F:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data, position: int) -> tuple:
+    """Unsigned integer at position, and the position after it"""
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def zigzag(value: int) -> int:
+    """Signed integer as an unsigned one, small magnitudes staying small"""
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def encode_header(header: HistoryHeader) -> bytes:
+    buffer = bytearray(HISTORY_MAGIC)
+    buffer.append(HISTORY_VERSION)
+    name = header.game.encode()
+    write_varint(buffer, len(name))
+    buffer += name
+    write_varint(buffer, header.shoe_size)
+    # Shoes shuffled from a Random instance have no seed to record
+    buffer.append(header.seed is not None)
+    if header.seed is not None:
+        write_varint(buffer, header.seed)
+        write_varint(buffer, len(header.spawn_key))
+        for key in header.spawn_key:
+            write_varint(buffer, key)
+    return bytes(buffer)
+
+
+def read_header(file) -> HistoryHeader:
+    """Header at the start of a history file object, which is left at the first record"""
+    if file.read(len(HISTORY_MAGIC)) != HISTORY_MAGIC:
+        raise ValueError('Not a hand history file')
+    version = file.read(1)
+    if version != bytes((HISTORY_VERSION,)):
+        raise ValueError('Unsupported hand history version {}'.format(version[0] if version else None))
+
+    name = file.read(read_file_varint(file)).decode()
+    shoe_size = read_file_varint(file)
+    if file.read(1) == b'\x00':
+        return HistoryHeader(name, shoe_size, None, ())
+    seed = read_file_varint(file)
+    spawn_key = tuple(read_file_varint(file) for _ in range(0, read_file_varint(file)))
+    return HistoryHeader(name, shoe_size, seed, spawn_key)
+
+
+def read_file_varint(file):
+    """Unsigned integer read from a file object, None at the end of the file"""
+    value = shift = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            if shift:
+                raise ValueError('Truncated hand history record')
+            return None
+        value |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+def open_history(path: str):
+    """History file opened for reading, decompressing it if it is a gzip stream"""
+    with open(path, 'rb') as f:
+        compressed = f.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    return gzip.open(path, 'rb') if compressed else open(path, 'rb')
+
+
+def stream_header(game_type, shoe_size: int, stream=None) -> HistoryHeader:
+    """Header for rounds of a game dealt from a shoe shuffled with stream"""
+    if isinstance(stream, SeedStream):
+        return HistoryHeader(game_type.__name__, shoe_size, stream.seed, stream.spawn_key)
+    return HistoryHeader(game_type.__name__, shoe_size, None, ())
+
+
+class HistoryWriter:
+    """Appends rounds to a history file. Records are encoded into a buffer that is written
+       and flushed every flush_every rounds and on close. An existing file is appended to if
+       its header and compression match"""
+
+    def __init__(self, path: str, header: HistoryHeader, compress: bool = False, flush_every: int = 1000):
+        self.path = path
+        self.header = header
+        self.flush_every = flush_every
+        self.buffer = bytearray()
+        self.pending = 0
+        self.previous_round = -1
+        self.previous_bet = 0
+
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'rb') as f:
+                if (f.read(len(GZIP_MAGIC)) == GZIP_MAGIC) != compress:
+                    raise ValueError('Hand history {} is {}compressed'.format(path, '' if not compress else 'not '))
+            with open_history(path) as f:
+                if read_header(f) != header:
+                    raise ValueError('Hand history {} was recorded for another game or seed'.format(path))
+        else:
+            self.buffer += encode_header(header)
+
+        self.file = gzip.open(path, 'ab') if compress else open(path, 'ab')
+        self.write_record(bytes((SEGMENT_RECORD,)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write_record(self, payload: bytes) -> None:
+        write_varint(self.buffer, len(payload))
+        self.buffer += payload
+
+    def write(self, round_index: int, reshuffled: bool, cards: bytes, actions, result: RoundResult) -> None:
+        """Add a round to the history"""
+        # Counts and the round delta nearly always fit in one byte
+        delta = zigzag(round_index - self.previous_round - 1)
+        record = bytearray((ROUND_RECORD, delta, reshuffled)) if delta < 0x80 else None
+        if record is None:
+            record = bytearray((ROUND_RECORD,))
+            write_varint(record, delta)
+            record.append(reshuffled)
+        self.previous_round = round_index
+
+        write_varint(record, len(cards))
+        record += cards
+
+        write_varint(record, len(actions))
+        packed = 0
+        for index, action in enumerate(actions):
+            packed |= ACTION_CODES[action] << (index & 3) * 2
+            if index & 3 == 3:
+                record.append(packed)
+                packed = 0
+        if len(actions) & 3:
+            record.append(packed)
+
+        record.append(min(result.dealer_total, 0xFF))
+        record.append(len(result.hands))
+        for hand in result.hands:
+            bet = round(hand.bet * MONEY_SCALE)
+            record += bytes((OUTCOME_CODES[hand.outcome] | hand.blackjack << 2, min(hand.total, 0xFF),
+                             min(hand.card_count, 0xFF)))
+            write_varint(record, zigzag(bet - self.previous_bet))
+            write_varint(record, zigzag(round(hand.payout * MONEY_SCALE) - bet))
+            self.previous_bet = bet
+
+        write_varint(self.buffer, len(record))
+        self.buffer += record
+        self.pending += 1
+        if self.pending >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records and flush the file"""
+        self.file.write(self.buffer)
+        self.file.flush()
+        self.buffer.clear()
+        self.pending = 0
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class HistoryReader:
+    """Iterates the rounds of a history file lazily, holding one record at a time"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open_history(path) as f:
+            self.header = read_header(f)
+
+    def __iter__(self):
+        with open_history(self.path) as f:
+            read_header(f)
+            previous_round = -1
+            previous_bet = 0
+
+            while True:
+                length = read_file_varint(f)
+                if length is None:
+                    return
+                record = f.read(length)
+                if len(record) != length:
+                    raise ValueError('Truncated hand history record')
+
+                if record[0] == SEGMENT_RECORD:
+                    previous_round = -1
+                    previous_bet = 0
+                    continue
+
+                delta, position = read_varint(record, 1)
+                round_index = previous_round + 1 + unzigzag(delta)
+                previous_round = round_index
+                reshuffled = bool(record[position])
+
+                card_count, position = read_varint(record, position + 1)
+                cards = record[position:position + card_count]
+                position += card_count
+
+                action_count, position = read_varint(record, position)
+                actions = tuple(ACTIONS[record[position + index // 4] >> (index & 3) * 2 & 3]
+                                for index in range(0, action_count))
+                position += (action_count + 3) // 4
+
+                dealer_total, hand_count = record[position:position + 2]
+                position += 2
+                hands = []
+                for _ in range(0, hand_count):
+                    flags, total, hand_cards = record[position:position + 3]
+                    bet_delta, position = read_varint(record, position + 3)
+                    payout_delta, position = read_varint(record, position)
+                    bet = previous_bet + unzigzag(bet_delta)
+                    previous_bet = bet
+                    hands.append(HandResult(bet / MONEY_SCALE, OUTCOMES[flags & 3],
+                                            (bet + unzigzag(payout_delta)) / MONEY_SCALE, total, hand_cards,
+                                            bool(flags & 4)))
+
+                yield HistoryRecord(round_index, reshuffled, cards, actions,
+                                    RoundResult(tuple(hands), dealer_total,
+                                                sum(hand.payout - hand.bet for hand in hands)))
+
+
+class HistoryRecorder(Strategy):
+    """Plays another strategy and records the cards dealt, the decisions, bets and outcomes
+       of each round to a HistoryWriter. Cards are followed with a shoe watcher"""
+
+    def __init__(self, strategy: Strategy, writer: HistoryWriter):
+        self.strategy = strategy
+        self.writer = writer
+        self.cards = bytearray()
+        self.actions = []
+        self.shoe = None
+        self.remaining = 0
+        self.reshuffled = False
+        self.rounds = 0
+
+    def bet(self, game) -> float:
+        if self.shoe is not game.shoe:
+            self.shoe = game.shoe
+            self.shoe.watchers.append(self.cards.append)
+        # The shoe only grows when it is refilled
+        self.reshuffled = self.shoe.remaining() > self.remaining or not self.rounds
+        self.cards.clear()
+        self.actions.clear()
+        return self.strategy.bet(game)
+
+    def decide(self, game, hand) -> PlayerAction:
+        action = self.strategy.decide(game, hand)
+        self.actions.append(action)
+        return action
+
+    def setup(self, game_type, shoe_size: int) -> None:
+        self.strategy.setup(game_type, shoe_size)
+
+    def record(self, result: RoundResult) -> None:
+        """Write the round just played"""
+        self.writer.write(self.rounds, self.reshuffled, self.cards, self.actions, result)
+        self.remaining = self.shoe.remaining()
+        self.rounds += 1
+
+
+def record_rounds(game, strategy: Strategy, rounds: int, writer: HistoryWriter, penetration: float = 0.75,
+                  replayable: bool = False):
+    """Play rounds like Blackjack.simulate, writing each one to the history before yielding it"""
+    recorder = HistoryRecorder(strategy, writer)
+    for result in game.simulate(recorder, rounds, penetration, replayable):
+        recorder.record(result)
+        yield result
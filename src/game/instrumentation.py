@@ -0,0 +1,141 @@
+"""Call counts and timings of the phases of a round, for finding where time goes
+
+Instrumentation is opt in. While it is enabled, the methods of each phase are replaced on
+their classes by wrappers that count calls and add up the time spent in them, and when it
+is disabled the original methods are put back, so uninstrumented play runs the same code
+as before at no cost. Timings are inclusive, e.g. hit includes the shoe deal it makes, and
+a phase calling itself, such as an overridden method calling super, is timed once."""
+import json
+from functools import wraps
+from inspect import isfunction
+from time import perf_counter_ns
+
+from src.card.entities import Shoe
+from src.game.blackjack import Blackjack, Spanish21
+
+# Methods timed by each phase, on the class and any subclass overriding them
+PHASES = {
+    'round': ((Blackjack, 'play_round'), (Blackjack, 'play_table')),
+    'deal': ((Shoe, 'deal'),),
+    'hit': ((Blackjack, 'hit'),),
+    'double_down': ((Blackjack, 'double_down'),),
+    'split': ((Blackjack, 'split'),),
+    'check_winner': ((Blackjack, 'check_winner'),),
+    'winnings': ((Blackjack, 'calculate_winnings'), (Blackjack, 'hand_winnings'), (Spanish21, 'apply_odds'),
+                 (Spanish21, 'odds_winnings')),
+    'render': ((Blackjack, 'render'),),
+    'shoe_reset': ((Shoe, 'reset'),),
+}
+
+# The instrumentation enabled, only one can replace the methods at a time
+enabled = None
+
+
+class PhaseCounter:
+    """Calls and nanoseconds spent in a phase"""
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0
+        self.depth = 0
+
+    def wrap(self, function):
+        """function, counting its calls and time towards the phase"""
+        @wraps(function)
+        def timed(*args, **kwargs):
+            if self.depth:
+                return function(*args, **kwargs)
+            self.depth = 1
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.time += perf_counter_ns() - start
+                self.calls += 1
+                self.depth = 0
+
+        return timed
+
+
+def overriding_classes(cls, name: str):
+    """cls and its subclasses that define the method name themselves"""
+    if isfunction(cls.__dict__.get(name)):
+        yield cls
+    for subclass in cls.__subclasses__():
+        yield from overriding_classes(subclass, name)
+
+
+class Instrumentation:
+    """Counters for each phase, collected while enabled, e.g. in a with block"""
+
+    def __init__(self, phases: dict = None):
+        self.phases = PHASES if phases is None else phases
+        self.counters = {phase: PhaseCounter() for phase in self.phases}
+        self.originals = []
+        self.elapsed = 0
+        self.start = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *args):
+        self.disable()
+
+    def enable(self) -> None:
+        """Replace the methods of every phase with counting wrappers"""
+        global enabled
+        if enabled is not None:
+            raise RuntimeError('Instrumentation is already enabled')
+        enabled = self
+
+        for phase, methods in self.phases.items():
+            for owner, name in methods:
+                for cls in set(overriding_classes(owner, name)):
+                    function = cls.__dict__[name]
+                    self.originals.append((cls, name, function))
+                    setattr(cls, name, self.counters[phase].wrap(function))
+        self.start = perf_counter_ns()
+
+    def disable(self) -> None:
+        """Put the original methods back"""
+        global enabled
+        if enabled is not self:
+            return
+        self.elapsed += perf_counter_ns() - self.start
+        for cls, name, function in reversed(self.originals):
+            setattr(cls, name, function)
+        self.originals.clear()
+        enabled = None
+
+    def reset(self) -> None:
+        """Clear the counts and timings"""
+        for counter in self.counters.values():
+            counter.calls = counter.time = 0
+        self.elapsed = 0
+        if self.start is not None:
+            self.start = perf_counter_ns()
+
+    def snapshot(self) -> dict:
+        """Counts and timings in seconds, as plain values for JSON"""
+        elapsed = self.elapsed + (perf_counter_ns() - self.start if enabled is self else 0)
+        return {'elapsed': elapsed / 1e9,
+                'phases': {phase: {'calls': counter.calls, 'seconds': counter.time / 1e9}
+                           for phase, counter in self.counters.items()}}
+
+    def write(self, path: str) -> None:
+        """Save the snapshot as JSON"""
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def report(self) -> str:
+        """Plain text table of the phases"""
+        snapshot = self.snapshot()
+        lines = ['{:<14} {:>12} {:>12} {:>10} {:>8}'.format('phase', 'calls', 'total (ms)', 'mean (us)', 'time')]
+        for phase, counter in snapshot['phases'].items():
+            lines.append('{:<14} {:>12} {:>12.1f} {:>10.2f} {:>8.1%}'.format(
+                phase, counter['calls'], counter['seconds'] * 1e3,
+                counter['seconds'] * 1e6 / counter['calls'] if counter['calls'] else 0,
+                counter['seconds'] / snapshot['elapsed'] if snapshot['elapsed'] else 0))
+        lines.append('instrumented:\t{:.2f}s'.format(snapshot['elapsed']))
+        return '\n'.join(lines)
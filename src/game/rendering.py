@@ -0,0 +1,73 @@
+"""Terminal output for the console games"""
+import re
+import shutil
+import sys
+import unicodedata
+from functools import lru_cache
+
+CLEAR_SCREEN = '\x1b[2J\x1b[H'
+CLEAR_LINE = '\x1b[K'
+CLEAR_TO_END = '\x1b[J'
+ESCAPE_SEQUENCE = re.compile('\x1b\\[[0-9;]*[A-Za-z]')
+
+
+@lru_cache(maxsize=1024)
+def display_width(line: str) -> int:
+    """Terminal columns taken by a line, leaving out colour codes and combining marks and
+       counting wide characters, e.g. the joker glyph, as two columns. Frames repeat most of
+       their lines, so widths are cached"""
+    text = ESCAPE_SEQUENCE.sub('', line)
+    if text.isascii():
+        return len(text)
+
+    width = 0
+    for character in text:
+        if unicodedata.category(character) not in ('Mn', 'Me', 'Cf'):
+            width += 2 if unicodedata.east_asian_width(character) in ('W', 'F') else 1
+    return width
+
+
+class TerminalRenderer:
+    """Draws frames to a terminal, rewriting only the lines that changed since the
+       previous frame. Each frame is sent as a single write. Lines are rewritten at their
+       screen row, so a frame with a line wider than the terminal, which wraps, or taller
+       than the terminal, which scrolls, is redrawn in full. size is the terminal columns
+       and rows, measured on every frame when not given"""
+
+    def __init__(self, stream=None, size: tuple = None):
+        self.stream = stream
+        self.size = size
+        self.lines = None
+
+    def invalidate(self) -> None:
+        """Redraw the whole screen on the next frame"""
+        self.lines = None
+
+    def diff(self, frame: str) -> str:
+        """Terminal output that turns the previous frame into this one"""
+        lines = frame.split('\n')
+        output = []
+
+        columns, rows = self.size or shutil.get_terminal_size()
+        fits = len(lines) < rows and all(display_width(line) <= columns for line in lines)
+
+        if self.lines is None or not fits:
+            output.append(CLEAR_SCREEN)
+            output.append('\n'.join(lines))
+        else:
+            for row, line in enumerate(lines):
+                if row >= len(self.lines) or self.lines[row] != line:
+                    output.append('\x1b[{};1H{}{}'.format(row + 1, line, CLEAR_LINE))
+
+        # Park the cursor under the frame and clear any prompts left from the previous frame
+        output.append('\x1b[{};1H{}'.format(len(lines) + 1, CLEAR_TO_END))
+
+        # A frame that does not fit leaves the rows unknown, so the next one is drawn in full
+        self.lines = lines if fits else None
+        return ''.join(output)
+
+    def draw(self, frame: str) -> None:
+        """Write a frame to the terminal"""
+        stream = self.stream or sys.stdout
+        stream.write(self.diff(frame))
+        stream.flush()
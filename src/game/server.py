@@ -0,0 +1,253 @@
+"""Asyncio game server hosting a table per connection in one event loop
+
+Clients connect over TCP and send one command per line, either as text or as a JSON object
+with an "action" field, and get one JSON object per line back:
+
+    new spanish21 6 500      {"action": "new", "game": "spanish21", "decks": 6, "wallet": 500}
+    bet 10                   {"action": "bet", "amount": 10}
+    hit, stand, double, split, state, quit   {"action": "hit"}
+
+Each response has "ok" and the table "state", or "error". A round is dealt by bet and played
+with the same rules as headless play, the dealer drawing and the hands being settled once
+every hand has ended, when the response also holds the round "result". Commands are read
+one at a time and the next is only read once the response has been written out, so a client
+that stops reading stops being served. Tables idle for longer than the idle timeout, or
+whose client has not read its responses for that long, are evicted and their connection
+closed."""
+import asyncio
+import json
+
+from src.card.codes import RANKS, SUITS, rank_of, suit_of
+from src.card.enums import CardSuit
+from src.card.seeding import SeedStream
+from src.game.blackjack import BlackjackGameCollection
+from src.game.enums import PlayerAction, PlayerHandStatus
+
+GAMES = {game.__name__.lower(): game for game in BlackjackGameCollection().games}
+ACTIONS = {'hit': PlayerAction.HIT, 'stand': PlayerAction.STAND, 'double': PlayerAction.DOUBLE,
+           'split': PlayerAction.SPLIT}
+
+# Longest command line accepted, in bytes
+MAX_LINE = 1024
+# Bytes queued for a slow client before writes wait for it to read
+WRITE_BUFFER_HIGH = 64 * 1024
+PENETRATION = 0.75
+
+
+def card_name(code: int) -> str:
+    """Rank and suit initial of a card code, e.g. 10H"""
+    suit = SUITS[suit_of(code)]
+    return 'Joker' if suit is CardSuit.JOKER else RANKS[rank_of(code)].value + suit.value[0]
+
+
+class CommandError(Exception):
+    """A command that cannot be played, reported to the client"""
+
+
+class TableSession:
+    """A table played by one connection, driven one command at a time"""
+
+    def __init__(self, stream: SeedStream, game: str = 'blackjack', decks: int = 6, wallet: float = 100):
+        self.stream = stream
+        self.games = 0
+        self.game = None
+        self.in_round = False
+        self.result = None
+        self.closed = False
+        self.new(game, decks, wallet)
+
+    def new(self, game: str = 'blackjack', decks: int = 6, wallet: float = 100) -> None:
+        """Sit at a new table of the game, with a fresh shoe and wallet"""
+        game = str(game).lower()
+        if game not in GAMES:
+            raise CommandError('Unknown game {}, choose from {}'.format(game, ', '.join(GAMES)))
+        if not 1 <= int(decks) <= 8 or not 0 < float(wallet) < float('inf'):
+            raise CommandError('A table has 1 to 8 decks and a positive wallet')
+
+        self.game = GAMES[game](int(decks), float(wallet), False, self.stream.child(self.games))
+        self.games += 1
+        self.game.headless = True
+        self.in_round = False
+        self.result = None
+
+    def bet(self, amount: float) -> None:
+        """Take the bet and deal a round, reshuffling the shoe past the cut card"""
+        if self.in_round:
+            raise CommandError('Finish the round in play first')
+        if not 0 < amount <= self.game.player.wallet:
+            raise CommandError('Bet must be positive and covered by the wallet')
+
+        self.game.reset()
+        if self.game.shoe.remaining() < self.game.cut_card(PENETRATION):
+            self.game.shoe.reset()
+        self.game.deal_hand(amount)
+        self.in_round = True
+        self.result = None
+
+    def act(self, action: PlayerAction) -> None:
+        """Play a decision on the hand in play, settling the round once every hand has ended"""
+        if not self.in_round:
+            raise CommandError('Place a bet first')
+        if action is PlayerAction.SPLIT and not self.game.can_split():
+            raise CommandError('The hand cannot be split')
+        if action is PlayerAction.DOUBLE and not self.game.can_double():
+            raise CommandError('The hand cannot double down')
+
+        live = self.game.act(action)
+        if not live or self.game.player.status == PlayerHandStatus.ENDED:
+            if live and not all(hand.bust() for hand in self.game.player.active_hands()):
+                self.game.play_dealer_hand()
+            self.game.dealer.hand_visible = True
+            self.result = self.game.settle()
+            self.in_round = False
+
+    def command(self, line: str) -> dict:
+        """Run a command line and return the response"""
+        try:
+            name, args = self.parse(line)
+            if name == 'new':
+                self.new(*args[:3])
+            elif name == 'bet':
+                if not args:
+                    raise CommandError('Bet needs an amount')
+                self.bet(float(args[0]))
+            elif name in ACTIONS:
+                self.act(ACTIONS[name])
+            elif name == 'quit':
+                self.closed = True
+            elif name != 'state':
+                raise CommandError('Unknown command {}'.format(name))
+        except (CommandError, ValueError, TypeError) as error:
+            return {'ok': False, 'error': str(error), 'state': self.state()}
+
+        return {'ok': True, 'state': self.state()}
+
+    @staticmethod
+    def parse(line: str) -> tuple:
+        """Command name and arguments of a text or JSON command line"""
+        line = line.strip()
+        if line.startswith('{'):
+            command = json.loads(line)
+            if not isinstance(command, dict):
+                raise CommandError('A JSON command is an object')
+            name = str(command.get('action', '')).lower()
+            fields = {'new': ('game', 'decks', 'wallet'), 'bet': ('amount',)}.get(name, ())
+            return name, [command[field] for field in fields if field in command]
+
+        words = line.split()
+        if not words:
+            raise CommandError('Empty command')
+        return words[0].lower(), words[1:]
+
+    def state(self) -> dict:
+        """Plain values describing the table, hiding the dealer hole card until it is turned"""
+        game = self.game
+        player = game.player
+        dealer_codes = game.dealer.hand.codes
+        visible = game.dealer.hand_visible or game.dealer_cards_visible
+
+        state = {
+            'game': type(game).__name__,
+            'wallet': player.wallet,
+            'in_round': self.in_round,
+            'remaining': game.shoe.remaining(),
+            'current': player.current if self.in_round else None,
+            'hands': [{'cards': [card_name(code) for code in hand.codes], 'total': hand.total(), 'bet': hand.bet,
+                       'doubled': hand.double_down, 'outcome': hand.outcome.value}
+                      for hand in (player.active_hands() if self.in_round or self.result else ())],
+            'dealer': {'cards': [card_name(code) if visible or index == 0 else '??'
+                                 for index, code in enumerate(dealer_codes)],
+                       'total': game.dealer.hand.total() if visible else None},
+        }
+        if self.result:
+            state['result'] = {'net': self.result.net, 'dealer_total': self.result.dealer_total,
+                               'payouts': [hand.payout for hand in self.result.hands]}
+        return state
+
+
+class GameServer:
+    """Serves a TableSession per connection. At most max_sessions connections are served at
+       once, later ones are refused, and a table idle for idle_timeout seconds is evicted"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, idle_timeout: float = 300,
+                 max_sessions: int = 10000, seed: int = None):
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.stream = SeedStream(seed)
+        self.sessions = 0
+        self.tables = 0
+        self.evicted = 0
+        self.server = None
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, limit=MAX_LINE)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def send(self, writer: asyncio.StreamWriter, response: dict) -> None:
+        """Write a response, waiting while the client is too far behind in reading. A client
+           that has not caught up within the idle timeout raises asyncio.TimeoutError"""
+        writer.write(json.dumps(response).encode() + b'\n')
+        await asyncio.wait_for(writer.drain(), self.idle_timeout)
+
+    async def close_connection(self, writer: asyncio.StreamWriter) -> None:
+        """Close a connection, dropping what is left to write if the client does not read it
+           within the idle timeout"""
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), self.idle_timeout)
+        except asyncio.TimeoutError:
+            writer.transport.abort()
+        except ConnectionError:
+            pass
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.transport.set_write_buffer_limits(WRITE_BUFFER_HIGH)
+        if self.sessions >= self.max_sessions:
+            try:
+                await self.send(writer, {'ok': False, 'error': 'Server is full'})
+            except (asyncio.TimeoutError, ConnectionError):
+                pass
+            await self.close_connection(writer)
+            return
+
+        self.sessions += 1
+        # Each table shuffles from its own stream, so a server seed reproduces every table
+        session = TableSession(self.stream.child(self.tables))
+        self.tables += 1
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except ValueError:
+                    # A line over the limit, the stream cannot be resynchronized
+                    await self.send(writer, {'ok': False, 'error': 'Command too long'})
+                    break
+
+                if not line:
+                    break
+                await self.send(writer, session.command(line.decode(errors='replace')))
+                if session.closed:
+                    break
+        except asyncio.TimeoutError:
+            # Idle, or too far behind in reading its responses. The notice is only queued if
+            # there is room, as a client that is not reading would never take it
+            self.evicted += 1
+            if writer.transport.get_write_buffer_size() < WRITE_BUFFER_HIGH:
+                writer.write(json.dumps({'ok': False, 'error': 'Idle table evicted'}).encode() + b'\n')
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            await self.close_connection(writer)
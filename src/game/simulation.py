@@ -0,0 +1,167 @@
+"""Monte Carlo simulation of the blackjack games across a process pool"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from math import sqrt
+
+from src.card.seeding import SeedStream
+from src.game.enums import GameWinner
+from src.game.strategy import STRATEGIES, RoundResult
+
+
+class SimulationStats:
+    """Aggregated results of simulated rounds. Stats from separate workers are merged with merge"""
+
+    def __init__(self):
+        self.rounds = 0
+        self.hands = 0
+        self.outcomes = {outcome: 0 for outcome in GameWinner}
+        self.total_bet = 0.0
+        self.net = 0.0
+        self.net_squared = 0.0
+        self.blackjacks = 0
+        self.bonuses = 0
+
+    def add(self, result: RoundResult) -> None:
+        """Add a round to the stats"""
+        self.rounds += 1
+        self.net += result.net
+        self.net_squared += result.net * result.net
+
+        for hand in result.hands:
+            self.hands += 1
+            self.outcomes[hand.outcome] += 1
+            self.total_bet += hand.bet
+            if hand.blackjack:
+                self.blackjacks += 1
+            elif hand.outcome is GameWinner.PLAYER and hand.payout != hand.bet * 2:
+                # Paid at other than even money, e.g. a Spanish 21 bonus
+                self.bonuses += 1
+
+    def merge(self, other: 'SimulationStats') -> None:
+        """Add the stats of another run"""
+        self.rounds += other.rounds
+        self.hands += other.hands
+        for outcome, count in other.outcomes.items():
+            self.outcomes[outcome] += count
+        self.total_bet += other.total_bet
+        self.net += other.net
+        self.net_squared += other.net_squared
+        self.blackjacks += other.blackjacks
+        self.bonuses += other.bonuses
+
+    def house_edge(self) -> float:
+        """Expected loss as a fraction of the amount bet"""
+        return -self.net / self.total_bet if self.total_bet else 0.0
+
+    def variance(self) -> float:
+        """Variance of the net result per round"""
+        if self.rounds < 2:
+            return 0.0
+        mean = self.net / self.rounds
+        return (self.net_squared - self.rounds * mean * mean) / (self.rounds - 1)
+
+    def report(self) -> str:
+        """Plain text summary"""
+        standard_error = sqrt(self.variance() / self.rounds) if self.rounds else 0.0
+        lines = ['rounds:\t\t{}'.format(self.rounds),
+                 'hands:\t\t{}'.format(self.hands)]
+        lines += ['{}:\t\t{}'.format(outcome.value.lower(), self.outcomes[outcome])
+                  for outcome in (GameWinner.PLAYER, GameWinner.DEALER, GameWinner.DRAW)]
+        lines += ['blackjacks:\t{}'.format(self.blackjacks),
+                  'bonuses:\t{}'.format(self.bonuses),
+                  'net units:\t{:.2f}'.format(self.net),
+                  'house edge:\t{:.4%} (+/- {:.4%})'.format(self.house_edge(),
+                                                          standard_error * self.rounds / self.total_bet
+                                                          if self.total_bet else 0.0),
+                  'variance:\t{:.4f} per round'.format(self.variance())]
+        return '\n'.join(lines)
+
+
+def run_chunk(game_type, shoe_size: int, strategy_name: str, rounds: int, stream: SeedStream,
+              penetration: float = 0.75, vectorized: bool = False, seats: int = 1,
+              history: str = None, columns: str = None) -> SimulationStats:
+    """Simulate rounds with a fresh game, shoe and random stream. Vectorized chunks are played
+       in lockstep on batches of shoes and may run a few more rounds than asked. With more than
+       one seat, every seat plays the strategy and each round adds a result per seat. With a
+       history path, every round is also written to a hand history file there, and with a
+       columns prefix every hand is added to column blocks there, see src.game.analytics"""
+    strategy = STRATEGIES[strategy_name]()
+    if seats > 1:
+        game = game_type(shoe_size, float('inf'), False, stream, seats)
+        strategies = [strategy] + [STRATEGIES[strategy_name]() for _ in range(1, seats)]
+        stats = SimulationStats()
+
+        for table in game.simulate_table(strategies, rounds, penetration):
+            for result in table.seats:
+                stats.add(result)
+
+        return stats
+
+    if vectorized:
+        # Imported here as the vectorized module builds on SimulationStats
+        from src.game.vectorized import simulate_shoes
+        return simulate_shoes(game_type, strategy, rounds, shoe_size, stream, penetration)
+
+    game = game_type(shoe_size, float('inf'), False, stream)
+    stats = SimulationStats()
+
+    # Recorders wrap the strategy and are told the result of each round
+    recorders = []
+    with ExitStack() as writers:
+        if history:
+            # Imported here as most runs do not record hands
+            from src.game.history import HistoryRecorder, HistoryWriter, stream_header
+            strategy = HistoryRecorder(strategy, writers.enter_context(
+                HistoryWriter(history, stream_header(game_type, shoe_size, stream))))
+            recorders.append(strategy)
+        if columns:
+            from src.game.analytics import ColumnRecorder, ColumnWriter
+            strategy = ColumnRecorder(strategy, writers.enter_context(ColumnWriter(columns, game_type)))
+            recorders.append(strategy)
+
+        for result in game.simulate(strategy, rounds, penetration):
+            for recorder in recorders:
+                recorder.record(result)
+            stats.add(result)
+
+    return stats
+
+
+def simulate(game_type, rounds: int, shoe_size: int = 6, strategy_name: str = 'mimic', seed: int = None,
+             workers: int = None, chunk_size: int = 100000, penetration: float = 0.75,
+             vectorized: bool = False, seats: int = 1, history: str = None,
+             columns: str = None) -> SimulationStats:
+    """Simulate rounds split into chunks across a process pool. Each chunk gets its own game,
+       shoe and random stream spawned from the seed, so results only depend on the seed and
+       chunk size, not on the number of workers. Vectorized simulation needs a StateStrategy
+       and a single seat. With history, each chunk writes a hand history to history.<chunk>, and
+       with columns, each chunk writes blocks of hand columns to the columns directory"""
+    if vectorized and seats > 1:
+        raise ValueError('Vectorized simulation plays a single seat')
+    if (history or columns) and (vectorized or seats > 1):
+        raise ValueError('Hands are recorded for single seat rounds played by the engine')
+
+    # Prepared once here, so workers do not each generate the same strategy table
+    STRATEGIES[strategy_name]().setup(game_type, shoe_size)
+    streams = SeedStream(seed).spawn((rounds + chunk_size - 1) // chunk_size)
+    chunks = [min(chunk_size, rounds - index * chunk_size) for index in range(0, len(streams))]
+    paths = ['{}.{}'.format(history, index) if history else None for index in range(0, len(streams))]
+    prefixes = [os.path.join(columns, '{}.{}'.format(game_type.__name__.lower(), index)) if columns else None
+                for index in range(0, len(streams))]
+    stats = SimulationStats()
+
+    if workers == 1:
+        for chunk, stream, path, prefix in zip(chunks, streams, paths, prefixes):
+            stats.merge(run_chunk(game_type, shoe_size, strategy_name, chunk, stream, penetration, vectorized,
+                                  seats, path, prefix))
+        return stats
+
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(run_chunk, game_type, shoe_size, strategy_name, chunk, stream, penetration,
+                                   vectorized, seats, path, prefix)
+                   for chunk, stream, path, prefix in zip(chunks, streams, paths, prefixes)]
+        for future in futures:
+            stats.merge(future.result())
+
+    return stats
@@ -0,0 +1,190 @@
+"""Compact snapshots of a table mid-hand, to park it and resume it later
+
+A snapshot holds the game variant, the shoe in dealing order, the shoe's seed stream and
+generator state, and every seat's wallet, status and hands with their bets, along with the
+dealer hand and whether the hole card is turned. Cards are stored as card code bytes and
+the shoe also by its code, suit and rank counts, so restoring needs no counting pass over it.
+A six deck table with one seat takes about 3 KB, most of it the generator state, and the
+whole snapshot is checked with a CRC32. A snapshot restores into a new game, or in place
+into an idle game of the same variant, which skips building one."""
+import struct
+import zlib
+from random import Random
+
+from src.card.codes import CODE_COUNT, RANK_MASK, SUITS
+from src.card.entities import Shoe
+from src.card.seeding import SeedStream
+from src.game.blackjack import Blackjack
+from src.game.enums import GameWinner, PlayerHandStatus
+from src.game.history import read_varint, write_varint
+
+SNAPSHOT_MAGIC = b'BJSS'
+SNAPSHOT_VERSION = 1
+
+STATUSES = tuple(PlayerHandStatus)
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+OUTCOMES = tuple(GameWinner)
+OUTCOME_CODES = {outcome: code for code, outcome in enumerate(OUTCOMES)}
+
+# Game flags
+HEADLESS, RULES, DEALER_VISIBLE, SEEDED = (1 << bit for bit in range(0, 4))
+
+HEADER = struct.Struct('<4sBB')
+TABLE = struct.Struct('<BHBBH')
+SHOE_COUNTS = struct.Struct('<{}H'.format(len(SUITS) + RANK_MASK + 1))
+SEAT = struct.Struct('<dBBB')
+HAND = struct.Struct('<dBB')
+# Mersenne Twister state, 624 words and the position, see Random.getstate
+GENERATOR = struct.Struct('<625I')
+GAUSS = struct.Struct('<?d')
+CHECKSUM = struct.Struct('<I')
+
+
+def game_types(cls=Blackjack) -> dict:
+    """Blackjack and every subclass by name"""
+    types = {cls.__name__: cls}
+    for subclass in cls.__subclasses__():
+        types.update(game_types(subclass))
+    return types
+
+
+GAME_TYPES = game_types()
+
+
+def game_type(name: str):
+    """Game class by name, looking again for subclasses defined since the last lookup"""
+    if name not in GAME_TYPES:
+        GAME_TYPES.update(game_types())
+    return GAME_TYPES.get(name)
+
+
+def pack_bytes(parts: list, data: bytes) -> None:
+    parts.append(struct.pack('<H', len(data)))
+    parts.append(data)
+
+
+def unpack_bytes(data: bytes, position: int) -> tuple:
+    length, = struct.unpack_from('<H', data, position)
+    position += 2
+    return data[position:position + length], position + length
+
+
+def snapshot(game: Blackjack) -> bytes:
+    """Snapshot of the game as it stands"""
+    shoe = game.shoe
+    if max(shoe.code_counts) > 0xFF:
+        raise ValueError('Snapshots hold shoes of up to 255 decks')
+
+    stream = shoe.stream if isinstance(shoe.stream, SeedStream) else None
+    flags = (HEADLESS if game.headless else 0) | (RULES if game.game_rules else 0) | \
+        (DEALER_VISIBLE if game.dealer.hand_visible else 0) | (SEEDED if stream else 0)
+    name = type(game).__name__.encode()
+
+    parts = [HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(name)), name,
+             TABLE.pack(flags, shoe.size, len(game.seats), game.seats.index(game.player), len(shoe.codes)),
+             bytes(shoe.codes), bytes(shoe.code_counts), SHOE_COUNTS.pack(*shoe.suit_counts, *shoe.rank_counts)]
+
+    if stream:
+        seeds = bytearray()
+        for value in (stream.seed, len(stream.spawn_key)) + stream.spawn_key + (stream.spawned,):
+            write_varint(seeds, value)
+        parts.append(bytes(seeds))
+    version, state, gauss = shoe.rng.getstate()
+    parts.append(GENERATOR.pack(*state))
+    parts.append(GAUSS.pack(gauss is not None, gauss or 0.0))
+
+    for seat in game.seats:
+        parts.append(SEAT.pack(seat.wallet, seat.hand_count, seat.current, STATUS_CODES[seat.status]))
+        for hand in seat.active_hands():
+            parts.append(HAND.pack(hand.bet, hand.double_down, OUTCOME_CODES[hand.outcome]))
+            pack_bytes(parts, bytes(hand.codes))
+    pack_bytes(parts, bytes(game.dealer.hand.codes))
+    pack_bytes(parts, game.in_game_message.encode())
+
+    data = b''.join(parts)
+    return data + CHECKSUM.pack(zlib.crc32(data))
+
+
+def restore(data: bytes, game: Blackjack = None) -> Blackjack:
+    """Game restored from a snapshot. With game, a game of the same variant and number of
+       seats, that game is restored in place and returned, e.g. an idle table being reused.
+       Its shoe is replaced, so anything watching the old shoe, e.g. a count tracker, is
+       detached and attaches again to the restored shoe"""
+    if len(data) < HEADER.size + CHECKSUM.size or \
+            CHECKSUM.unpack_from(data, len(data) - CHECKSUM.size)[0] != zlib.crc32(data[:-CHECKSUM.size]):
+        raise ValueError('Not a game snapshot, or a damaged one')
+    magic, version, name_length = HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError('Unsupported game snapshot')
+
+    position = HEADER.size
+    name = data[position:position + name_length].decode()
+    position += name_length
+    flags, shoe_size, seat_count, player, card_count = TABLE.unpack_from(data, position)
+    position += TABLE.size
+
+    cls = game_type(name)
+    if cls is None:
+        raise ValueError('Unknown game {}'.format(name))
+    if game is None or type(game) is not cls or len(game.seats) != seat_count:
+        # An empty shoe, as shuffling a new one would be wasted, and a generator seeded
+        # cheaply, as its state is replaced below
+        game = cls(0, 0, bool(flags & RULES), Random(0), seat_count)
+    else:
+        game.shoe = Shoe(0, game.shoe.rng, game.shoe_composition)
+        game.game_rules = game.get_rules() if flags & RULES else ''
+        # Drop the rules section cached for the old rules and redraw the whole screen
+        game.__dict__.pop('rules_section', None)
+        game.renderer.invalidate()
+
+    shoe = game.shoe
+    codes = data[position:position + card_count]
+    position += card_count
+    shoe.size = shoe_size
+    counts = SHOE_COUNTS.unpack_from(data, position + CODE_COUNT)
+    shoe.load(codes, data[position:position + CODE_COUNT], counts[:len(SUITS)], counts[len(SUITS):])
+    position += CODE_COUNT + SHOE_COUNTS.size
+
+    # The game's own generator takes the snapshot state
+    rng = shoe.rng
+    if flags & SEEDED:
+        seed, position = read_varint(data, position)
+        key_length, position = read_varint(data, position)
+        spawn_key = []
+        for _ in range(0, key_length):
+            key, position = read_varint(data, position)
+            spawn_key.append(key)
+        shoe.stream = SeedStream(seed, spawn_key)
+        shoe.stream.spawned, position = read_varint(data, position)
+    else:
+        shoe.stream = rng
+    state = GENERATOR.unpack_from(data, position)
+    position += GENERATOR.size
+    has_gauss, gauss = GAUSS.unpack_from(data, position)
+    position += GAUSS.size
+    rng.setstate((3, state, gauss if has_gauss else None))
+
+    for seat in game.seats:
+        hand_count = seat.hand_count
+        seat.wallet, seat.hand_count, seat.current, status = SEAT.unpack_from(data, position)
+        position += SEAT.size
+        # Hands that were in use and are not restored over
+        for hand in seat.hands[seat.hand_count:hand_count]:
+            hand.reset()
+        seat.status = STATUSES[status]
+        for hand in seat.active_hands():
+            hand.bet, double_down, outcome = HAND.unpack_from(data, position)
+            hand.double_down = bool(double_down)
+            hand.outcome = OUTCOMES[outcome]
+            codes, position = unpack_bytes(data, position + HAND.size)
+            hand.codes = bytearray(codes)
+
+    codes, position = unpack_bytes(data, position)
+    game.dealer.hand.codes = bytearray(codes)
+    game.dealer.hand_visible = bool(flags & DEALER_VISIBLE)
+    message, position = unpack_bytes(data, position)
+    game.in_game_message = message.decode()
+
+    game.player = game.seats[player]
+    game.headless = bool(flags & HEADLESS)
+    return game
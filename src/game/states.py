@@ -0,0 +1,52 @@
+"""Compact integer keys for hand states, used to index strategy tables and caches
+
+A hand state key packs the hand total (22 for any bust), the soft flag, the pair
+value (0 unless the hand is two cards of the same rank), the card count (capped at 7)
+and whether the hand can still double down into 14 bits, so keys can index a flat
+array of HAND_STATE_COUNT entries directly."""
+from collections import namedtuple
+from functools import lru_cache
+
+BUST_TOTAL = 22
+MAX_CARD_COUNT = 7
+
+SOFT_SHIFT = 5
+PAIR_SHIFT = 6
+COUNT_SHIFT = 10
+DOUBLE_SHIFT = 13
+
+HAND_STATE_COUNT = 1 << 14
+# Dealer upcard values run from 1 (ace) to 10, 0 when the dealer has no cards
+UPCARD_COUNT = 11
+
+# Face up dealer hands are keyed by total and soft flag
+DEALER_STATE_COUNT = 1 << (SOFT_SHIFT + 1)
+
+HandState = namedtuple('HandState', ('total', 'soft', 'pair', 'card_count', 'can_double'))
+
+
+def hand_state_key(total: int, soft: bool, pair: int, card_count: int, can_double: bool) -> int:
+    """Pack a hand state into its integer key"""
+    return min(total, BUST_TOTAL) | soft << SOFT_SHIFT | pair << PAIR_SHIFT | \
+        min(card_count, MAX_CARD_COUNT) << COUNT_SHIFT | can_double << DOUBLE_SHIFT
+
+
+@lru_cache(maxsize=None)
+def decode_hand_state(key: int) -> HandState:
+    """Interned HandState tuple for an integer key"""
+    return HandState(key & ((1 << SOFT_SHIFT) - 1),
+                     bool(key >> SOFT_SHIFT & 1),
+                     key >> PAIR_SHIFT & 0xF,
+                     key >> COUNT_SHIFT & MAX_CARD_COUNT,
+                     bool(key >> DOUBLE_SHIFT & 1))
+
+
+def dealer_state_key(total: int, soft: bool) -> int:
+    """Key for a dealer hand shown face up"""
+    return min(total, BUST_TOTAL) | soft << SOFT_SHIFT
+
+
+def state_index(key: int, upcard: int, dealer_key_count: int = UPCARD_COUNT) -> int:
+    """Index of a hand state against a dealer upcard, or another dealer key, in a flat table"""
+    return key * dealer_key_count + upcard
+
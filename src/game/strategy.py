@@ -0,0 +1,140 @@
+"""Strategies and results for playing the blackjack games headless"""
+from collections import namedtuple
+
+from src.card.counting import COUNTING_SYSTEMS, BetRamp, CountTracker
+from src.game.enums import PlayerAction
+from src.game.states import HandState, decode_hand_state, hand_state_key
+from src.lazy import lazy_import
+
+# Table generation pulls in the exact analysis and a process pool, only needed by basic strategy
+basic_strategy = lazy_import('src.analysis.basic_strategy')
+
+HandResult = namedtuple('HandResult', ('bet', 'outcome', 'payout', 'total', 'card_count', 'blackjack'))
+RoundResult = namedtuple('RoundResult', ('hands', 'dealer_total', 'net'))
+TableResult = namedtuple('TableResult', ('seats', 'dealer_total', 'net'))
+
+
+class Strategy:
+    """Bet sizing and playing decisions for a headless player"""
+
+    def bet(self, game) -> float:
+        """Bet for the next round"""
+        return 1
+
+    def decide(self, game, hand) -> PlayerAction:
+        """Action for the hand in play. A double or split that the game does not allow
+           is played as a hit"""
+        raise NotImplementedError
+
+    def setup(self, game_type, shoe_size: int) -> None:
+        """Prepare for a game variant and shoe size, e.g. before deciding without a game"""
+
+
+class StateStrategy(Strategy):
+    """Strategy that decides from the hand state and the dealer key alone, so it can also
+       be evaluated by the exact analysis in src.analysis"""
+
+    def decide(self, game, hand) -> PlayerAction:
+        return self.decide_state(decode_hand_state(hand.state()), game.dealer_key())
+
+    def decide_state(self, state: HandState, dealer_key: int) -> PlayerAction:
+        """Action for a hand state against the dealer key, see Blackjack.dealer_key"""
+        raise NotImplementedError
+
+
+class DealerMimicStrategy(StateStrategy):
+    """Play the hand the way the dealer does, hitting below 17"""
+
+    def decide_state(self, state: HandState, dealer_key: int) -> PlayerAction:
+        return PlayerAction.HIT if state.total < 17 else PlayerAction.STAND
+
+
+class NeverBustStrategy(StateStrategy):
+    """Only hit when the next card cannot bust the hand"""
+
+    def decide_state(self, state: HandState, dealer_key: int) -> PlayerAction:
+        hard_total = state.total - 10 if state.soft else state.total
+        return PlayerAction.HIT if hard_total <= 11 else PlayerAction.STAND
+
+
+class BasicStrategy(StateStrategy):
+    """Play the basic strategy table of the game and shoe size, see src.analysis.basic_strategy.
+       The table is generated the first time it is needed for a game and shoe size"""
+
+    def __init__(self, directory: str = None):
+        self.directory = directory
+        self.table = None
+        self.table_for = None
+        self.key_count = 0
+
+    def setup(self, game_type, shoe_size: int) -> None:
+        if self.table_for != (game_type, shoe_size):
+            self.table = basic_strategy.load_table(game_type, shoe_size, self.directory)
+            self.key_count = basic_strategy.dealer_key_count(game_type)
+            self.table_for = (game_type, shoe_size)
+
+    def decide(self, game, hand) -> PlayerAction:
+        self.setup(type(game), game.shoe.size)
+        return self.action(hand.state(), game.dealer_key())
+
+    def decide_state(self, state: HandState, dealer_key: int) -> PlayerAction:
+        return self.action(hand_state_key(*state), dealer_key)
+
+    def action(self, state_key: int, dealer_key: int) -> PlayerAction:
+        """Table action for a hand state key, hands in states no hand reached play like the dealer"""
+        entry = self.table[state_key * self.key_count + dealer_key]
+        if entry:
+            return basic_strategy.ACTIONS[entry - 1]
+        return PlayerAction.HIT if decode_hand_state(state_key).total < 17 else PlayerAction.STAND
+
+
+class CountingStrategy(Strategy):
+    """Count cards with a counting system and size bets with a bet ramp, playing the hands
+       with another strategy, basic strategy by default. The tracker follows the game's shoe"""
+
+    def __init__(self, system: str = 'hi-lo', ramp: BetRamp = None, play: Strategy = None):
+        self.tracker = CountTracker(COUNTING_SYSTEMS[system])
+        self.ramp = ramp if ramp is not None else BetRamp()
+        self.play = play if play is not None else BasicStrategy()
+
+    def bet(self, game) -> float:
+        if self.tracker.shoe is not game.shoe:
+            self.tracker.attach(game.shoe)
+        return self.ramp.bet(self.tracker.count())
+
+    def decide(self, game, hand) -> PlayerAction:
+        return self.play.decide(game, hand)
+
+    def setup(self, game_type, shoe_size: int) -> None:
+        self.play.setup(game_type, shoe_size)
+
+
+class HiLoStrategy(CountingStrategy):
+    """Basic strategy with a Hi-Lo count"""
+
+    def __init__(self):
+        super().__init__('hi-lo')
+
+
+class KOStrategy(CountingStrategy):
+    """Basic strategy with a KO count, betting on the running count"""
+
+    def __init__(self):
+        super().__init__('ko', BetRamp(((2, 2), (4, 4), (6, 8))))
+
+
+class OmegaIIStrategy(CountingStrategy):
+    """Basic strategy with an Omega II count"""
+
+    def __init__(self):
+        super().__init__('omega-ii', BetRamp(((2, 2), (4, 4), (6, 6), (8, 8))))
+
+
+STRATEGIES = {
+    'mimic': DealerMimicStrategy,
+    'never-bust': NeverBustStrategy,
+    'basic': BasicStrategy,
+    'hi-lo': HiLoStrategy,
+    'ko': KOStrategy,
+    'omega-ii': OmegaIIStrategy,
+}
@@ -0,0 +1,283 @@
+"""Lockstep simulation of many rounds at once with NumPy arrays
+
+Each lane plays the rounds of one shoe from batch.shuffled_shoes until the cut card. All
+lanes advance together: every step makes one decision for the hand in play on each lane,
+with masks selecting the lanes that stand, hit, double or split, following the status
+changes of Blackjack.play_player_hands. Decisions come from a table of the strategy's
+action for every hand state and dealer key, so only StateStrategy strategies apply. Hands
+are settled with the game's winnings_array, the array form of its hand_winnings."""
+from collections import namedtuple
+
+import numpy as np
+
+from src.analysis.basic_strategy import dealer_key_count
+from src.card.batch import CODE_VALUE_TABLE, make_generator, shuffled_shoes
+from src.card.codes import COMPOSITION_CODES, RANK_MASK, SUIT_SHIFT
+from src.game.blackjack import MIN_ROUND_CARDS
+from src.game.enums import GameWinner, PlayerAction
+from src.game.simulation import SimulationStats
+from src.game.states import BUST_TOTAL, COUNT_SHIFT, DOUBLE_SHIFT, HAND_STATE_COUNT, MAX_CARD_COUNT, PAIR_SHIFT, \
+    SOFT_SHIFT, decode_hand_state
+
+# Lane status, as PlayerHandStatus, plus BUST for an unsplit hand that busted and ends the round
+IN_PLAY, ENDED, BUST = range(0, 3)
+
+ACTIONS = tuple(PlayerAction)
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+HIT, STAND, DOUBLE, SPLIT = (ACTION_CODES[action] for action in
+                             (PlayerAction.HIT, PlayerAction.STAND, PlayerAction.DOUBLE, PlayerAction.SPLIT))
+
+SettledHands = namedtuple('SettledHands', ('bet', 'won', 'drawn', 'total', 'card_count', 'blackjack',
+                                           'sevens', 'sixes', 'eights', 'suited'))
+DealerHands = namedtuple('DealerHands', ('total', 'blackjack', 'has_seven'))
+
+
+class HandArrays:
+    """Cards of one or more hands on every lane, as arrays of shape (hands, lanes). Methods
+       take arrays of hand and lane indexes"""
+
+    def __init__(self, hands: int, lanes: int):
+        shape = (hands, lanes)
+        self.hard = np.zeros(shape, dtype=np.int16)
+        self.aces = np.zeros(shape, dtype=np.int8)
+        self.count = np.zeros(shape, dtype=np.int8)
+        self.first = np.zeros(shape, dtype=np.uint8)
+        self.second = np.zeros(shape, dtype=np.uint8)
+        self.suited = np.ones(shape, dtype=bool)
+        self.sevens = np.zeros(shape, dtype=np.int8)
+        self.sixes = np.zeros(shape, dtype=np.int8)
+        self.eights = np.zeros(shape, dtype=np.int8)
+        self.bet = np.zeros(shape, dtype=np.float64)
+        self.doubled = np.zeros(shape, dtype=bool)
+
+    def add(self, hand, lane, codes) -> None:
+        """Add a card code to each hand"""
+        values = CODE_VALUE_TABLE[codes]
+        count = self.count[hand, lane]
+        first = np.where(count == 0, codes, self.first[hand, lane])
+        self.first[hand, lane] = first
+        self.second[hand, lane] = np.where(count == 1, codes, self.second[hand, lane])
+        self.suited[hand, lane] = (count == 0) | (self.suited[hand, lane] & (codes >> SUIT_SHIFT == first >> SUIT_SHIFT))
+        self.hard[hand, lane] += values
+        self.aces[hand, lane] += values == 1
+        self.sevens[hand, lane] += values == 7
+        self.sixes[hand, lane] += values == 6
+        self.eights[hand, lane] += values == 8
+        self.count[hand, lane] = count + 1
+
+    def clear(self, hand, lane) -> None:
+        for field in (self.hard, self.aces, self.count, self.sevens, self.sixes, self.eights):
+            field[hand, lane] = 0
+        self.suited[hand, lane] = True
+
+    def totals(self, hand, lane) -> np.ndarray:
+        hard = self.hard[hand, lane]
+        return hard + 10 * ((self.aces[hand, lane] > 0) & (hard <= 11))
+
+    def soft(self, hand, lane) -> np.ndarray:
+        return (self.aces[hand, lane] > 0) & (self.hard[hand, lane] <= 11)
+
+    def blackjack(self, hand, lane) -> np.ndarray:
+        return (self.count[hand, lane] == 2) & (self.hard[hand, lane] == 11) & (self.aces[hand, lane] == 1)
+
+    def pairs(self, hand, lane) -> np.ndarray:
+        """Card value of two card hands of the same rank, otherwise 0"""
+        first = self.first[hand, lane]
+        same = (self.count[hand, lane] == 2) & (first & RANK_MASK == self.second[hand, lane] & RANK_MASK)
+        return np.where(same, CODE_VALUE_TABLE[first], 0)
+
+    def state_keys(self, hand, lane) -> np.ndarray:
+        """Hand state keys, see Hand.state"""
+        count = self.count[hand, lane]
+        can_double = (count == 2) & ~self.doubled[hand, lane]
+        return np.minimum(self.totals(hand, lane), BUST_TOTAL) | self.soft(hand, lane).astype(np.int16) << SOFT_SHIFT | \
+            self.pairs(hand, lane).astype(np.int16) << PAIR_SHIFT | \
+            np.minimum(count, MAX_CARD_COUNT).astype(np.int16) << COUNT_SHIFT | \
+            can_double.astype(np.int16) << DOUBLE_SHIFT
+
+    def settled(self, hand, lane, dealer_totals) -> SettledHands:
+        """Hands with their outcome against the dealer totals, see Blackjack.winner_outcome"""
+        totals = self.totals(hand, lane)
+        won = (totals <= 21) & ((dealer_totals > 21) | (totals > dealer_totals))
+        drawn = (totals <= 21) & (totals == dealer_totals)
+        return SettledHands(self.bet[hand, lane], won, drawn, totals, self.count[hand, lane],
+                            self.blackjack(hand, lane), self.sevens[hand, lane], self.sixes[hand, lane],
+                            self.eights[hand, lane], self.suited[hand, lane])
+
+
+def decision_table(strategy, game_type, shoe_size: int) -> np.ndarray:
+    """Action code of a StateStrategy for every hand state key and dealer key"""
+    strategy.setup(game_type, shoe_size)
+    table = np.full((HAND_STATE_COUNT, dealer_key_count(game_type)), STAND, dtype=np.int8)
+
+    for state_key in range(0, HAND_STATE_COUNT):
+        state = decode_hand_state(state_key)
+        if 2 <= state.total <= 21 and state.card_count and state.pair <= 10:
+            for dealer_key in range(0, table.shape[1]):
+                table[state_key, dealer_key] = ACTION_CODES[strategy.decide_state(state, dealer_key)]
+    return table
+
+
+class LockstepTable:
+    """Rounds of a game played on every lane of a batch of shoes at once"""
+
+    def __init__(self, game_type, table: np.ndarray, shoes: np.ndarray, penetration: float = 0.75,
+                 bet: float = 1):
+        self.game_type = game_type
+        self.table = table
+        self.shoes = shoes
+        self.bet = bet
+        self.cut_card = max(MIN_ROUND_CARDS, int(shoes.shape[1] * (1 - penetration)))
+        self.position = np.zeros(len(shoes), dtype=np.intp)
+
+    def draw(self, lane) -> np.ndarray:
+        """Next card code of the shoe of each lane. Past the end of a shoe the last card is
+           drawn again to keep the lanes in lockstep, and play_round fails the round"""
+        position = self.position[lane]
+        self.position[lane] = position + 1
+        return self.shoes[lane, np.minimum(position, self.shoes.shape[1] - 1)]
+
+    def run(self, stats: SimulationStats) -> SimulationStats:
+        """Play rounds until every shoe reaches the cut card"""
+        while True:
+            lanes = np.flatnonzero(self.shoes.shape[1] - self.position >= self.cut_card)
+            if not lanes.size:
+                return stats
+            self.play_round(lanes, stats)
+
+    def play_round(self, lanes: np.ndarray, stats: SimulationStats) -> None:
+        """Play one round on each lane, see Blackjack.play_round"""
+        game_type = self.game_type
+        count = len(lanes)
+        rows = np.arange(count)
+        main = np.zeros(count, dtype=np.intp)
+
+        player = HandArrays(game_type.max_split_hands, count)
+        dealer = HandArrays(1, count)
+        player.bet[0] = self.bet
+        for hand in (player, player, dealer, dealer):
+            hand.add(main, rows, self.draw(lanes))
+
+        if game_type.dealer_cards_visible:
+            dealer_keys = dealer.totals(main, rows) | dealer.soft(main, rows).astype(np.int16) << SOFT_SHIFT
+        else:
+            dealer_keys = CODE_VALUE_TABLE[dealer.first[0]].astype(np.int16)
+
+        hand_counts = self.play_player_hands(player, dealer_keys, lanes)
+
+        # The dealer plays unless no hand is left to beat, unused slots count as bust
+        busted = (player.hard > 21) | (np.arange(len(player.hard))[:, np.newaxis] >= hand_counts)
+        dealer_rows = np.flatnonzero(~busted.all(axis=0))
+        while dealer_rows.size:
+            totals = dealer.totals(main[dealer_rows], dealer_rows)
+            hits = (totals < 17) | (game_type.dealer_hits_soft_17 & (totals == 17) &
+                                    dealer.soft(main[dealer_rows], dealer_rows))
+            dealer_rows = dealer_rows[hits]
+            dealer.add(main[dealer_rows], dealer_rows, self.draw(lanes[dealer_rows]))
+
+        # As Shoe.deal, running out of cards fails rather than settling made up hands
+        if (self.position[lanes] > self.shoes.shape[1]).any():
+            raise IndexError('A round ran past the end of a shoe')
+
+        dealer_totals = dealer.totals(main, rows)
+        dealer_hands = DealerHands(dealer_totals, dealer.blackjack(main, rows), dealer.sevens[0] > 0)
+        hands = player.settled(main, rows, dealer_totals)
+        payouts = game_type.winnings_array(hands, dealer_hands)
+        round_net = payouts - hands.bet
+        self.record(stats, hands, payouts)
+
+        for slot in range(1, len(player.hard)):
+            split_rows = np.flatnonzero(hand_counts > slot)
+            if not split_rows.size:
+                break
+            hands = player.settled(main[split_rows] + slot, split_rows, dealer_totals[split_rows])
+            payouts = game_type.winnings_array(hands, DealerHands(*(field[split_rows] for field in dealer_hands)))
+            round_net[split_rows] += payouts - hands.bet
+            self.record(stats, hands, payouts)
+
+        stats.rounds += count
+        stats.net += float(round_net.sum())
+        stats.net_squared += float((round_net * round_net).sum())
+
+    def play_player_hands(self, player: HandArrays, dealer_keys: np.ndarray, lanes: np.ndarray) -> np.ndarray:
+        """Play the player hands on every lane, returns the number of hands of each lane. As in
+           BlackJackPlayer, a split hand takes the next free slot and the slots are played in order"""
+        game_type = self.game_type
+        status = np.full(len(lanes), IN_PLAY, dtype=np.int8)
+        current = np.zeros(len(lanes), dtype=np.intp)
+        hand_counts = np.ones(len(lanes), dtype=np.intp)
+
+        def stand(rows) -> None:
+            current[rows] += 1
+            status[rows[current[rows] >= hand_counts[rows]]] = ENDED
+
+        while True:
+            rows = np.flatnonzero(status == IN_PLAY)
+            if not rows.size:
+                return hand_counts
+            hand = current[rows]
+            actions = self.table[player.state_keys(hand, rows), dealer_keys[rows]]
+
+            pairs = player.pairs(hand, rows)
+            splitting = (actions == SPLIT) & (pairs > 0) & (hand_counts[rows] < len(player.hard))
+            if not game_type.resplit_aces:
+                splitting &= (pairs != 1) | (hand_counts[rows] == 1)
+            doubling = (actions == DOUBLE) & (player.count[hand, rows] == 2) & ~player.doubled[hand, rows]
+            if game_type.double_totals is not None:
+                doubling &= np.isin(player.totals(hand, rows), game_type.double_totals)
+            standing = actions == STAND
+            drawing = ~(standing | splitting)
+
+            stand(rows[standing])
+
+            split_hand, split_rows = hand[splitting], rows[splitting]
+            if split_rows.size:
+                first, second = player.first[split_hand, split_rows], player.second[split_hand, split_rows]
+                new_hand = hand_counts[split_rows]
+                player.clear(split_hand, split_rows)
+                player.add(split_hand, split_rows, first)
+                player.add(new_hand, split_rows, second)
+                player.bet[new_hand, split_rows] = player.bet[split_hand, split_rows]
+                hand_counts[split_rows] += 1
+
+            double_hand, double_rows = hand[doubling], rows[doubling]
+            player.bet[double_hand, double_rows] *= 2
+            player.doubled[double_hand, double_rows] = True
+
+            draw_hand, draw_rows = hand[drawing], rows[drawing]
+            player.add(draw_hand, draw_rows, self.draw(lanes[draw_rows]))
+            # A bust or doubled hand is done, a bust unsplit hand ends the round
+            bust = player.hard[draw_hand, draw_rows] > 21
+            ends_round = bust & (hand_counts[draw_rows] == 1)
+            status[draw_rows[ends_round]] = BUST
+            stand(draw_rows[(bust | doubling[drawing]) & ~ends_round])
+
+    @staticmethod
+    def record(stats: SimulationStats, hands: SettledHands, payouts: np.ndarray) -> None:
+        """Add settled hands to the stats, see SimulationStats.add"""
+        stats.hands += len(payouts)
+        stats.outcomes[GameWinner.PLAYER] += int(hands.won.sum())
+        stats.outcomes[GameWinner.DRAW] += int(hands.drawn.sum())
+        stats.outcomes[GameWinner.DEALER] += int((~hands.won & ~hands.drawn).sum())
+        stats.total_bet += float(hands.bet.sum())
+        stats.blackjacks += int(hands.blackjack.sum())
+        stats.bonuses += int((hands.won & ~hands.blackjack & (payouts != hands.bet * 2)).sum())
+
+
+def simulate_shoes(game_type, strategy, rounds: int, shoe_size: int = 6, rng=None, penetration: float = 0.75,
+                   batch_size: int = 10000, bet: float = 1) -> SimulationStats:
+    """Simulate at least the given number of rounds of a StateStrategy, in batches of shoes
+       played in lockstep"""
+    generator = make_generator(rng)
+    table = decision_table(strategy, game_type, shoe_size)
+    stats = SimulationStats()
+
+    cards = len(COMPOSITION_CODES[game_type.shoe_composition]) * shoe_size
+    # A round takes close to six cards, so a shoe plays about this many rounds
+    shoe_rounds = max(1, (cards - max(MIN_ROUND_CARDS, int(cards * (1 - penetration)))) // 6)
+
+    while stats.rounds < rounds:
+        shoe_count = min(batch_size, -(-(rounds - stats.rounds) // shoe_rounds))
+        shoes = shuffled_shoes(shoe_count, shoe_size, game_type.shoe_composition, generator)
+        LockstepTable(game_type, table, shoes, penetration, bet).run(stats)
+    return stats
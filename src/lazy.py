@@ -0,0 +1,21 @@
+"""Deferred imports for dependencies that are only needed by some code paths, such as the
+terminal colours of the console games or numpy for the vectorized simulation"""
+import importlib.util
+import sys
+
+
+def lazy_import(name: str):
+    """Module that is only executed the first time one of its attributes is used"""
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError('No module named {!r}'.format(name), name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
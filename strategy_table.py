@@ -0,0 +1,56 @@
+"""Generate the basic strategy table of a game and print it as a chart"""
+import argparse
+import os
+from time import perf_counter
+
+from src.analysis.basic_strategy import ACTIONS, generate_table, dealer_key_count, rules_fingerprint, \
+    save_table, table_path
+from src.game.blackjack import BlackjackGameCollection
+from src.game.enums import PlayerAction
+from src.game.states import hand_state_key, dealer_state_key
+
+MARKS = {PlayerAction.STAND: 'S', PlayerAction.HIT: 'H', PlayerAction.DOUBLE: 'D', PlayerAction.SPLIT: 'P'}
+# Chart mark by table entry, '.' for states no hand reaches
+ACTION_MARKS = '.' + ''.join(MARKS[action] for action in ACTIONS)
+
+
+def chart(table: bytes, game_type) -> str:
+    """Opening hand rows against dealer key columns"""
+    key_count = dealer_key_count(game_type)
+    if game_type.dealer_cards_visible:
+        columns = [(str(total), dealer_state_key(total, False)) for total in range(4, 21)] + \
+                  [('s' + str(total), dealer_state_key(total, True)) for total in range(12, 21)]
+    else:
+        columns = [(str(upcard), upcard) for upcard in range(2, 11)] + [('A', 1)]
+
+    rows = [('{}'.format(total), hand_state_key(total, False, 0, 2, True)) for total in range(5, 21)]
+    rows += [('A,{}'.format(total - 11), hand_state_key(total, True, 0, 2, True)) for total in range(13, 22)]
+    rows += [('{0},{0}'.format(value if value > 1 else 'A'), hand_state_key(value * 2 if value > 1 else 12,
+                                                                            value == 1, value, 2, True))
+             for value in range(1, 11)]
+
+    lines = ['\t' + ' '.join(label.rjust(3) for label, _ in columns)]
+    for label, state_key in rows:
+        lines.append(label + '\t' + ' '.join(ACTION_MARKS[table[state_key * key_count + key]].rjust(3)
+                                             for _, key in columns))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    games = {game.__name__.lower(): game for game in BlackjackGameCollection().games}
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('game', choices=games.keys())
+    parser.add_argument('-d', '--decks', type=int, default=6)
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    game_type = games[args.game]
+    start = perf_counter()
+    table = generate_table(game_type, args.decks, args.workers)
+    path = table_path(game_type, args.decks)
+    save_table(path, rules_fingerprint(game_type, args.decks), table)
+
+    print(chart(table, game_type))
+    print('S stand, H hit, D double, P split')
+    print('saved {} in {:.1f}s'.format(path, perf_counter() - start))
@@ -0,0 +1,160 @@
+"""Testing the exact analysis"""
+import pytest
+from src.analysis.dealer import dealer_distribution, outcome_index, DealerOracle, DEALER_OUTCOMES, \
+    BLACKJACK_OUTCOME, FINAL_TOTALS
+from src.analysis.exact import expected_return, dealer_starts, dealer_start_value, starting_pairs, \
+    OptimalEvaluator, remove
+from src.analysis.basic_strategy import ACTIONS, dealer_key_count, hand_probability, read_table, \
+    rules_fingerprint, save_table, start_action_values, table_path
+from src.analysis.rules import GameRules, shoe_counts
+from src.card.enums import DeckComposition
+from src.game.blackjack import Blackjack, FaceUp21, Spanish21
+from src.game.enums import PlayerAction
+from src.game.simulation import simulate
+from src.game.states import HAND_STATE_COUNT, HandState, hand_state_key, state_index
+from src.game.strategy import BasicStrategy, NeverBustStrategy
+
+
+def test_shoe_counts():
+    assert shoe_counts(DeckComposition.STANDARD, 2) == (8,) * 9 + (32,)
+    assert shoe_counts(DeckComposition.SPANISH, 1) == (4,) * 9 + (12,)
+
+
+def test_dealer_distribution_sums_to_one():
+    counts = shoe_counts(DeckComposition.STANDARD, 6)
+    for upcard in range(1, 11):
+        distribution = dealer_distribution((upcard,), counts)
+        assert len(distribution) == len(DEALER_OUTCOMES)
+        assert sum(distribution) == pytest.approx(1)
+
+    # Only an ace or a ten upcard can become a blackjack
+    assert dealer_distribution((6,), counts)[BLACKJACK_OUTCOME] == 0
+    assert dealer_distribution((1,), counts)[BLACKJACK_OUTCOME] == pytest.approx(96 / 312)
+
+
+def test_dealer_distribution_soft_17():
+    counts = shoe_counts(DeckComposition.STANDARD, 1)
+    assert dealer_distribution((1, 6), counts)[outcome_index(17, False, False)] == 1
+    assert dealer_distribution((1, 6), counts, True)[outcome_index(17, False, False)] < 1
+
+
+def test_dealer_oracle_lru():
+    oracle = DealerOracle(maxsize=2)
+    counts = shoe_counts(DeckComposition.STANDARD, 1)
+    first = oracle.distribution((6,), counts)
+
+    assert oracle.distribution((6,), counts) is first
+    assert (oracle.hits, oracle.misses) == (1, 1)
+
+    oracle.distribution((7,), counts)
+    oracle.distribution((8,), counts)
+    assert len(oracle) == 2
+    oracle.distribution((6,), counts)
+    assert oracle.misses == 4
+    # Pending distributions are bounded like the cache
+    assert set(oracle.take_pending()) == set(oracle.cache)
+
+    totals = oracle.final_totals((6,), counts, True)
+    assert len(totals) == len(FINAL_TOTALS)
+    assert sum(totals) == pytest.approx(1)
+
+
+def test_dealer_oracle_persistence(tmp_path):
+    path = str(tmp_path / 'dealer.oracle')
+    oracle = DealerOracle(path=path)
+    value = dealer_start_value(Blackjack, 1, NeverBustStrategy(), (10,), oracle=oracle)
+    oracle.save()
+
+    loaded = DealerOracle(path=path)
+    assert len(loaded) == len(oracle) > 0
+    assert dealer_start_value(Blackjack, 1, NeverBustStrategy(), (10,), oracle=loaded) == value
+    assert loaded.misses == 0
+
+    with open(path, 'r+b') as f:
+        f.truncate(100)
+    assert len(DealerOracle(path=path)) == 0
+
+    # Dealer starts of any length are kept whole
+    counts = shoe_counts(DeckComposition.STANDARD, 1)
+    oracle = DealerOracle()
+    oracle.distribution((2, 3, 4), counts)
+    oracle.distribution((10,), counts, True)
+    oracle.save(path)
+    assert DealerOracle(path=path).cache == oracle.cache
+
+
+def test_starting_probabilities_sum_to_one():
+    assert sum(probability for _, probability in starting_pairs((4,) * 9 + (16,))) == pytest.approx(1)
+    assert sum(probability for _, probability in dealer_starts(GameRules(FaceUp21, 2))) == pytest.approx(1)
+
+
+def test_rules_payouts_match_game():
+    blackjack = GameRules(Blackjack, 1)
+    assert blackjack.payouts((1, 10))[outcome_index(20, False, False)] == 1.5
+    assert blackjack.payouts((1, 10))[BLACKJACK_OUTCOME] == 1
+    assert blackjack.payouts((10, 10), True)[outcome_index(22, False, False)] == 4
+    assert blackjack.payouts((8, 10))[outcome_index(19, False, False)] == 0
+
+    face_up = GameRules(FaceUp21, 1)
+    assert face_up.payouts((1, 10))[BLACKJACK_OUTCOME] == 0
+    assert face_up.can_double((4, 5)) and not face_up.can_double((4, 4))
+
+    spanish = GameRules(Spanish21, 1)
+    assert spanish.has_suited_payout((6, 7, 8))
+    assert spanish.payouts((7, 7, 7), suited=True)[outcome_index(17, False, True)] == 1002
+    assert spanish.suited_probability((6, 7, 8)) == pytest.approx(1 / 16)
+
+
+def test_expected_return_matches_simulation():
+    exact = expected_return(Blackjack, NeverBustStrategy(), 1, workers=1)
+    stats = simulate(Blackjack, 20000, 1, 'never-bust', seed=5, workers=1, penetration=0.5)
+
+    assert exact == pytest.approx(stats.net / stats.rounds, abs=0.03)
+
+
+def test_split_value_does_not_depend_on_evaluation_order():
+    rules = GameRules(Blackjack, 6)
+    oracle = DealerOracle()
+
+    def split_values(order) -> dict:
+        evaluator = OptimalEvaluator(rules, (10,), oracle)
+        return {pair: evaluator.hand_value((pair,), remove(evaluator.counts, (pair, pair)), pair)
+                for pair in order}
+
+    # A split 3 that draws an 8 and a split 8 that draws a 3 hold the same cards
+    assert split_values((3, 8)) == split_values((8, 3)) == {**split_values((3,)), **split_values((8,))}
+
+
+def test_optimal_actions_for_one_upcard():
+    totals = start_action_values(Blackjack, 1, (6,))
+
+    def best(total, soft=False, pair=0):
+        sums = totals[(hand_state_key(total, soft, pair, 2, True), 6)]
+        return ACTIONS[sums.index(max(sums))]
+
+    assert best(11) is PlayerAction.DOUBLE
+    assert best(20) is PlayerAction.STAND
+    assert best(16) is PlayerAction.STAND
+    assert best(12, True, 1) is PlayerAction.SPLIT
+
+
+def test_table_is_loaded_without_regenerating(tmp_path):
+    fingerprint = rules_fingerprint(Spanish21, 2)
+    assert fingerprint != rules_fingerprint(Spanish21, 6) != rules_fingerprint(Blackjack, 6)
+
+    table = bytearray(HAND_STATE_COUNT * dealer_key_count(Spanish21))
+    table[state_index(hand_state_key(16, False, 0, 2, True), 10)] = ACTIONS.index(PlayerAction.STAND) + 1
+    save_table(table_path(Spanish21, 2, str(tmp_path)), fingerprint, bytes(table))
+    assert read_table(table_path(Spanish21, 2, str(tmp_path)), rules_fingerprint(Spanish21, 6)) is None
+
+    strategy = BasicStrategy(str(tmp_path))
+    strategy.setup(Spanish21, 2)
+    assert strategy.table == table
+    assert strategy.decide_state(HandState(16, False, 0, 2, True), 10) is PlayerAction.STAND
+    # States without an entry are played like the dealer
+    assert strategy.decide_state(HandState(15, False, 0, 3, False), 10) is PlayerAction.HIT
+
+
+def test_hand_probability():
+    counts = (4,) * 9 + (16,)
+    assert hand_probability((1, 10), counts) == pytest.approx(2 * 4 / 52 * 16 / 51)
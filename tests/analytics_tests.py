@@ -0,0 +1,83 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+from src.card.seeding import SeedStream
+from src.game import analytics
+from src.game.analytics import ColumnWriter, HandStore, collect_rounds, starting_hand
+from src.game.blackjack import Blackjack, Spanish21
+from src.game.enums import GameWinner, PlayerAction
+from src.game.simulation import run_chunk
+from src.game.strategy import DealerMimicStrategy, Strategy
+
+
+class SplitEverythingStrategy(Strategy):
+    """Split every pair, otherwise hit below 17"""
+
+    def decide(self, game, hand) -> PlayerAction:
+        if game.can_split():
+            return PlayerAction.SPLIT
+        return PlayerAction.HIT if hand.total() < 17 else PlayerAction.STAND
+
+
+def test_starting_hand():
+    assert starting_hand(0x01, 0x0A) == (21, True)
+    assert starting_hand(0x01, 0x01) == (12, True)
+    assert starting_hand(0x19, 0x2A) == (19, False)
+
+
+def test_columns_match_results(tmp_path):
+    stats = run_chunk(Spanish21, 2, 'mimic', 3000, SeedStream(4), columns=str(tmp_path / 'spanish21.0'))
+    store = HandStore(str(tmp_path))
+    totals = store.group_by()
+
+    assert len(store) == stats.hands == totals['hands'][0]
+    assert totals['net'][0] == pytest.approx(stats.net)
+    assert totals['bet'][0] == pytest.approx(stats.total_bet)
+
+
+def test_split_hands_are_rows(tmp_path):
+    game = Blackjack(1, float('inf'), False, SeedStream(8))
+    with ColumnWriter(str(tmp_path / 'blackjack'), Blackjack, block_size=500) as writer:
+        results = list(collect_rounds(game, SplitEverythingStrategy(), 2000, writer))
+
+    store = HandStore(str(tmp_path))
+    split = [result for result in results if len(result.hands) > 1]
+    by_count = store.group_by(('hand_count', 'hand'))
+
+    assert len(store.blocks) > 1
+    assert split and sum(len(result.hands) for result in results) == len(store)
+    assert {(int(row['hand_count']), int(row['hand'])): int(row['hands']) for row in by_count} == \
+        Counter((len(result.hands), slot) for result in results for slot in range(0, len(result.hands)))
+
+    # Split hands start from the pair
+    pairs = store.group_by(('start_total',), {'hand_count': [2, 3, 4], 'first_action': PlayerAction.SPLIT})
+    assert set(pairs['start_total']) <= {4, 6, 8, 10, 12, 14, 16, 18, 20}
+
+
+def test_group_by_matches_rows(tmp_path, monkeypatch):
+    for game_type, seed in ((Blackjack, 1), (Spanish21, 2)):
+        with ColumnWriter(str(tmp_path / game_type.__name__), game_type, block_size=700) as writer:
+            list(collect_rounds(game_type(2, float('inf'), False, SeedStream(seed)), DealerMimicStrategy(), 1500,
+                                writer))
+
+    store = HandStore(str(tmp_path))
+    rows = {name: np.concatenate([store.column(block, name) for block in store.blocks])
+            for name in ('variant', 'upcard', 'outcome', 'actions', 'net')}
+    table = store.group_by(('upcard', 'outcome'), {'variant': 'Spanish21'})
+
+    spanish = rows['variant'] == 2
+    for row in table:
+        matches = spanish & (rows['upcard'] == row['upcard']) & (rows['outcome'] == row['outcome'])
+        assert row['hands'] == matches.sum()
+        assert row['net'] == pytest.approx(rows['net'][matches].sum())
+        assert row['std'] == pytest.approx(rows['net'][matches].std(ddof=1) if matches.sum() > 1 else 0)
+    assert table['hands'].sum() == spanish.sum()
+    assert not store.group_by(('outcome',), {'outcome': GameWinner.NOTSET}).size
+
+    by_actions = store.group_by(('actions',))
+    assert sorted(zip(by_actions['actions'], by_actions['hands'])) == sorted(Counter(rows['actions']).items())
+
+    # Groups beyond the dense limit are found by sorting, with the same results
+    monkeypatch.setattr(analytics, 'DENSE_GROUPS', 0)
+    assert (store.group_by(('upcard', 'outcome'), {'variant': 'Spanish21'}) == table).all()
@@ -1,9 +1,16 @@
+import os
+from io import StringIO
+
 import pytest
-from src.game.blackjack import Blackjack, Spanish21, FaceUp21
-from src.card.entities import Card, Diamonds, Spades, Hearts, Clubs
+from benchmarks.import_time import DEFERRED_MODULES, MODULE, import_times
+from src.game.blackjack import Blackjack, Spanish21, FaceUp21, read_rules
+from src.card.entities import Card, Diamonds, Spades, Hearts, Clubs, Shoe
 from src.card.enums import CardSuit, CardValue
-from src.game.enums import PlayerHandStatus, GameWinner
+from src.game.enums import PlayerHandStatus, GameWinner, PlayerAction
 from src.game.entities import Hand
+from src.game.rendering import TerminalRenderer
+from src.game.strategy import Strategy, DealerMimicStrategy, CountingStrategy
+from src.game.states import decode_hand_state, state_index, HAND_STATE_COUNT, UPCARD_COUNT
 
 
 @pytest.fixture(scope="class")
@@ -38,7 +45,7 @@ def test_reset(blackjack_game):
     blackjack_game.dealer.hand.reset()
 
     assert len(blackjack_game.player.hand.cards) == 0
-    assert len(blackjack_game.player.split_hand.cards) == 0
+    assert blackjack_game.player.active_hands() == [blackjack_game.player.hand]
     assert len(blackjack_game.dealer.hand.cards) == 0
     assert blackjack_game.player.status == PlayerHandStatus.IN_PLAY
 
@@ -97,17 +104,18 @@ def test_hit(blackjack_game):
     blackjack_game.player.status = PlayerHandStatus.IN_PLAY
     blackjack_game.hit()
     assert len(blackjack_game.player.hand.cards) == 1
-    assert len(blackjack_game.player.split_hand.cards) == 0
+    assert blackjack_game.player.hand_count == 1
 
-    blackjack_game.player.status = PlayerHandStatus.SPLIT_IN_PLAY_HAND_ONE
+    blackjack_game.player.hand.reset()
+    blackjack_game.player.hand.add(Spades(CardValue.FOUR))
+    blackjack_game.player.hand.add(Hearts(CardValue.FOUR))
+    assert blackjack_game.split()
     blackjack_game.hit()
-    assert len(blackjack_game.player.hand.cards) == 2
-    assert len(blackjack_game.player.split_hand.cards) == 0
+    assert [len(hand.cards) for hand in blackjack_game.player.active_hands()] == [2, 1]
 
-    blackjack_game.player.status = PlayerHandStatus.SPLIT_IN_PLAY_HAND_TWO
+    blackjack_game.stand()
     blackjack_game.hit()
-    assert len(blackjack_game.player.hand.cards) == 2
-    assert len(blackjack_game.player.split_hand.cards) == 1
+    assert [len(hand.cards) for hand in blackjack_game.player.active_hands()] == [2, 2]
 
     blackjack_game.player.status = PlayerHandStatus.ENDED
     blackjack_game.dealer.hand_visible = True
@@ -380,3 +388,314 @@ def add_cards(blackjack_game):
     blackjack_game.dealer.hand.add(blackjack_game.shoe.deal())
     blackjack_game.player.hand.add(blackjack_game.shoe.deal())
     blackjack_game.player.hand.add(blackjack_game.shoe.deal())
+
+
+@pytest.mark.parametrize("game_type", [Blackjack, FaceUp21, Spanish21])
+def test_seeded_games_deal_the_same_cards(game_type):
+    first_game = game_type(2, rng=11)
+    second_game = game_type(2, rng=11)
+
+    assert first_game.shoe.codes == second_game.shoe.codes
+
+
+def test_renderer_writes_changed_lines_only():
+    renderer = TerminalRenderer(StringIO())
+
+    first = renderer.diff('wallet\nbet\nDealer\nPlayer')
+    assert first.startswith('\x1b[2J')
+    assert 'Player' in first
+
+    second = renderer.diff('wallet\nbet\nDealer\nPlayer ♠A')
+    assert 'Player ♠A' in second
+    assert 'wallet' not in second and 'Dealer' not in second
+
+    renderer.draw('wallet')
+    assert renderer.stream.getvalue().endswith('\x1b[2;1H\x1b[J')
+
+
+def test_renderer_redraws_frames_that_wrap_or_scroll():
+    renderer = TerminalRenderer(StringIO(), size=(20, 5))
+    renderer.diff('wallet\nDealer\nPlayer')
+
+    # Colour codes take no columns
+    assert not renderer.diff('wallet\n\x1b[32mDealer wins\x1b[0m\nPlayer').startswith('\x1b[2J')
+    assert renderer.diff('wallet\n{}\nPlayer'.format('rules ' * 4)).startswith('\x1b[2J')
+    assert renderer.diff('wallet\nDealer\nPlayer').startswith('\x1b[2J')
+    assert renderer.diff('a\nb\nc\nd\ne').startswith('\x1b[2J')
+    assert renderer.diff('a\nb\nc\nd\ne').startswith('\x1b[2J')
+    assert renderer.diff('a\nb\nc').startswith('\x1b[2J')
+    assert not renderer.diff('a\nb\nd').startswith('\x1b[2J')
+
+
+def test_frame_matches_print(blackjack_game):
+    assert str(blackjack_game).endswith(blackjack_game.frame())
+    assert str(Spades(CardValue.ACE)) == str(Card(CardValue.ACE, CardSuit.SPADES))
+
+
+def test_hand_running_totals_match_recount():
+    shoe = Shoe(2, rng=5)
+    hand = Hand()
+
+    for _ in range(0, 200):
+        hand.reset()
+        while hand.total() < 17:
+            hand.add(shoe.deal())
+            total = sum(card.numerical_value() for card in hand.cards)
+            if hand.ace_count() and total + 10 <= 21:
+                total += 10
+            assert hand.total() == total
+            assert hand.is_soft() == (hand.ace_count() > 0 and hand.hard_total + 10 == total)
+            assert hand.bust() == (total > 21)
+        if shoe.remaining() < 20:
+            shoe.reset()
+
+    hand.reset()
+    hand.add(Card(CardValue.ACE, CardSuit.SPADES))
+    hand.add(Card(CardValue.SIX, CardSuit.SPADES))
+    assert hand.is_soft() and hand.total() == 17
+    hand.remove(CardValue.SIX)
+    assert hand.total() == 11 and len(hand.cards) == 1
+    hand.deal()
+    assert hand.total() == 0 and not hand.is_soft()
+
+
+def test_hand_state_key():
+    hand = Hand()
+    hand.add(Card(CardValue.EIGHT, CardSuit.SPADES))
+    hand.add(Card(CardValue.EIGHT, CardSuit.HEARTS))
+
+    state = decode_hand_state(hand.state())
+    assert state == (16, False, 8, 2, True)
+    assert decode_hand_state(hand.state()) is state
+
+    hand.add(Card(CardValue.ACE, CardSuit.HEARTS))
+    assert decode_hand_state(hand.state()) == (17, False, 0, 3, False)
+
+    hand.reset()
+    hand.add(Card(CardValue.ACE, CardSuit.HEARTS))
+    hand.add(Card(CardValue.SIX, CardSuit.HEARTS))
+    assert decode_hand_state(hand.state()) == (17, True, 0, 2, True)
+    assert 0 <= state_index(hand.state(), 10) < HAND_STATE_COUNT * UPCARD_COUNT
+
+    hand.add(Card(CardValue.KING, CardSuit.HEARTS))
+    hand.add(Card(CardValue.KING, CardSuit.CLUBS))
+    assert decode_hand_state(hand.state()).total == 22
+
+
+def test_dealer_upcard(blackjack_game):
+    blackjack_game.dealer.reset()
+    assert blackjack_game.dealer.upcard() == 0
+
+    blackjack_game.dealer.hand.add(Card(CardValue.QUEEN, CardSuit.CLUBS))
+    blackjack_game.dealer.hand.add(Card(CardValue.ACE, CardSuit.CLUBS))
+    assert blackjack_game.dealer.upcard() == 10
+
+
+class ScriptedStrategy(Strategy):
+    """Plays a fixed list of actions, then stands"""
+    def __init__(self, actions, bet=10):
+        self.actions = list(actions)
+        self.amount = bet
+
+    def bet(self, game):
+        return self.amount
+
+    def decide(self, game, hand):
+        return self.actions.pop(0) if self.actions else PlayerAction.STAND
+
+
+def stack_shoe(game, cards):
+    """Put cards on top of the shoe so they are dealt in the given order"""
+    for card in reversed(cards):
+        game.shoe.add(card)
+
+
+@pytest.mark.parametrize("game_type", [Blackjack, FaceUp21, Spanish21])
+def test_headless_rounds_match_wallet(game_type, capsys):
+    game = game_type(6, 100000, False, rng=3)
+
+    results = list(game.simulate(DealerMimicStrategy(), 2000))
+
+    assert len(results) == 2000
+    assert game.player.wallet == pytest.approx(100000 + sum(result.net for result in results))
+    assert all(hand.outcome != GameWinner.NOTSET for result in results for hand in result.hands)
+    assert game.in_game_message == ''
+    assert capsys.readouterr().out == ''
+
+
+def test_headless_split_and_double():
+    game = Blackjack(1, 100, False, rng=3)
+    # player 8 8, dealer 10 7, split hand one draws 3 then doubles on 11 drawing 10,
+    # split hand two draws 10 and stands
+    stack_shoe(game, [Spades(CardValue.EIGHT), Hearts(CardValue.EIGHT), Clubs(CardValue.TEN),
+                      Clubs(CardValue.SEVEN), Diamonds(CardValue.THREE), Diamonds(CardValue.TEN),
+                      Spades(CardValue.TEN)])
+    strategy = ScriptedStrategy([PlayerAction.SPLIT, PlayerAction.HIT, PlayerAction.DOUBLE, PlayerAction.HIT])
+
+    result = game.play_round(strategy)
+
+    assert [(hand.bet, hand.outcome, hand.total) for hand in result.hands] == \
+           [(20, GameWinner.PLAYER, 21), (10, GameWinner.PLAYER, 18)]
+    assert result.dealer_total == 17
+    assert result.net == 30
+    assert game.player.wallet == 130
+
+
+def test_headless_player_bust_skips_dealer():
+    game = Blackjack(1, 100, False, rng=3)
+    stack_shoe(game, [Spades(CardValue.TEN), Hearts(CardValue.SIX), Clubs(CardValue.TEN),
+                      Clubs(CardValue.SIX), Diamonds(CardValue.TEN)])
+
+    result = game.play_round(ScriptedStrategy([PlayerAction.HIT]))
+
+    assert result.hands[0].outcome == GameWinner.DEALER
+    assert result.dealer_total == 16
+    assert result.net == -10
+
+
+def test_counting_strategy_bets_on_the_count():
+    game = Blackjack(6, 100000, False, rng=5)
+    strategy = CountingStrategy('hi-lo', play=DealerMimicStrategy())
+
+    # The dealer mimic strategy never doubles or splits, so hand bets are the bets placed
+    bets = [result.hands[0].bet for result in game.simulate(strategy, 3000)]
+
+    assert strategy.tracker.shoe is game.shoe
+    assert strategy.tracker.cards_remaining == game.shoe.remaining()
+    assert min(bets) == 1 and max(bets) > 1
+
+
+@pytest.mark.parametrize('game_type, filename', [(Blackjack, 'blackjack.txt'), (FaceUp21, 'face_up_21.txt'),
+                                                 (Spanish21, 'spanish_21.txt')])
+def test_rules_read_from_package(game_type, filename):
+    with open(os.path.join(os.path.dirname(__file__), '..', 'src', 'game', 'rules', filename),
+              encoding='utf-8') as f:
+        assert game_type.get_rules() == f.read()
+
+    assert game_type(1, 100).game_rules is game_type.get_rules()
+    assert len(game_type(1, 100, False).game_name) == len(Blackjack(1, 100, False).game_name)
+
+
+@pytest.mark.filterwarnings('ignore::DeprecationWarning')
+def test_rules_read_without_resources_files(monkeypatch):
+    # Python 3.8 has no importlib.resources.files
+    from importlib import resources
+    monkeypatch.delattr(resources, 'files')
+    read_rules.cache_clear()
+    try:
+        with open(os.path.join(os.path.dirname(__file__), '..', 'src', 'game', 'rules', 'blackjack.txt'),
+                  encoding='utf-8') as f:
+            assert read_rules('blackjack.txt') == f.read()
+    finally:
+        read_rules.cache_clear()
+
+
+def test_import_defers_ui_dependencies():
+    times = import_times(MODULE)
+
+    assert MODULE in times
+    assert not [name for name in DEFERRED_MODULES if name in times]
+
+
+def test_table_deals_in_casino_order_and_settles_every_seat():
+    game = Blackjack(1, 100, False, rng=3, seats=3)
+    # first card to each seat then the dealer, twice, then seat two hits a ten
+    stack_shoe(game, [Spades(CardValue.TEN), Hearts(CardValue.SIX), Clubs(CardValue.NINE), Diamonds(CardValue.TEN),
+                      Spades(CardValue.ACE), Hearts(CardValue.TEN), Diamonds(CardValue.NINE),
+                      Clubs(CardValue.SEVEN), Clubs(CardValue.TEN)])
+
+    table = game.play_table([ScriptedStrategy([]), ScriptedStrategy([PlayerAction.HIT]), ScriptedStrategy([])])
+
+    assert [seat.hand.values() for seat in game.seats] == [[10, 1], [6, 10, 10], [9, 9]]
+    assert [(result.hands[0].outcome, result.net) for result in table.seats] == \
+           [(GameWinner.PLAYER, 5), (GameWinner.DEALER, -10), (GameWinner.PLAYER, 10)]
+    assert table.dealer_total == 17
+    assert table.net == 5
+    assert [seat.wallet for seat in game.seats] == [105, 90, 110]
+
+
+def test_table_skips_dealer_when_every_seat_busts():
+    game = Blackjack(1, 100, False, rng=3, seats=2)
+    stack_shoe(game, [Spades(CardValue.TEN), Hearts(CardValue.TEN), Clubs(CardValue.SIX),
+                      Spades(CardValue.SIX), Hearts(CardValue.SIX), Clubs(CardValue.TEN),
+                      Diamonds(CardValue.TEN), Hearts(CardValue.NINE)])
+
+    table = game.play_table([ScriptedStrategy([PlayerAction.HIT]), ScriptedStrategy([PlayerAction.HIT])])
+
+    assert table.dealer_total == 16
+    assert table.net == -20
+
+
+@pytest.mark.parametrize("game_type", [Blackjack, FaceUp21, Spanish21])
+def test_full_table_rounds_match_wallets(game_type):
+    game = game_type(6, 100000, False, rng=3, seats=7)
+
+    tables = list(game.simulate_table([DealerMimicStrategy() for _ in game.seats], 500))
+
+    assert all(len(table.seats) == 7 for table in tables)
+    for index, seat in enumerate(game.seats):
+        assert seat.wallet == pytest.approx(100000 + sum(table.seats[index].net for table in tables))
+
+
+def test_table_seats_at_most_seven():
+    with pytest.raises(ValueError):
+        Blackjack(1, 100, False, seats=8)
+
+
+def test_headless_resplit():
+    game = Blackjack(1, 100, False, rng=3)
+    # player 8 8, dealer 10 7, hand one draws another 8 and splits again, then draws 10 and
+    # stands, hand two draws 3, doubles on 11 drawing 10, hand three draws 9 and stands
+    stack_shoe(game, [Spades(CardValue.EIGHT), Hearts(CardValue.EIGHT), Clubs(CardValue.TEN),
+                      Clubs(CardValue.SEVEN), Diamonds(CardValue.EIGHT), Diamonds(CardValue.TEN),
+                      Diamonds(CardValue.THREE), Spades(CardValue.TEN), Spades(CardValue.NINE)])
+    strategy = ScriptedStrategy([PlayerAction.SPLIT, PlayerAction.HIT, PlayerAction.SPLIT, PlayerAction.HIT,
+                                 PlayerAction.STAND, PlayerAction.HIT, PlayerAction.DOUBLE, PlayerAction.HIT])
+
+    result = game.play_round(strategy)
+
+    assert [(hand.bet, hand.outcome, hand.total) for hand in result.hands] == \
+           [(10, GameWinner.PLAYER, 18), (20, GameWinner.PLAYER, 21), (10, GameWinner.DRAW, 17)]
+    assert result.net == 30
+    assert game.player.wallet == 130
+
+
+@pytest.mark.parametrize("game_type", [Blackjack, FaceUp21, Spanish21])
+def test_losing_hand_is_not_paid_when_split_hand_wins(game_type):
+    game = game_type(1, 100, False, rng=3)
+    # player 8 8, dealer 10 9, hand one draws 9 and stands on 17, hand two draws 3 and 9
+    # and stands on 20
+    stack_shoe(game, [Spades(CardValue.EIGHT), Hearts(CardValue.EIGHT), Clubs(CardValue.TEN),
+                      Clubs(CardValue.NINE), Diamonds(CardValue.NINE), Diamonds(CardValue.THREE),
+                      Spades(CardValue.NINE)])
+    strategy = ScriptedStrategy([PlayerAction.SPLIT, PlayerAction.HIT, PlayerAction.STAND, PlayerAction.HIT,
+                                 PlayerAction.HIT, PlayerAction.STAND])
+
+    result = game.play_round(strategy)
+
+    assert [(hand.outcome, hand.total, hand.payout) for hand in result.hands] == \
+           [(GameWinner.DEALER, 17, 0), (GameWinner.PLAYER, 20, 20)]
+    assert result.net == 0
+    assert game.player.wallet == 100
+
+
+@pytest.mark.parametrize("game_type, resplit_aces", [(Blackjack, False), (Spanish21, True)])
+def test_split_limits(game_type, resplit_aces):
+    game = game_type(1, 100, False)
+    slots = list(game.player.hands)
+
+    for value, splits in ((CardValue.EIGHT, game_type.max_split_hands - 1), (CardValue.ACE, 3 if resplit_aces else 1)):
+        game.reset()
+        game.player.wallet = 100
+        game.player.hand.bet = 10
+        game.player.hand.add(Spades(value))
+        game.player.hand.add(Hearts(value))
+        for _ in range(0, 5):
+            if game.split():
+                game.player.hand.add(Clubs(value))
+
+        assert game.player.hand_count == splits + 1
+        assert game.player.wallet == 100 - splits * 10
+
+    # The hand slots are reused from round to round
+    assert all(hand is slot for hand, slot in zip(game.player.hands, slots))
@@ -1,6 +1,13 @@
 """Testing the deck of blackjack"""
+import numpy as np
 import pytest
-from src.card.entities import Shoe, Deck, Joker, Diamonds, Spades, Clubs, Hearts, CardValue, CardSuit, Card, CardCollection
+from src.card.batch import shuffled_shoes, shoe_template, card_ranks
+from src.card.entities import Shoe, Deck, Joker, Diamonds, Spades, Clubs, Hearts, CardValue, CardSuit, Card, \
+    CardCollection, CARDS
+from src.card.codes import encode, RANK_INDEX
+from src.card.counting import COUNTING_SYSTEMS, BetRamp, CountTracker
+from src.card.enums import DeckComposition
+from src.card.seeding import SeedStream
 
 
 @pytest.fixture
@@ -207,3 +214,178 @@ def test_shoe_reset():
     shoe.deal()
     shoe.reset()
     assert len(shoe.cards) == 104
+
+
+def test_card_code_round_trip():
+    for card in Deck(True).cards:
+        assert CARDS[card.code] is card
+        assert CARDS[encode(card.value, card.suit)] is card
+
+
+def test_deck_cards_are_interned():
+    first_deck = Deck()
+    second_deck = Deck()
+
+    assert all(first is second for first, second in zip(first_deck.cards, second_deck.cards))
+    assert not hasattr(first_deck.cards[0], '__dict__')
+
+
+def test_card_collection_holds_codes():
+    cards = CardCollection([Spades(CardValue.KING), Hearts(CardValue.TWO)])
+
+    assert isinstance(cards.codes, bytearray)
+    assert cards.cards[0] == Card(CardValue.KING, CardSuit.SPADES)
+    assert type(cards.cards[1]) is Hearts
+    assert cards.deal().value == CardValue.TWO
+    assert cards.remaining() == 1
+
+
+def test_card_collection_count_index(shoe):
+    assert shoe.count(CardValue.ACE) == 8
+    assert shoe.count(CardSuit.SPADES) == 26
+    assert shoe.count(Spades(CardValue.ACE)) == 2
+
+    card = Hearts(CardValue.NINE)
+    shoe.add(card)
+    assert shoe.count(card) == 3
+    assert shoe.deal() == card
+    assert shoe.count(card) == 2
+
+    shoe.remove(CardValue.TEN)
+    assert shoe.count(CardValue.TEN) == 0
+    assert not shoe.has_card(CardValue.TEN)
+    assert shoe.count(CardSuit.HEARTS) == 24
+    assert shoe.remaining() == 96
+
+    shoe.remove(card)
+    assert shoe.count(card) == 0
+    assert shoe.remaining() == 94
+
+    shoe.add(card)
+    assert shoe.count(card) == 1
+    assert shoe.count(CardValue.NINE) == 7
+
+    shoe.reset()
+    assert shoe.count(CardValue.TEN) == 8
+    assert shoe.count(CardSuit.HEARTS) == 26
+
+
+def test_shoe_reset_refills_in_place():
+    shoe = Shoe(6)
+    codes = shoe.codes
+
+    for _ in range(0, 100):
+        shoe.deal()
+    shoe.reset()
+
+    assert shoe.codes is codes
+    assert shoe.remaining() == 312
+    assert sorted(shoe.codes) == sorted(Shoe.template(6).codes)
+    assert Shoe.template(6) is Shoe.template(6)
+
+
+@pytest.mark.parametrize("composition, size, cards_per_shoe", [
+    (DeckComposition.STANDARD, 1, 52),
+    (DeckComposition.JOKER, 2, 106),
+    (DeckComposition.SPANISH, 6, 288)])
+def test_batch_shuffled_shoes(composition, size, cards_per_shoe):
+    shoes = shuffled_shoes(50, size, composition, rng=7)
+
+    assert shoes.shape == (50, cards_per_shoe)
+    assert (np.sort(shoes, axis=1) == np.sort(shoe_template(size, composition))).all()
+    assert not (shoes == shoes[0]).all()
+    assert (shuffled_shoes(50, size, composition, rng=7) == shoes).all()
+
+    if composition is DeckComposition.SPANISH:
+        assert not (card_ranks(shoes) == RANK_INDEX[CardValue.TEN]).any()
+
+
+def test_seeded_shoes_are_reproducible():
+    first_shoe = Shoe(2, rng=42)
+    second_shoe = Shoe(2, rng=42)
+
+    assert first_shoe.codes == second_shoe.codes
+
+    first_shoe.reset()
+    second_shoe.reset()
+    assert first_shoe.codes == second_shoe.codes
+    assert first_shoe.codes != Shoe(2, rng=43).codes
+
+
+def test_seed_stream_spawn_and_replay():
+    stream = SeedStream(7)
+    workers = stream.spawn(4)
+
+    assert len(set(worker.entropy() for worker in workers)) == 4
+    assert [worker.entropy() for worker in workers] == [worker.entropy() for worker in SeedStream(7).spawn(4)]
+    assert stream.spawn(1)[0].spawn_key == (4,)
+
+    shoe = Shoe(6, rng=SeedStream(7))
+    shoe.replay(1000)
+    dealt = [shoe.deal() for _ in range(0, 10)]
+
+    replayed = Shoe(6, rng=7)
+    replayed.replay(1000)
+    assert [replayed.deal() for _ in range(0, 10)] == dealt
+
+
+def test_shoe_composition():
+    shoe = Shoe(2, composition=DeckComposition.SPANISH)
+
+    assert shoe.remaining() == 96
+    assert not shoe.has_card(CardValue.TEN)
+
+    shoe.deal()
+    shoe.reset()
+    assert shoe.remaining() == 96
+    assert not shoe.has_card(CardValue.TEN)
+
+    assert Shoe(1, composition=DeckComposition.JOKER).count(CardValue.JOKER) == 1
+
+
+def test_count_tracker_follows_deals_and_resets():
+    shoe = Shoe(2, rng=4)
+    tracker = CountTracker(COUNTING_SYSTEMS['hi-lo'], shoe)
+    assert (tracker.running_count, tracker.cards_remaining) == (0, 104)
+
+    dealt = [shoe.deal() for _ in range(0, 52)]
+    tags = COUNTING_SYSTEMS['hi-lo'].tags
+    assert tracker.running_count == sum(tags.get(card.numerical_value(), 0) for card in dealt)
+    assert tracker.decks_remaining() == 1
+    assert tracker.true_count() == tracker.running_count
+
+    # A tracker attached mid shoe counts the cards already dealt
+    assert CountTracker(COUNTING_SYSTEMS['hi-lo'], shoe).running_count == tracker.running_count
+
+    shoe.reset()
+    assert (tracker.running_count, tracker.cards_remaining) == (0, 104)
+
+
+def test_unbalanced_count_starts_below_pivot():
+    shoe = Shoe(6, rng=4)
+    tracker = CountTracker(COUNTING_SYSTEMS['ko'], shoe)
+    assert tracker.running_count == 4 - 4 * 6
+    assert tracker.count() == tracker.running_count
+
+    while shoe.remaining():
+        shoe.deal()
+    assert tracker.running_count == 4
+
+
+@pytest.mark.parametrize('system', ['hi-lo', 'omega-ii'])
+def test_balanced_count_ends_at_zero_on_a_spanish_shoe(system):
+    shoe = Shoe(6, rng=4, composition=DeckComposition.SPANISH)
+    tracker = CountTracker(COUNTING_SYSTEMS[system], shoe)
+    assert tracker.running_count < 0
+
+    while shoe.remaining():
+        shoe.deal()
+    assert tracker.running_count == 0
+
+    shoe.reset()
+    assert tracker.running_count == COUNTING_SYSTEMS[system].initial_count(shoe.codes)
+
+
+def test_bet_ramp():
+    ramp = BetRamp(((1, 2), (3, 4)), unit=5, minimum=1)
+    assert [ramp.bet(count) for count in (-2, 0.5, 1, 2.9, 3, 10)] == [5, 5, 10, 10, 20, 20]
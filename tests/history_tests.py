@@ -0,0 +1,87 @@
+import pytest
+from src.card.seeding import SeedStream
+from src.game.blackjack import Blackjack, Spanish21
+from src.game.history import HistoryHeader, HistoryReader, HistoryWriter, read_varint, record_rounds, \
+    stream_header, unzigzag, write_varint, zigzag
+from src.game.simulation import run_chunk
+from src.game.strategy import DealerMimicStrategy, HiLoStrategy
+
+
+def test_varints_round_trip():
+    buffer = bytearray()
+    values = [0, 1, 127, 128, 300, 2 ** 64 + 5]
+    for value in values:
+        write_varint(buffer, value)
+    write_varint(buffer, zigzag(-150))
+
+    position = 0
+    for value in values:
+        decoded, position = read_varint(buffer, position)
+        assert decoded == value
+    assert unzigzag(read_varint(buffer, position)[0]) == -150
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_history_round_trip(tmp_path, compress):
+    path = str(tmp_path / 'rounds.bjh')
+    stream = SeedStream(7)
+    game = Spanish21(2, float('inf'), False, stream)
+    strategy = HiLoStrategy()
+    strategy.play = DealerMimicStrategy()
+    dealt = bytearray()
+    game.shoe.watchers.append(dealt.append)
+
+    with HistoryWriter(path, stream_header(Spanish21, 2, stream), compress, flush_every=100) as writer:
+        results = list(record_rounds(game, strategy, 1000, writer))
+
+    reader = HistoryReader(path)
+    records = list(reader)
+
+    assert reader.header == HistoryHeader('Spanish21', 2, 7, ())
+    assert [record.round for record in records] == list(range(0, 1000))
+    assert [record.result for record in records] == results
+    assert records[0].reshuffled and sum(record.reshuffled for record in records) > 1
+    assert b''.join(record.cards for record in records) == dealt
+
+
+def test_history_replays_rounds(tmp_path):
+    path = str(tmp_path / 'rounds.bjh')
+    stream = SeedStream(3).child(2)
+
+    with HistoryWriter(path, stream_header(Blackjack, 6, stream)) as writer:
+        list(record_rounds(Blackjack(6, float('inf'), False, stream), DealerMimicStrategy(), 50, writer,
+                           replayable=True))
+
+    reader = HistoryReader(path)
+    record = list(reader)[17]
+    game = Blackjack(reader.header.shoe_size, 100, False, SeedStream(reader.header.seed, reader.header.spawn_key))
+    game.shoe.replay(record.round)
+
+    assert bytes(game.shoe.deal().code for _ in record.cards) == record.cards
+    assert len(record.actions) >= 1
+
+
+def test_history_appends_sessions(tmp_path):
+    path = str(tmp_path / 'rounds.bjh')
+    header = stream_header(Blackjack, 1, SeedStream(1))
+
+    for _ in range(0, 2):
+        with HistoryWriter(path, header, compress=True) as writer:
+            list(record_rounds(Blackjack(1, float('inf'), False, SeedStream(1)), DealerMimicStrategy(), 20, writer))
+
+    assert [record.round for record in HistoryReader(path)] == list(range(0, 20)) * 2
+
+    with pytest.raises(ValueError):
+        HistoryWriter(path, header)
+    with pytest.raises(ValueError):
+        HistoryWriter(path, stream_header(Blackjack, 1, SeedStream(2)), compress=True)
+
+
+def test_simulation_chunk_history(tmp_path):
+    path = str(tmp_path / 'chunk.bjh')
+
+    stats = run_chunk(Blackjack, 6, 'mimic', 2000, SeedStream(5), history=path)
+    replayed = run_chunk(Blackjack, 6, 'mimic', 2000, SeedStream(5))
+
+    assert sum(record.result.net for record in HistoryReader(path)) == pytest.approx(stats.net)
+    assert stats.net == replayed.net
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+from src.card.entities import Shoe
+from src.card.seeding import SeedStream
+from src.game.blackjack import Blackjack, Spanish21
+from src.game.instrumentation import Instrumentation
+from src.game.strategy import DealerMimicStrategy
+
+
+def test_phases_count_calls_and_restore_methods(tmp_path):
+    originals = (Blackjack.hit, Spanish21.hand_winnings, Shoe.deal)
+    game = Spanish21(1, float('inf'), False, SeedStream(2))
+    dealt = []
+    game.shoe.watchers.append(dealt.append)
+
+    with Instrumentation() as instrumentation:
+        assert Blackjack.hit is not originals[0]
+        results = list(game.simulate(DealerMimicStrategy(), 200))
+        with pytest.raises(RuntimeError):
+            Instrumentation().enable()
+
+    assert (Blackjack.hit, Spanish21.hand_winnings, Shoe.deal) == originals
+
+    phases = instrumentation.snapshot()['phases']
+    assert phases['round']['calls'] == 200
+    assert phases['deal']['calls'] == len(dealt)
+    assert phases['check_winner']['calls'] == 200
+    # Headless, the dealer draws without hit
+    assert phases['hit']['calls'] == sum(hand.card_count - 2 for result in results for hand in result.hands)
+    assert phases['render']['calls'] == 0
+    assert 0 < phases['deal']['seconds'] < phases['round']['seconds'] <= instrumentation.snapshot()['elapsed']
+
+    path = str(tmp_path / 'phases.json')
+    instrumentation.write(path)
+    with open(path) as f:
+        assert json.load(f) == instrumentation.snapshot()
+    assert 'shoe_reset' in instrumentation.report()
+
+    # Nothing is counted once disabled
+    list(game.simulate(DealerMimicStrategy(), 10))
+    assert instrumentation.snapshot()['phases']['round']['calls'] == 200
@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+from src.card.seeding import SeedStream
+from src.game.server import GameServer, TableSession
+
+
+def play_round(session: TableSession, bet: str = 'bet 10') -> dict:
+    """Bet and hit below 17 until the round is settled"""
+    response = session.command(bet)
+    while response['state']['in_round']:
+        state = response['state']
+        response = session.command('hit' if state['hands'][state['current']]['total'] < 17 else 'stand')
+        assert response['ok']
+    return response['state']
+
+
+def test_session_rounds_settle_the_wallet():
+    session = TableSession(SeedStream(1))
+    wallet = 100
+
+    for _ in range(0, 20):
+        state = play_round(session)
+        wallet += state['result']['net']
+        assert state['wallet'] == wallet
+        assert '??' not in state['dealer']['cards']
+        assert all(hand['outcome'] != 'NotSet' for hand in state['hands'])
+
+
+def test_session_hides_the_hole_card_and_rejects_invalid_commands():
+    session = TableSession(SeedStream(2))
+
+    assert not session.command('hit')['ok']
+    assert not session.command('bet 1000')['ok']
+    assert not session.command('fold')['ok']
+    assert not session.command('new roulette')['ok']
+
+    state = session.command('{"action": "bet", "amount": 5}')['state']
+    assert state['in_round'] and state['dealer']['cards'][1] == '??' and state['dealer']['total'] is None
+    assert state['wallet'] == 95
+    assert not session.command('bet 5')['ok']
+
+    # Face Up 21 shows both dealer cards from the deal
+    assert session.command('new faceup21 2 50')['ok']
+    state = session.command('bet 5')['state']
+    assert state['game'] == 'FaceUp21' and '??' not in state['dealer']['cards']
+
+
+def test_sessions_are_reproducible_from_the_seed():
+    first, second = TableSession(SeedStream(3)), TableSession(SeedStream(3))
+    for _ in range(0, 5):
+        assert play_round(first) == play_round(second)
+
+
+def test_server_plays_tables_and_evicts_idle_ones():
+    async def scenario():
+        server = GameServer(idle_timeout=0.2, max_sessions=2, seed=4)
+        await server.start()
+
+        async def connect():
+            return await asyncio.open_connection('127.0.0.1', server.port)
+
+        async def send(connection, line: str) -> dict:
+            reader, writer = connection
+            writer.write(line.encode() + b'\n')
+            await writer.drain()
+            return json.loads(await reader.readline())
+
+        first, second = await connect(), await connect()
+        assert (await send(first, 'new spanish21 1 20'))['state']['game'] == 'Spanish21'
+        assert (await send(second, '{"action": "bet", "amount": 1}'))['state']['in_round']
+
+        # Full, the third connection is refused
+        reader, writer = await connect()
+        assert not json.loads(await reader.readline())['ok']
+        assert await reader.read() == b''
+        writer.close()
+
+        assert (await send(first, 'quit'))['ok']
+        assert await first[0].read() == b''
+
+        # The second table goes idle and is evicted
+        assert json.loads(await second[0].readline())['error'] == 'Idle table evicted'
+        assert await second[0].read() == b''
+        assert server.evicted == 1
+
+        first[1].close()
+        second[1].close()
+        await server.close()
+        return server.sessions
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_server_evicts_clients_that_stop_reading():
+    async def scenario():
+        server = GameServer(idle_timeout=0.3, seed=5)
+        await server.start()
+
+        # Commands keep coming but the responses are never read
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+        writer.write(b'state\n' * 200000)
+
+        for _ in range(0, 100):
+            await asyncio.sleep(0.1)
+            if not server.sessions:
+                break
+
+        writer.close()
+        await server.close()
+        return server.sessions, server.evicted
+
+    assert asyncio.run(scenario()) == (0, 1)
@@ -0,0 +1,128 @@
+"""Testing the Monte Carlo simulation"""
+import numpy as np
+import pytest
+from src.card.entities import Clubs, Diamonds, Hearts, Spades
+from src.card.enums import CardValue
+from src.game.blackjack import Blackjack, FaceUp21, Spanish21
+from src.game.enums import GameWinner, PlayerAction
+from src.game.simulation import simulate, run_chunk, SimulationStats
+from src.game.strategy import StateStrategy
+from src.game.vectorized import LockstepTable, decision_table, simulate_shoes
+from src.card.seeding import SeedStream
+
+
+def test_simulation_is_reproducible_across_workers():
+    single = simulate(Spanish21, 3000, 2, 'mimic', seed=9, workers=1, chunk_size=1000)
+    pooled = simulate(Spanish21, 3000, 2, 'mimic', seed=9, workers=2, chunk_size=1000)
+
+    assert single.rounds == pooled.rounds == 3000
+    assert single.net == pooled.net
+    assert single.outcomes == pooled.outcomes
+
+
+def test_simulation_stats_merge():
+    first = run_chunk(Blackjack, 1, 'never-bust', 500, SeedStream(1, (0,)))
+    second = run_chunk(Blackjack, 1, 'never-bust', 500, SeedStream(1, (1,)))
+
+    merged = SimulationStats()
+    merged.merge(first)
+    merged.merge(second)
+
+    assert merged.rounds == 1000
+    assert merged.net == pytest.approx(first.net + second.net)
+    assert sum(merged.outcomes.values()) == merged.hands
+    assert merged.outcomes[GameWinner.NOTSET] == 0
+    assert 'house edge' in merged.report()
+
+
+class SplitDoubleStrategy(StateStrategy):
+    """Split every pair, double on 11 and otherwise play like the dealer"""
+
+    def decide_state(self, state, dealer_key):
+        if state.pair:
+            return PlayerAction.SPLIT
+        elif state.total == 11 and state.can_double:
+            return PlayerAction.DOUBLE
+        return PlayerAction.HIT if state.total < 17 else PlayerAction.STAND
+
+
+def test_lockstep_split_and_double():
+    # player 8 8, dealer 10 7, split hand one draws 3 then doubles on 11 drawing 10,
+    # split hand two draws 10 and stands
+    cards = [Spades(CardValue.EIGHT), Hearts(CardValue.EIGHT), Clubs(CardValue.TEN), Clubs(CardValue.SEVEN),
+             Diamonds(CardValue.THREE), Diamonds(CardValue.TEN), Spades(CardValue.TEN)]
+    shoes = np.array([[card.code for card in cards] + [0] * 20], dtype=np.uint8)
+    table = decision_table(SplitDoubleStrategy(), Blackjack, 1)
+    stats = SimulationStats()
+
+    LockstepTable(Blackjack, table, shoes, bet=10).play_round(np.array([0]), stats)
+
+    assert (stats.rounds, stats.hands) == (1, 2)
+    assert stats.total_bet == 30
+    assert stats.outcomes[GameWinner.PLAYER] == 2
+    assert stats.net == 30
+
+
+def test_lockstep_round_past_the_end_of_a_shoe_fails():
+    # Pairs of twos split into four hands, each hitting to 17, need far more than 20 cards
+    shoes = np.array([[Spades(CardValue.TWO).code] * 20], dtype=np.uint8)
+    table = decision_table(SplitDoubleStrategy(), Blackjack, 1)
+    stats = SimulationStats()
+
+    with pytest.raises(IndexError):
+        LockstepTable(Blackjack, table, shoes).play_round(np.array([0]), stats)
+    assert stats.rounds == 0
+
+
+@pytest.mark.parametrize("game_type", [Blackjack, FaceUp21, Spanish21])
+def test_lockstep_matches_engine(game_type):
+    vectorized = simulate_shoes(game_type, SplitDoubleStrategy(), 100000, 6, rng=1)
+    engine = SimulationStats()
+    for result in game_type(6, float('inf'), False, 2).simulate(SplitDoubleStrategy(), 10000):
+        engine.add(result)
+
+    assert vectorized.rounds >= 100000
+    assert vectorized.hands / vectorized.rounds == pytest.approx(engine.hands / engine.rounds, abs=0.01)
+    assert vectorized.total_bet / vectorized.rounds == pytest.approx(engine.total_bet / engine.rounds, abs=0.02)
+    assert vectorized.net / vectorized.rounds == pytest.approx(engine.net / engine.rounds, abs=0.05)
+
+
+def test_vectorized_simulation_chunks():
+    stats = simulate(Spanish21, 20000, 2, 'never-bust', seed=3, workers=1, chunk_size=10000, vectorized=True)
+
+    assert stats.rounds >= 20000
+    assert sum(stats.outcomes.values()) == stats.hands
+    assert stats.bonuses > 0
+
+
+def test_multi_seat_chunks():
+    stats = run_chunk(Blackjack, 6, 'mimic', 1000, SeedStream(4), seats=7)
+
+    assert stats.rounds == 7000
+    assert stats.house_edge() == pytest.approx(0.10, abs=0.03)
+
+    with pytest.raises(ValueError):
+        simulate(Blackjack, 1000, strategy_name='mimic', workers=1, vectorized=True, seats=2)
+
+
+def test_lockstep_resplit_matches_engine():
+    # player 8 8, dealer 10 7, hand one draws an 8 and splits again, draws 3 and doubles on 11
+    # drawing 10, hand two draws 2 then 7, hand three draws 10
+    cards = [Spades(CardValue.EIGHT), Hearts(CardValue.EIGHT), Clubs(CardValue.TEN), Clubs(CardValue.SEVEN),
+             Diamonds(CardValue.EIGHT), Diamonds(CardValue.THREE), Spades(CardValue.TEN), Hearts(CardValue.TWO),
+             Hearts(CardValue.SEVEN), Hearts(CardValue.TEN)]
+    shoes = np.array([[card.code for card in cards] + [0] * 20], dtype=np.uint8)
+    stats = SimulationStats()
+    LockstepTable(Blackjack, decision_table(SplitDoubleStrategy(), Blackjack, 1), shoes, bet=10).play_round(
+        np.array([0]), stats)
+
+    game = Blackjack(1, 100, False, rng=3)
+    for card in reversed(cards):
+        game.shoe.add(card)
+    strategy = SplitDoubleStrategy()
+    strategy.bet = lambda _: 10
+    engine = SimulationStats()
+    engine.add(game.play_round(strategy))
+
+    assert (stats.hands, stats.total_bet, stats.net) == (engine.hands, engine.total_bet, engine.net) == (3, 40, 30)
+    assert stats.outcomes == engine.outcomes
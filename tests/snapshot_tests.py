@@ -0,0 +1,98 @@
+from random import Random
+
+import pytest
+
+from src.card.seeding import SeedStream
+from src.game.blackjack import Blackjack, Spanish21
+from src.game.enums import PlayerAction
+from src.game.snapshot import restore, snapshot
+from src.game.strategy import CountingStrategy, DealerMimicStrategy
+
+
+def mid_hand(game: Blackjack) -> Blackjack:
+    """Deal rounds until the player can split, then split, leaving the round in play"""
+    game.headless = True
+    while True:
+        game.reset()
+        if game.shoe.remaining() < game.cut_card(0.75):
+            game.shoe.reset()
+        game.deal_hand(10)
+        if game.can_split():
+            game.act(PlayerAction.SPLIT)
+            return game
+        game.player.wallet += game.player.hand.bet
+
+
+def continuation(game: Blackjack) -> list:
+    return [(result.net, result.dealer_total) for result in game.simulate(DealerMimicStrategy(), rounds=200)]
+
+
+def test_snapshot_round_trips_a_hand_in_play():
+    game = mid_hand(Spanish21(6, 500, False, SeedStream(1)))
+    data = snapshot(game)
+    restored = restore(data)
+
+    assert type(restored) is Spanish21 and snapshot(restored) == data
+    assert restored.player.hand_count == 2 and not restored.dealer.hand_visible
+    assert [bytes(hand.codes) for hand in restored.player.active_hands()] == \
+        [bytes(hand.codes) for hand in game.player.active_hands()]
+    assert restored.player.wallet == game.player.wallet == 480
+    assert restored.shoe.rank_counts == game.shoe.rank_counts
+
+    # The restored game deals and shuffles exactly as the original
+    game.act(PlayerAction.STAND)
+    restored.act(PlayerAction.STAND)
+    assert continuation(restored) == continuation(game)
+
+
+def test_snapshot_restores_in_place():
+    original = mid_hand(Blackjack(2, 100, False, Random(5)))
+    data = snapshot(original)
+
+    idle = Blackjack(2, 100, False, SeedStream(7))
+    for _ in range(0, 3):
+        mid_hand(idle).act(PlayerAction.STAND)
+    mid_hand(idle)
+    idle.player.hands[2].add(idle.shoe.deal())
+    idle.player.hand_count = 3
+
+    assert restore(data, idle) is idle
+    assert snapshot(idle) == data
+    assert not idle.player.hands[2].codes and idle.player.hands[2].hard_total == 0
+    assert continuation(idle) == continuation(original)
+
+
+def test_snapshot_restores_rules_and_detaches_shoe_watchers():
+    spanish = mid_hand(Spanish21(2, 100, True, SeedStream(3)))
+    data = snapshot(spanish)
+
+    # Another variant is restored into a new game, leaving the given one alone
+    blackjack = Blackjack(2, 100, False, SeedStream(4))
+    restored = restore(data, blackjack)
+    assert type(restored) is Spanish21 and restored is not blackjack
+    assert restored.game_rules == Spanish21.get_rules() and blackjack.shoe.remaining() == 104
+
+    # In place, the rules follow the snapshot and count trackers move to the restored shoe
+    idle = Spanish21(2, 100, False, SeedStream(5))
+    strategy = CountingStrategy('hi-lo', play=DealerMimicStrategy())
+    list(idle.simulate(strategy, 20))
+    old_shoe = idle.shoe
+
+    restore(data, idle)
+    assert idle.game_rules == Spanish21.get_rules() and Spanish21.get_rules() in idle.frame()
+    assert idle.shoe is not old_shoe and not idle.shoe.watchers
+
+    idle.act(PlayerAction.STAND)
+    list(idle.simulate(strategy, 20))
+    assert strategy.tracker.shoe is idle.shoe and old_shoe.watchers
+    assert strategy.tracker.cards_remaining == idle.shoe.remaining()
+
+
+def test_damaged_snapshot_is_rejected():
+    data = bytearray(snapshot(mid_hand(Blackjack(1, 100, False, SeedStream(2)))))
+    data[40] ^= 1
+
+    with pytest.raises(ValueError):
+        restore(bytes(data))
+    with pytest.raises(ValueError):
+        restore(b'BJSS')